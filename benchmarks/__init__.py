@@ -0,0 +1 @@
+"""Benchmarks for the contract pipeline. Run each module with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,84 @@
+"""Micro-benchmark: per-contract workflow overhead with a per-contract vs. a shared compiled graph.
+
+All tools are instant stubs, so the timings are pure graph setup and invocation cost.
+
+    python -m benchmarks.bench_graph_build -n 500
+"""
+import argparse
+import time
+from loguru import logger
+from contract_agent import ContractAgent
+
+
+class _StubCohere:
+    def __init__(self):
+        self.generated = 0
+
+    def generate_contract(self, complexity, vulnerabilities):
+        self.generated += 1  # Distinct sources, so no contract is dropped as a duplicate
+        return f"pragma solidity ^0.8.0; contract Bench{self.generated} {{}}"
+
+
+class _StubStorage:
+    def has_contract(self, contract_code):
+        return False
+
+    def save_contract(self, contract_code):
+        return "contracts/bench.sol"
+
+    def save_slither_report(self, contract_filepath, slither_report):
+        return "reports/bench_SlitherReport.txt"
+
+
+def _make_agent():
+    return ContractAgent(
+        cohere_tool=_StubCohere(),
+        compile_contract_node=lambda code: lambda: "Binary: 00",
+        analyze_contract_node=lambda path: lambda: "No findings",
+        storage_tool=_StubStorage(),
+    )
+
+
+def _state(i):
+    return {"index": i, "complexity": "low", "vulnerabilities": ["reentrancy"]}
+
+
+def bench_rebuild_per_contract(agent, n):
+    """Old behaviour: define and compile a fresh graph for every contract."""
+    start = time.perf_counter()
+    for i in range(n):
+        agent._build_graph().invoke(_state(i))
+    return (time.perf_counter() - start) / n
+
+
+def bench_shared_graph(agent, n):
+    """Current behaviour: invoke the agent's compiled graph with a fresh state."""
+    start = time.perf_counter()
+    for i in range(n):
+        agent.graph.invoke(_state(i))
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-contract graph overhead micro-benchmark.")
+    parser.add_argument('-n', '--contracts', type=int, default=200, help="Contracts per measurement")
+    args = parser.parse_args()
+
+    logger.remove()  # Keep node logging out of the measurement
+    agent = _make_agent()
+
+    # Warm up both paths once so import and first-call costs are excluded
+    bench_rebuild_per_contract(agent, 5)
+    bench_shared_graph(agent, 5)
+
+    rebuild = bench_rebuild_per_contract(agent, args.contracts)
+    shared = bench_shared_graph(agent, args.contracts)
+
+    print(f"contracts:            {args.contracts}")
+    print(f"rebuild per contract: {rebuild * 1e6:10.1f} us/contract")
+    print(f"shared compiled:      {shared * 1e6:10.1f} us/contract")
+    print(f"speedup:              {rebuild / shared:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
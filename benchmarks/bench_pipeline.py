@@ -0,0 +1,219 @@
+"""End-to-end pipeline benchmark that runs fully offline.
+
+Generation goes through the real ``CohereAPI`` against a local fake Cohere server, and
+compilation and analysis go through the real ``solidity_tools`` against fake ``solc`` and
+``slither`` executables put first on PATH. Latency and failure rates of each are
+configurable, so the run is reproducible on any machine without network or toolchains.
+
+Reports throughput, per-stage p50/p95/p99 latency and peak RSS, and compares throughput
+and latency against a stored baseline recorded with the same flags:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline -n 500 -j 16 --cohere-failure-rate 0.05 --save-baseline
+
+Exits non-zero if throughput drops, or a stage's p95 grows, by more than ``--tolerance``.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+from loguru import logger
+from benchmarks.fake_cohere import FakeCohereServer
+from benchmarks.fake_tools import install_fake_tools, tool_environment
+from cohere_api import CohereAPI
+from contract_agent import ContractAgent
+from metrics import PipelineMetrics
+from retry import RetryPolicy
+from solidity_tools import compile_solidity_checked_node, validate_solidity_node, SlitherExecutor
+from storage import ContractStorage
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# p95 growth smaller than this is scheduling noise on in-process stages, not a regression
+LATENCY_NOISE_FLOOR = 0.025
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and of its largest reaped child, in MiB."""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def run_benchmark(contracts=100, concurrency=4, generations_per_prompt=1, analysis_workers=4, structured=False,
+                  stream=False, repair_rounds=0, cohere_latency=0.05, cohere_chunk_latency=0.0, cohere_failure_rate=0.0,
+                  cohere_off_rails_rate=0.0, solc_latency=0.01, solc_failure_rate=0.0,
+                  slither_latency=0.05, slither_failure_rate=0.0, jitter=0.3, seed=0):
+    """Runs the pipeline against the fakes and returns a JSON-serialisable report."""
+    random.seed(seed)
+    metrics = PipelineMetrics()
+    server = FakeCohereServer(
+        latency=cohere_latency, jitter=jitter, failure_rate=cohere_failure_rate, off_rails_rate=cohere_off_rails_rate,
+        chunk_latency=cohere_chunk_latency, seed=seed
+    ).start()
+    cohere_tool = CohereAPI(
+        api_key="bench", base_url=server.base_url, streaming=stream, retry_policy=RetryPolicy(metrics=metrics)
+    )
+    previous_env = {name: os.environ.get(name) for name in ("PATH", *tool_environment())}
+
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as workdir:
+        os.environ["PATH"] = install_fake_tools(os.path.join(workdir, "bin")) + os.pathsep + os.environ.get("PATH", "")
+        os.environ.update(tool_environment(solc_latency, solc_failure_rate, slither_latency, slither_failure_rate, jitter))
+        executor = SlitherExecutor(max_workers=analysis_workers, timeout=60, structured=structured)
+        try:
+            agent = ContractAgent(
+                cohere_tool=cohere_tool,
+                compile_contract_node=compile_solidity_checked_node,
+                analyze_contract_node=executor.analyze_node,
+                storage_tool=ContractStorage(os.path.join(workdir, "contracts"), os.path.join(workdir, "reports")),
+                generations_per_prompt=generations_per_prompt,
+                metrics=metrics,
+                validate_contract_node=validate_solidity_node,
+                repair_rounds=repair_rounds,
+            )
+            agent.execute(num_contracts=contracts, concurrency=concurrency)
+        finally:
+            executor.shutdown()
+            server.stop()
+            for name, value in previous_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    summary = metrics.summary()
+    return {
+        "config": {
+            "contracts": contracts, "concurrency": concurrency, "generations_per_prompt": generations_per_prompt,
+            "analysis_workers": analysis_workers, "structured": structured, "stream": stream,
+            "repair_rounds": repair_rounds,
+            "cohere_latency": cohere_latency, "cohere_chunk_latency": cohere_chunk_latency,
+            "cohere_failure_rate": cohere_failure_rate, "cohere_off_rails_rate": cohere_off_rails_rate,
+            "solc_latency": solc_latency, "solc_failure_rate": solc_failure_rate,
+            "slither_latency": slither_latency, "slither_failure_rate": slither_failure_rate,
+            "jitter": jitter, "seed": seed,
+        },
+        "elapsed_seconds": summary["elapsed_seconds"],
+        "contracts_per_second": summary["contracts_per_second"],
+        "outcomes": summary["outcomes"],
+        "cohere_chunks_generated": server.chunks_generated,
+        "stream_stats": dict(cohere_tool.stream_stats),
+        "counters": summary["counters"],
+        "stages": {
+            name: {key: stage["latency_seconds"][key] for key in ("p50", "p95", "p99")}
+            for name, stage in sorted(summary["stages"].items())
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Lists regressions of ``report`` against ``baseline`` beyond the relative ``tolerance``."""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        regressions.append("configuration differs from the baseline; rerun with matching flags or --save-baseline")
+        return regressions
+
+    floor = baseline["contracts_per_second"] * (1 - tolerance)
+    if report["contracts_per_second"] < floor:
+        regressions.append(
+            f"throughput {report['contracts_per_second']:.2f}/s below baseline "
+            f"{baseline['contracts_per_second']:.2f}/s"
+        )
+    for name, stage in baseline["stages"].items():
+        current = report["stages"].get(name, {}).get("p95")
+        if stage["p95"] is None or current is None:
+            continue
+        if current > stage["p95"] * (1 + tolerance) and current - stage["p95"] > LATENCY_NOISE_FLOOR:
+            regressions.append(f"{name} p95 {current * 1000:.1f}ms above baseline {stage['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+def _print_report(report):
+    print(f"contracts:        {sum(report['outcomes'].values())} in {report['elapsed_seconds']:.2f}s")
+    print(f"throughput:       {report['contracts_per_second']:.2f} contracts/s")
+    print(f"outcomes:         {json.dumps(report['outcomes'], sort_keys=True)}")
+    print(f"cohere chunks:    {report['cohere_chunks_generated']} generated")
+    if report["stream_stats"]:
+        print(f"streams:          {json.dumps(report['stream_stats'], sort_keys=True)}")
+    if report["counters"]:
+        print(f"counters:         {json.dumps(report['counters'], sort_keys=True)}")
+    print(f"peak RSS:         {report['peak_rss_mb']['self']:.1f} MiB (largest child {report['peak_rss_mb']['children']:.1f} MiB)")
+    print(f"{'stage':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stage in report["stages"].items():
+        cells = "".join(f"{(stage[q] or 0) * 1000:>10.1f}" for q in ("p50", "p95", "p99"))
+        print(f"{name:<22}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument('-n', '--contracts', type=int, default=100, help="Contracts to run through the pipeline")
+    parser.add_argument('-j', '--concurrency', type=int, default=4, help="Contracts in flight at once")
+    parser.add_argument('-k', '--generations-per-prompt', type=int, default=1, help="Candidates per generation request")
+    parser.add_argument('--analysis-workers', type=int, default=4, help="Parallel fake Slither processes")
+    parser.add_argument('--structured-reports', action='store_true', help="Run Slither in JSON mode")
+    parser.add_argument('--stream', action='store_true', help="Stream generations with early abort")
+    parser.add_argument('--repair-rounds', type=int, default=0, help="Compiler-error repair rounds per contract")
+    parser.add_argument('--cohere-latency', type=float, default=0.05, help="Median fake Cohere time to first token in seconds")
+    parser.add_argument('--cohere-chunk-latency', type=float, default=0.0, help="Fake Cohere seconds per 40 generated characters")
+    parser.add_argument('--cohere-failure-rate', type=float, default=0.0, help="Share of Cohere requests answered with 503")
+    parser.add_argument('--cohere-off-rails-rate', type=float, default=0.0, help="Share of generations that are prose without code")
+    parser.add_argument('--solc-latency', type=float, default=0.01, help="Median fake solc latency in seconds")
+    parser.add_argument('--solc-failure-rate', type=float, default=0.0, help="Share of compilations that fail")
+    parser.add_argument('--slither-latency', type=float, default=0.05, help="Median fake Slither latency in seconds")
+    parser.add_argument('--slither-failure-rate', type=float, default=0.0, help="Share of analyses that fail")
+    parser.add_argument('--jitter', type=float, default=0.3, help="Log-normal sigma applied to every latency")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for parameters and the fake server")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline report to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression before failing")
+    parser.add_argument('--json', dest='json_path', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    logger.remove()  # Keep per-contract logging out of the measurement
+    logger.add(sys.stderr, level="ERROR")
+
+    report = run_benchmark(
+        contracts=args.contracts, concurrency=args.concurrency, generations_per_prompt=args.generations_per_prompt,
+        analysis_workers=args.analysis_workers, structured=args.structured_reports, stream=args.stream,
+        repair_rounds=args.repair_rounds,
+        cohere_latency=args.cohere_latency, cohere_chunk_latency=args.cohere_chunk_latency,
+        cohere_failure_rate=args.cohere_failure_rate, cohere_off_rails_rate=args.cohere_off_rails_rate,
+        solc_latency=args.solc_latency, solc_failure_rate=args.solc_failure_rate,
+        slither_latency=args.slither_latency, slither_failure_rate=args.slither_failure_rate,
+        jitter=args.jitter, seed=args.seed,
+    )
+    _print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    if regressions:
+        print("REGRESSIONS:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print(f"within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Startup benchmark: what importing the CLI and running ``--help`` cost a fresh process.
+
+Every short-lived worker pays this before doing any work. Each measurement runs in a
+fresh interpreter inside an empty directory, so it also catches import-time side effects:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 20 --budget-ms 300
+
+Reports the ``-X importtime`` cumulative time of ``main`` and its slowest imports, plus
+the wall time of ``main.py --help``. Exits non-zero if a heavy dependency is imported at
+startup, if files are created before a run starts, or if the import exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must load on first use only, never when the CLI starts
+HEAVY_MODULES = ("cohere", "langgraph", "langchain_core", "langsmith", "httpx", "requests")
+
+
+def _run(args, cwd):
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {result.returncode}: {result.stderr}")
+    return result, elapsed
+
+
+def parse_importtime(stderr):
+    """Maps each imported module to its (self, cumulative) microseconds from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if not fields[0].isdigit():
+            continue  # Header row
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+def measure(runs=5):
+    """Measures startup in fresh interpreters; returns a JSON-serialisable report."""
+    import_ms, help_ms, modules, created = [], [], {}, set()
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+            result, _ = _run(["-X", "importtime", "-c", "import main"], workdir)
+            modules = parse_importtime(result.stderr)
+            import_ms.append(modules["main"][1] / 1000)
+            _, elapsed = _run([os.path.join(REPO_ROOT, "main.py"), "--help"], workdir)
+            help_ms.append(elapsed * 1000)
+            created.update(os.listdir(workdir))
+
+    slowest = sorted(
+        ((name, cumulative / 1000) for name, (_, cumulative) in modules.items() if "." not in name and name != "main"),
+        key=lambda item: item[1], reverse=True
+    )[:10]
+    return {
+        "runs": runs,
+        "import_ms": {"median": statistics.median(import_ms), "max": max(import_ms)},
+        "help_ms": {"median": statistics.median(help_ms), "max": max(help_ms)},
+        "slowest_imports_ms": dict(slowest),
+        "heavy_modules_imported": sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES),
+        "files_created": sorted(created),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument('--budget-ms', type=float, default=None, help="Fail if the median import of main exceeds this")
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+    print(f"import main:      {report['import_ms']['median']:.1f} ms median, {report['import_ms']['max']:.1f} ms max")
+    print(f"main.py --help:   {report['help_ms']['median']:.1f} ms median, {report['help_ms']['max']:.1f} ms max (wall)")
+    print("slowest top-level imports:")
+    for name, ms in report["slowest_imports_ms"].items():
+        print(f"  {name:<24}{ms:>8.1f} ms")
+
+    problems = []
+    if report["heavy_modules_imported"]:
+        problems.append(f"heavy modules imported at startup: {', '.join(report['heavy_modules_imported'][:10])}")
+    if report["files_created"]:
+        problems.append(f"files created before a run started: {', '.join(report['files_created'])}")
+    if args.budget_ms is not None and report["import_ms"]["median"] > args.budget_ms:
+        problems.append(f"import of main took {report['import_ms']['median']:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    if problems:
+        print("REGRESSIONS:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("no heavy imports or side effects at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Local stand-in for the Cohere generate endpoint with configurable latency and failures."""
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTRACT_TEMPLATE = """pragma solidity ^0.8.0;
+
+contract Bench{n} {{
+    mapping(address => uint256) public balances;
+
+    function deposit() public payable {{
+        balances[msg.sender] += msg.value;
+    }}
+
+    function withdraw() public {{
+        uint256 amount = balances[msg.sender];
+        (bool ok, ) = msg.sender.call{{value: amount}}("");
+        require(ok);
+        balances[msg.sender] = 0;
+    }}
+}}
+"""
+
+# Models tend to explain the contract after closing it; streaming can stop before this
+EXPLANATION = (
+    "\nThis contract keeps a balance per depositor. The withdraw function sends the "
+    "balance before zeroing it, which leaves it open to reentrancy. "
+) * 6
+
+# An off-the-rails completion: prose and no code at all
+OFF_RAILS = (
+    "Smart contracts are programs stored on a blockchain that run when predetermined "
+    "conditions are met. They are typically used to automate the execution of an agreement. "
+) * 12
+
+CHUNK_CHARS = 40  # Characters per streamed text event, roughly ten tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.sleep()
+
+        if server.rng_uniform() < server.failure_rate:
+            self._reply(503, {"message": "fake overload"})
+            return
+        if self.path.endswith("/chat"):
+            self._chat(body)
+            return
+
+        generations = []
+        for _ in range(body.get("num_generations") or 1):
+            n = next(server.counter)
+            if server.rng_uniform() < server.empty_rate:
+                text = ""
+            elif server.rng_uniform() < server.off_rails_rate:
+                text = OFF_RAILS
+            else:
+                text = CONTRACT_TEMPLATE.format(n=n) + EXPLANATION
+            generations.append({"id": f"gen-{n}", "text": text})
+
+        if body.get("stream"):
+            self._stream(generations)
+            return
+        # A non-streamed reply arrives once the longest generation has been produced
+        chunks = max(len(g["text"]) // CHUNK_CHARS + 1 for g in generations)
+        time.sleep(server.chunk_latency * chunks)
+        server.chunks_generated += chunks
+        self._reply(200, {"id": "bench", "generations": generations})
+
+    def _chat(self, body):
+        # Repair requests carry the failing source in a fenced block; echo it back, marked, as the "fix"
+        message = body.get("message", "")
+        source = message.split("```solidity\n", 1)[-1].split("\n```", 1)[0]
+        time.sleep(self.server.chunk_latency * (len(source) // CHUNK_CHARS + 1))
+        self.server.chat_requests += 1
+        self._reply(200, {"text": f"```solidity\n{source}\n// repaired\n```", "generation_id": "bench", "finish_reason": "COMPLETE"})
+
+    def _stream(self, generations):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/stream+json")
+        self.end_headers()
+        try:
+            longest = max(len(g["text"]) for g in generations)
+            for offset in range(0, longest, CHUNK_CHARS):
+                time.sleep(self.server.chunk_latency)
+                for index, generation in enumerate(generations):
+                    chunk = generation["text"][offset:offset + CHUNK_CHARS]
+                    if chunk:
+                        self._event({"event_type": "text-generation", "text": chunk, "index": index, "is_finished": False})
+                self.server.chunks_generated += 1
+            self._event({
+                "event_type": "stream-end", "is_finished": True, "finish_reason": "COMPLETE",
+                "response": {"id": "bench", "generations": generations},
+            })
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.streams_cancelled += 1  # The client closed the stream early
+
+    def _event(self, payload):
+        self.wfile.write((json.dumps(payload) + "\n").encode())
+        self.wfile.flush()
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCohereServer(ThreadingHTTPServer):
+    """Serves ``/v1/generate`` (streamed or not) and ``/v1/chat`` on localhost.
+
+    Time to first token is log-normal around ``latency`` seconds (``jitter`` is the
+    sigma), after which text is produced at ``chunk_latency`` seconds per 40 characters.
+    A ``failure_rate`` share of requests get HTTP 503, an ``empty_rate`` share of
+    generations come back empty and an ``off_rails_rate`` share are prose with no code.
+    Every returned contract is unique and followed by an explanation paragraph. Chat
+    replies echo back the fenced source from the message, standing in for a repair.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, jitter=0.3, failure_rate=0.0, empty_rate=0.0, off_rails_rate=0.0,
+                 chunk_latency=0.0, seed=0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.off_rails_rate = off_rails_rate
+        self.chunk_latency = chunk_latency
+        self.chunks_generated = 0  # Per request, along its longest generation
+        self.streams_cancelled = 0
+        self.chat_requests = 0
+        self.counter = itertools.count()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def rng_uniform(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def sleep(self):
+        if self.latency > 0:
+            with self._rng_lock:
+                delay = self._rng.lognormvariate(0, self.jitter) * self.latency
+            time.sleep(delay)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,85 @@
+"""Fake ``solc`` and ``slither`` executables with configurable latency and failure rates.
+
+``install_fake_tools(directory, ...)`` writes both scripts into ``directory``; put it
+first on PATH and the pipeline picks them up unchanged. Behaviour is set through
+environment variables so every spawned process sees the same distribution.
+"""
+import os
+import sys
+
+_COMMON = """#!@PYTHON@
+import json, os, random, sys, time
+
+def delay(prefix):
+    median = float(os.environ.get(prefix + "_LATENCY", "0"))
+    sigma = float(os.environ.get(prefix + "_JITTER", "0.3"))
+    if median > 0:
+        time.sleep(random.lognormvariate(0, sigma) * median)
+
+def fails(prefix):
+    return random.random() < float(os.environ.get(prefix + "_FAILURE_RATE", "0"))
+"""
+
+_SOLC = _COMMON + """
+args = sys.argv[1:]
+if "--version" in args:
+    print("solc, the solidity compiler commandline interface\\nVersion: 0.8.19+commit.fake")
+    sys.exit(0)
+
+delay("FAKE_SOLC")
+if "--standard-json" in args:
+    request = json.load(sys.stdin)
+    errors, contracts = [], {}
+    for name in request["sources"]:
+        if fails("FAKE_SOLC"):
+            errors.append({"severity": "error", "formattedMessage": "ParserError: fake", "sourceLocation": {"file": name}})
+        else:
+            contracts[name] = {"Bench": {"evm": {"bytecode": {"object": "6080604052"}}}}
+    print(json.dumps({"errors": errors, "contracts": {} if errors else contracts}))
+    sys.exit(0)
+
+if fails("FAKE_SOLC"):
+    print("Error: fake compilation failure", file=sys.stderr)
+    sys.exit(1)
+print("======= " + args[-1] + ":Bench =======\\nBinary:\\n6080604052")
+"""
+
+_SLITHER = _COMMON + """
+args = sys.argv[1:]
+delay("FAKE_SLITHER")
+if fails("FAKE_SLITHER"):
+    print("Error: fake analysis failure", file=sys.stderr)
+    sys.exit(1)
+
+if "--json" in args:
+    print(json.dumps({"success": True, "error": None, "results": {"detectors": [{
+        "check": "reentrancy-eth", "impact": "High", "confidence": "Medium",
+        "elements": [{"source_mapping": {"lines": [10, 11, 12]}}]
+    }]}}))
+    sys.exit(255)  # Slither exits non-zero when it has findings
+print("Reentrancy in Bench.withdraw() (fake)")
+"""
+
+
+def install_fake_tools(directory):
+    """Writes fake ``solc`` and ``slither`` into ``directory`` and returns it."""
+    os.makedirs(directory, exist_ok=True)
+    for name, source in (("solc", _SOLC), ("slither", _SLITHER)):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(source.replace("@PYTHON@", sys.executable, 1))
+        os.chmod(path, 0o755)
+    return directory
+
+
+def tool_environment(solc_latency=0.0, solc_failure_rate=0.0, slither_latency=0.0, slither_failure_rate=0.0,
+                     jitter=0.3):
+    """Environment variables configuring the fake tools."""
+    return {
+        "FAKE_SOLC_LATENCY": str(solc_latency),
+        "FAKE_SOLC_FAILURE_RATE": str(solc_failure_rate),
+        "FAKE_SOLC_JITTER": str(jitter),
+        "FAKE_SLITHER_LATENCY": str(slither_latency),
+        "FAKE_SLITHER_FAILURE_RATE": str(slither_failure_rate),
+        "FAKE_SLITHER_JITTER": str(jitter),
+    }
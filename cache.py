@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from loguru import logger
+
+def cache_key(*parts):
+    """Content-addressed key: SHA-256 over the JSON encoding of ``parts``."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """SQLite-backed key/value cache with size-bounded LRU eviction.
+
+    Values are bytes (or JSON via ``get_json``/``set_json``). When the stored payload
+    exceeds ``max_bytes``, least recently read entries are evicted until the cache is
+    back under 90% of the bound. Safe to share between threads and processes; for
+    processes on several hosts, open it with ``wal=False``, as WAL needs shared memory.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, wal=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            if wal:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            else:
+                self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        except Exception as e:
+            logger.exception(f"Error opening cache at {path}: {e}")
+            raise e
+
+        logger.success(f"Cache opened at {path} ({self._total_bytes} bytes stored).")
+
+    def get(self, key):
+        """Returns the cached bytes for ``key`` or None, refreshing its LRU position."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Stores ``value`` (bytes) under ``key`` and evicts old entries if over budget."""
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self._total_bytes += len(value) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def get_json(self, key):
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key, value):
+        self.set(key, json.dumps(value).encode("utf-8"))
+
+    def _evict(self):
+        # Other processes may share the file, so recount before deciding what to drop
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+        logger.debug(f"Evicted {len(evicted)} entries from cache {self.path}")
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
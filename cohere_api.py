@@ -1,19 +1,214 @@
 from loguru import logger
+import asyncio
 import cohere
+import httpx
+import threading
+from collections import Counter
 from requests.exceptions import RequestException
-import time
+from config import COHERE_BASE_URL, COHERE_MAX_CONNECTIONS, COHERE_STREAMING
+from rate_limit import estimate_tokens
+from retry import RetryPolicy
+from cache import cache_key
+from contract_stream import ContractStreamMonitor, STREAM_ABORT_AFTER_CHARS
 
-class CohereAPI:
-    def __init__(self, api_key):
-        self.client = cohere.Client(api_key)
+GENERATION_MODEL = 'command-r-plus-08-2024'
+GENERATION_MAX_TOKENS = 2000
+MAX_GENERATIONS_PER_REQUEST = 5  # Upper bound Cohere accepts for num_generations
+SDK_REQUEST_OPTIONS = {"max_retries": 0}  # Retries are left to RetryPolicy so they share one backoff and breaker
+
+class _CohereBase:
+    """Prompt construction, request parameters and caching shared by the sync and async clients."""
+
+    def _init_cache(self, cache):
+        self.cache = cache
+        self._prompt_slots = Counter()
+        self._prompt_slots_lock = threading.Lock()
+
+    def _claim_slots(self, prompt, num_generations, slot=None):
+        """Returns the cache slot indices for this request.
+
+        Without an explicit ``slot``, the n-th generation requested for a prompt gets slot n,
+        so replaying the same sequence of prompts maps onto the same cache entries.
+        """
+        if num_generations < 1:
+            raise ValueError(f"num_generations must be at least 1, got {num_generations}.")
+        with self._prompt_slots_lock:
+            if slot is None:
+                slot = self._prompt_slots[prompt]
+            self._prompt_slots[prompt] = max(self._prompt_slots[prompt], slot + num_generations)
+        return list(range(slot, slot + num_generations))
+
+    def reserve_slots(self, complexity, vulnerabilities, count):
+        """Marks the first ``count`` cache slots of this prompt as taken.
+
+        A resumed run calls this for the contracts it already generated, so the contracts
+        still to come are not served their cached text again.
+        """
+        prompt = self._build_prompt(complexity, vulnerabilities)
+        with self._prompt_slots_lock:
+            self._prompt_slots[prompt] = max(self._prompt_slots[prompt], count)
+
+    def _generation_cache_key(self, prompt, slot):
+        # Keyed on everything that shapes the sample except the batch size
+        params = self._generation_kwargs(prompt)
+        params.pop("num_generations")
+        return cache_key("generate", params, slot)
+
+    def _cache_lookup(self, prompt, slots):
+        """Returns ``{slot: contract}`` for the slots already cached."""
+        if self.cache is None:
+            return {}
+        cached = {}
+        for slot in slots:
+            contract = self.cache.get_json(self._generation_cache_key(prompt, slot))
+            if contract is not None:
+                cached[slot] = contract
+        return cached
+
+    def _cache_store(self, prompt, slots, contracts):
+        if self.cache is None:
+            return
+        for slot, contract in zip(slots, contracts):
+            self.cache.set_json(self._generation_cache_key(prompt, slot), contract)
+
+    def _init_streaming(self, streaming, abort_after_chars):
+        self.streaming = streaming
+        self.stream_abort_after_chars = abort_after_chars
+        self.stream_stats = Counter()
+        self._stream_stats_lock = threading.Lock()
+
+    def _stream_monitors(self, num_generations):
+        return [ContractStreamMonitor(self.stream_abort_after_chars) for _ in range(num_generations)]
+
+    @staticmethod
+    def _on_stream_event(monitors, event):
+        """Feeds one stream event to its generation's monitor; True once every generation is decided."""
+        if event.event_type == "text-generation":
+            monitors[event.index or 0].feed(event.text)
+        return all(monitor.verdict for monitor in monitors)
+
+    def _stream_results(self, monitors, cancelled):
+        """Records stream outcomes and returns the usable generations."""
+        with self._stream_stats_lock:
+            self.stream_stats["streams"] += 1
+            self.stream_stats["cancelled"] += cancelled
+            for monitor in monitors:
+                self.stream_stats["generations"] += 1
+                self.stream_stats["aborted"] += monitor.verdict == "abort"
+                self.stream_stats["stopped_early"] += monitor.verdict == "complete"
+                self.stream_stats["streamed_tokens"] += estimate_tokens(monitor.buffer)
+        for monitor in monitors:
+            if monitor.verdict == "abort":
+                logger.warning(f"Aborted generation with no Solidity after {len(monitor.buffer)} characters.")
+        return [monitor.text for monitor in monitors if monitor.verdict != "abort" and monitor.text]
+
+    @staticmethod
+    def _merge_slots(slots, cached, missing, fresh):
+        """Orders cached and freshly generated contracts by slot."""
+        by_slot = dict(cached)
+        by_slot.update(zip(missing, fresh))
+        return [by_slot[slot] for slot in slots if slot in by_slot]
+
+    @staticmethod
+    def _chat_kwargs(messages):
+        """Maps ``[{"role", "content"}, ...]`` (or plain user strings) onto chat request parameters.
+
+        System messages become the preamble, the last message is the one answered and
+        everything before it is chat history.
+        """
+        turns = [m if isinstance(m, dict) else {"role": "user", "content": m} for m in messages]
+        preamble = "\n\n".join(m["content"] for m in turns if m["role"] == "system")
+        turns = [m for m in turns if m["role"] != "system"]
+        kwargs = dict(
+            model=GENERATION_MODEL,
+            message=turns[-1]["content"],
+            max_tokens=GENERATION_MAX_TOKENS,
+            temperature=0.3,
+        )
+        if preamble:
+            kwargs["preamble"] = preamble
+        if len(turns) > 1:
+            kwargs["chat_history"] = [
+                {"role": "CHATBOT" if m["role"] == "assistant" else "USER", "message": m["content"]}
+                for m in turns[:-1]
+            ]
+        return kwargs
+
+    def _generation_kwargs(self, prompt, num_generations=1):
+        return dict(
+            model=GENERATION_MODEL,
+            prompt=prompt,
+            max_tokens=GENERATION_MAX_TOKENS,
+            temperature=0.5,
+            k=50,
+            p=0.9,
+            frequency_penalty=0.1,
+            presence_penalty=0.0,
+            stop_sequences=["END"],
+            return_likelihoods='NONE',
+            num_generations=num_generations
+        )
+
+    def _budget(self, prompt, max_tokens=GENERATION_MAX_TOKENS, num_generations=1):
+        """Tokens to reserve with the rate limiter: prompt estimate plus the completion ceiling."""
+        return estimate_tokens(prompt) + max_tokens * num_generations
+
+    @staticmethod
+    def _batch_sizes(num_generations):
+        """Splits a generation count into request-sized batches."""
+        if num_generations < 1:
+            raise ValueError(f"num_generations must be at least 1, got {num_generations}.")
+        full, rest = divmod(num_generations, MAX_GENERATIONS_PER_REQUEST)
+        return [MAX_GENERATIONS_PER_REQUEST] * full + ([rest] if rest else [])
+
+    @staticmethod
+    def _texts(response):
+        """Extracts the non-empty generations from a generate response."""
+        return [generation.text for generation in (response.generations or []) if generation.text]
+
+    def _build_prompt(self, complexity, vulnerabilities):
+        """Helper function to build the contract generation prompt."""
+        # Build the vulnerability part of the prompt
+        vulnerability_prompt = f"Generate a Solidity contract with the following vulnerabilities: {', '.join(vulnerabilities)}."
+        logger.debug("Built prompt for complexity '{}' with vulnerabilities {}.", complexity, vulnerabilities)
+        
+        # Ensure no extra spaces or newlines by using strip
+        return f"Complexity level: {complexity}\n{vulnerability_prompt}".strip()
+
+class CohereAPI(_CohereBase):
+    """Cohere client for contract generation.
+
+    With ``streaming=True`` generations are streamed and each is watched by a
+    ``ContractStreamMonitor``: the request is cancelled as soon as every generation is
+    either clearly unusable (no Solidity within ``stream_abort_after_chars``) or has
+    closed its contract, instead of waiting for the full ``max_tokens`` completion.
+    """
+
+    def __init__(self, api_key, base_url=COHERE_BASE_URL, rate_limiter=None, cache=None,
+                 streaming=COHERE_STREAMING, stream_abort_after_chars=STREAM_ABORT_AFTER_CHARS, retry_policy=None):
+        self.client = cohere.Client(api_key, base_url=base_url)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._init_cache(cache)
+        self._init_streaming(streaming, stream_abort_after_chars)
         logger.success("Cohere API client initialized.")
 
     def chat(self, messages):
         """Interact with the Cohere chat API."""
         try:
-            response = self.client.chat(messages=messages)
-            if response.generations and response.generations[0].text:
-                return response.generations[0].text
+            key = cache_key("chat", self._chat_kwargs(messages))
+            if self.cache is not None and (cached := self.cache.get_json(key)) is not None:
+                return cached
+            def attempt():
+                if self.rate_limiter:
+                    self.rate_limiter.acquire(self._budget(str(messages)))
+                return self.client.chat(**self._chat_kwargs(messages), request_options=SDK_REQUEST_OPTIONS)
+
+            response = self.retry_policy.call(attempt, "Chat request")
+            if response.text:
+                if self.cache is not None:
+                    self.cache.set_json(key, response.text)
+                return response.text
             else:
                 logger.error("Invalid or empty response from Cohere chat API.")
                 return None
@@ -26,47 +221,182 @@ class CohereAPI:
 
     def generate_contract(self, complexity, vulnerabilities, retries=3, delay=2):
         """Generates a Solidity contract using Cohere's language model."""
+        contracts = self.generate_contracts(complexity, vulnerabilities, 1, retries=retries, delay=delay)
+        return contracts[0] if contracts else None
+
+    def generate_contracts(self, complexity, vulnerabilities, num_generations=1, retries=3, delay=2, slot=None):
+        """Generates several contract candidates for one prompt.
+
+        Candidates are requested ``num_generations`` at a time (up to Cohere's per-request
+        limit), so the prompt is sent once per batch rather than once per contract.
+        With a cache configured, slots already generated are served from disk and only
+        the missing ones are requested. Returns the non-empty candidates; the list may
+        be shorter than requested.
+        """
         prompt = self._build_prompt(complexity, vulnerabilities)
-        logger.info(f"Generating contract with complexity '{complexity}' and vulnerabilities {vulnerabilities}.")
-        
-        attempt = 0
-        while attempt < retries:
-            try:
-                response = self.client.generate(
-                    model='command-r-plus-08-2024',
-                    prompt=prompt,
-                    max_tokens=2000,
-                    temperature=0.5,
-                    k=50,
-                    p=0.9,
-                    frequency_penalty=0.1,
-                    presence_penalty=0.0,
-                    stop_sequences=["END"],
-                    return_likelihoods='NONE',
-                    num_generations=1
-                )
-
-                if response.generations and response.generations[0].text:
-                    contract_code = response.generations[0].text
-                    logger.success("Contract generation successful.")
-                    return contract_code
-                else:
-                    logger.error("Empty or invalid response from Cohere API.")
-                    return None
-
-            except RequestException as e:
-                logger.warning(f"Network error during contract generation (attempt {attempt + 1}/{retries}): {e}")
-                time.sleep(delay)
-                attempt += 1
-
-        logger.error("Failed to generate contract after multiple attempts.")
-        raise RequestException(f"Failed to generate contract after {retries} attempts.")
+        logger.info(f"Generating {num_generations} contract(s) with complexity '{complexity}' and vulnerabilities {vulnerabilities}.")
 
-    def _build_prompt(self, complexity, vulnerabilities):
-        """Helper function to build the contract generation prompt."""
-        # Build the vulnerability part of the prompt
-        vulnerability_prompt = f"Generate a Solidity contract with the following vulnerabilities: {', '.join(vulnerabilities)}."
-        logger.debug(f"Built prompt for complexity '{complexity}' with vulnerabilities {vulnerabilities}.")
-        
-        # Ensure no extra spaces or newlines by using strip
-        return f"Complexity level: {complexity}\n{vulnerability_prompt}".strip()
+        slots = self._claim_slots(prompt, num_generations, slot)
+        cached = self._cache_lookup(prompt, slots)
+        missing = [s for s in slots if s not in cached]
+
+        fresh = []
+        if missing:
+            for batch_size in self._batch_sizes(len(missing)):
+                fresh.extend(self._request_generations(prompt, batch_size, retries, delay))
+            self._cache_store(prompt, missing, fresh)
+        contracts = self._merge_slots(slots, cached, missing, fresh)
+
+        if contracts:
+            logger.success(f"Contract generation successful ({len(contracts)}/{num_generations} candidates).")
+        else:
+            logger.error("Empty or invalid response from Cohere API.")
+        return contracts
+
+    def _request_generations(self, prompt, num_generations, retries, delay):
+        """Sends one generate request under the retry policy; ``delay`` is the base backoff."""
+        def attempt():
+            if self.rate_limiter:
+                self.rate_limiter.acquire(self._budget(prompt, num_generations=num_generations))
+            if self.streaming:
+                return self._stream_generations(prompt, num_generations)
+            response = self.client.generate(
+                **self._generation_kwargs(prompt, num_generations), request_options=SDK_REQUEST_OPTIONS
+            )
+            return self._texts(response)
+
+        return self.retry_policy.call(attempt, "Contract generation", attempts=retries, base_delay=delay)
+
+    def _stream_generations(self, prompt, num_generations):
+        """Streams one generate request, closing the connection once every generation is decided."""
+        monitors = self._stream_monitors(num_generations)
+        stream = self.client.generate_stream(
+            **self._generation_kwargs(prompt, num_generations), request_options=SDK_REQUEST_OPTIONS
+        )
+        cancelled = False
+        try:
+            for event in stream:
+                if self._on_stream_event(monitors, event):
+                    cancelled = True
+                    break
+        finally:
+            stream.close()  # Exits the SDK's response context, dropping the connection
+        return self._stream_results(monitors, cancelled)
+
+class AsyncCohereAPI(_CohereBase):
+    """Async Cohere client sharing one pooled HTTP session across all in-flight requests.
+
+    Use as ``async with AsyncCohereAPI(key) as api`` (or call ``aclose``) so pooled
+    connections are released. Pass a shared ``RateLimiter`` to keep many concurrent
+    generations within the account's requests/minute and tokens/minute limits.
+    """
+
+    def __init__(self, api_key, base_url=COHERE_BASE_URL, rate_limiter=None,
+                 max_connections=COHERE_MAX_CONNECTIONS, timeout=300, cache=None,
+                 streaming=COHERE_STREAMING, stream_abort_after_chars=STREAM_ABORT_AFTER_CHARS, retry_policy=None):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        self.client = cohere.AsyncClient(api_key, base_url=base_url, httpx_client=self.http_client)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._init_cache(cache)
+        self._init_streaming(streaming, stream_abort_after_chars)
+        logger.success(f"Async Cohere API client initialized (pool size {max_connections}).")
+
+    async def chat(self, messages):
+        """Interact with the Cohere chat API without blocking the event loop."""
+        try:
+            key = cache_key("chat", self._chat_kwargs(messages))
+            if self.cache is not None and (cached := self.cache.get_json(key)) is not None:
+                return cached
+            async def attempt():
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async(self._budget(str(messages)))
+                return await self.client.chat(**self._chat_kwargs(messages), request_options=SDK_REQUEST_OPTIONS)
+
+            response = await self.retry_policy.call_async(attempt, "Chat request")
+            if response.text:
+                if self.cache is not None:
+                    self.cache.set_json(key, response.text)
+                return response.text
+            else:
+                logger.error("Invalid or empty response from Cohere chat API.")
+                return None
+        except (RequestException, httpx.HTTPError) as e:
+            logger.exception(f"Network error during chat interaction: {e}")
+            raise e
+        except Exception as e:
+            logger.exception(f"Unexpected error during chat interaction: {e}")
+            raise e
+
+    async def generate_contract(self, complexity, vulnerabilities, retries=3, delay=2):
+        """Generates a Solidity contract using Cohere's language model."""
+        contracts = await self.generate_contracts(complexity, vulnerabilities, 1, retries=retries, delay=delay)
+        return contracts[0] if contracts else None
+
+    async def generate_contracts(self, complexity, vulnerabilities, num_generations=1, retries=3, delay=2, slot=None):
+        """Generates several contract candidates for one prompt; batches are sent concurrently."""
+        prompt = self._build_prompt(complexity, vulnerabilities)
+        logger.info(f"Generating {num_generations} contract(s) with complexity '{complexity}' and vulnerabilities {vulnerabilities}.")
+
+        slots = self._claim_slots(prompt, num_generations, slot)
+        cached = self._cache_lookup(prompt, slots)
+        missing = [s for s in slots if s not in cached]
+
+        fresh = []
+        if missing:
+            batches = await asyncio.gather(*[
+                self._request_generations(prompt, batch_size, retries, delay)
+                for batch_size in self._batch_sizes(len(missing))
+            ])
+            fresh = [contract for batch in batches for contract in batch]
+            self._cache_store(prompt, missing, fresh)
+        contracts = self._merge_slots(slots, cached, missing, fresh)
+
+        if contracts:
+            logger.success(f"Contract generation successful ({len(contracts)}/{num_generations} candidates).")
+        else:
+            logger.error("Empty or invalid response from Cohere API.")
+        return contracts
+
+    async def _request_generations(self, prompt, num_generations, retries, delay):
+        """Sends one generate request under the retry policy; ``delay`` is the base backoff."""
+        async def attempt():
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async(self._budget(prompt, num_generations=num_generations))
+            if self.streaming:
+                return await self._stream_generations(prompt, num_generations)
+            response = await self.client.generate(
+                **self._generation_kwargs(prompt, num_generations), request_options=SDK_REQUEST_OPTIONS
+            )
+            return self._texts(response)
+
+        return await self.retry_policy.call_async(attempt, "Contract generation", attempts=retries, base_delay=delay)
+
+    async def _stream_generations(self, prompt, num_generations):
+        """Streams one generate request, closing the connection once every generation is decided."""
+        monitors = self._stream_monitors(num_generations)
+        stream = self.client.generate_stream(
+            **self._generation_kwargs(prompt, num_generations), request_options=SDK_REQUEST_OPTIONS
+        )
+        cancelled = False
+        try:
+            async for event in stream:
+                if self._on_stream_event(monitors, event):
+                    cancelled = True
+                    break
+        finally:
+            await stream.aclose()
+        return self._stream_results(monitors, cancelled)
+
+    async def aclose(self):
+        """Closes the pooled HTTP session."""
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
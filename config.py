@@ -1,19 +1,14 @@
 import os
 
-# Directory Paths for logs
+# Directory Paths for logs (created by utils.configure_logging once a run starts)
 LOG_DIR = os.getenv('LOG_DIR', 'logs')
-try:
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
-        print(f"Log directory '{LOG_DIR}' created.")
-except Exception as e:
-    print(f"Error creating log directory '{LOG_DIR}': {e}")
-    raise e
-
 LOG_FILE = os.path.join(LOG_DIR, 'runtime.log')
 
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # Default to INFO level
+LOG_ENQUEUE = os.getenv('LOG_ENQUEUE', 'false').lower() in ('1', 'true', 'yes')  # Write sinks from a background thread
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))  # Share of repeated INFO/DEBUG messages kept (1.0 keeps all)
+LOG_SAMPLE_BURST = int(os.getenv('LOG_SAMPLE_BURST', '20'))  # Messages per call site always kept before sampling starts
 
 # Loguru formatting and style
 LOGURU_FORMAT = (
@@ -22,3 +17,72 @@ LOGURU_FORMAT = (
     "<cyan> {name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
     "<level>{message}</level>"
 )
+
+# Cohere client settings (0 disables a limit)
+COHERE_BASE_URL = os.getenv('COHERE_BASE_URL') or None
+COHERE_MAX_CONNECTIONS = int(os.getenv('COHERE_MAX_CONNECTIONS', '20'))
+COHERE_REQUESTS_PER_MINUTE = int(os.getenv('COHERE_REQUESTS_PER_MINUTE', '0'))
+COHERE_TOKENS_PER_MINUTE = int(os.getenv('COHERE_TOKENS_PER_MINUTE', '0'))
+COHERE_STREAMING = os.getenv('COHERE_STREAMING', 'false').lower() in ('1', 'true', 'yes')
+
+# Retry backoff and circuit breaker shared by all Cohere calls
+COHERE_RETRY_MAX_DELAY = float(os.getenv('COHERE_RETRY_MAX_DELAY', '60'))
+COHERE_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('COHERE_CIRCUIT_FAILURE_THRESHOLD', '5'))
+COHERE_CIRCUIT_COOLDOWN = float(os.getenv('COHERE_CIRCUIT_COOLDOWN', '30'))
+
+# Persistent cache for LLM generations (empty path disables it)
+GENERATION_CACHE_PATH = os.getenv('GENERATION_CACHE_PATH', '')
+GENERATION_CACHE_MAX_MB = int(os.getenv('GENERATION_CACHE_MAX_MB', '512'))
+
+# Rounds of sending solc diagnostics back to the model for a fix (0 disables repair)
+REPAIR_ROUNDS = int(os.getenv('REPAIR_ROUNDS', '0'))
+
+# Directory of cached solc binaries (e.g. ~/.solc-select/artifacts) to pick from by each
+# contract's pragma (empty compiles everything with the solc on PATH)
+SOLC_DIR = os.path.expanduser(os.getenv('SOLC_DIR', ''))
+
+# Persistent cache for solc compilation results (empty path disables it)
+COMPILE_CACHE_PATH = os.getenv('COMPILE_CACHE_PATH', '')
+COMPILE_CACHE_MAX_MB = int(os.getenv('COMPILE_CACHE_MAX_MB', '256'))
+
+# Slither analysis limits (0 disables the timeout / memory cap)
+SLITHER_TIMEOUT = float(os.getenv('SLITHER_TIMEOUT', '300'))
+SLITHER_MEMORY_LIMIT_MB = int(os.getenv('SLITHER_MEMORY_LIMIT_MB', '4096'))
+SLITHER_WORKERS = int(os.getenv('SLITHER_WORKERS', str(os.cpu_count() or 1)))
+SLITHER_STRUCTURED = os.getenv('SLITHER_STRUCTURED', 'false').lower() in ('1', 'true', 'yes')
+
+# SQLite manifest indexing every stored contract (empty path, the default, disables it).
+# Findings are indexed from structured reports, so a manifest switches Slither to SLITHER_STRUCTURED.
+MANIFEST_PATH = os.getenv('MANIFEST_PATH', '')
+MANIFEST_BATCH_SIZE = int(os.getenv('MANIFEST_BATCH_SIZE', '100'))
+
+# Streaming dataset export as compressed JSONL shards (empty directory disables it)
+EXPORT_DIR = os.getenv('EXPORT_DIR', '')
+EXPORT_SHARD_MB = int(os.getenv('EXPORT_SHARD_MB', '256'))
+EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'gzip')
+
+# Near-duplicate filtering between generation and compilation (0 threshold disables it;
+# an empty index path keeps the index in memory for the run only)
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0'))
+NEAR_DUP_ACTION = os.getenv('NEAR_DUP_ACTION', 'skip')  # skip | flag
+NEAR_DUP_INDEX_PATH = os.getenv('NEAR_DUP_INDEX_PATH', '')
+NEAR_DUP_MAX_ENTRIES = int(os.getenv('NEAR_DUP_MAX_ENTRIES', '50000'))
+
+# Coverage-guided parameter scheduling: confirmed contracts wanted per complexity and
+# vulnerability pair (0 keeps random sampling)
+COVERAGE_TARGET = int(os.getenv('COVERAGE_TARGET', '0'))
+
+# Per-run progress journals used to resume interrupted runs (empty directory disables them)
+RUN_DIR = os.getenv('RUN_DIR', 'runs')
+JOURNAL_FSYNC_EVERY = int(os.getenv('JOURNAL_FSYNC_EVERY', '100'))
+
+# Shared SQLite work queue for distributed runs (--enqueue / --worker); keep it on storage
+# every worker host can reach
+WORK_QUEUE_PATH = os.getenv('WORK_QUEUE_PATH', 'queue.sqlite')
+WORK_QUEUE_LEASE_SECONDS = float(os.getenv('WORK_QUEUE_LEASE_SECONDS', '900'))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', '3'))
+WORK_QUEUE_POLL_SECONDS = float(os.getenv('WORK_QUEUE_POLL_SECONDS', '5'))
+
+# End-of-run metrics exports (empty path disables each)
+METRICS_JSON_PATH = os.getenv('METRICS_JSON_PATH', '')
+METRICS_PROMETHEUS_PATH = os.getenv('METRICS_PROMETHEUS_PATH', '')
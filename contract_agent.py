@@ -1,75 +1,669 @@
-import cohere
-from langgraph.graph import StateGraph
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import TypedDict
+from langgraph.graph import StateGraph, START, END
 from loguru import logger
-from cohere_api import CohereAPI
-from storage import ContractStorage
-from solidity_tools import compile_solidity_node, analyze_with_slither_node
+from storage import contract_hash
+from solidity_tools import compile_cache_stats, SolidityCompilationError
+from utils import get_params
+from metrics import PipelineMetrics
+from rate_limit import estimate_tokens
+
+# Bulky state the journal leaves out; compile_status records the compile result instead
+_UNJOURNALED_FIELDS = {"compiled_output"}
+
+# Outcomes of contracts that passed dedupe but were never stored
+_UNSTORED_STATUSES = {"compile_failed", "repair_failed", "rejected", "not_saved"}
+
+# solc diagnostics beyond this are cut before being sent back for repair
+REPAIR_MAX_DIAGNOSTIC_CHARS = 4000
+
+REPAIR_INSTRUCTIONS = (
+    "You fix Solidity compilation errors. Reply with the complete corrected contract in a single "
+    "```solidity code block and nothing else. Change only what the compiler errors require; keep the "
+    "contract's logic, including any intentional vulnerabilities, as it is."
+)
+
+class ContractState(TypedDict, total=False):
+    """State carried through the contract workflow for a single contract."""
+    index: int
+    complexity: str
+    vulnerabilities: list
+    contract_code: str
+    rejection_reason: str  # Why pre-compile validation rejected the output
+    contract_hash: str
+    near_duplicate_of: str  # Hash of an earlier, nearly identical contract
+    similarity: float  # Estimated Jaccard similarity to it
+    compiled_output: str
+    compile_status: str  # "success" or "failed"; survives resume, unlike the (unjournaled) compiler output
+    compile_errors: str  # solc diagnostics of the last failed compilation
+    repair_rounds: int
+    original_tokens: int  # Estimated completion tokens of the generated contract, for repair savings
+    contract_path: str
+    slither_report: object  # Text report, or a list of findings in structured mode
+    report_path: str
+    status: str
+    timings: dict  # Seconds spent in each node
+    last_stage: str  # Most recently completed node, where a resumed contract picks up
 
 class ContractAgent:
-    def __init__(self, cohere_tool, compile_contract_node, analyze_contract_node, storage_tool):
+    def __init__(self, cohere_tool, compile_contract_node, analyze_contract_node, storage_tool,
+                 generations_per_prompt=1, metrics=None, validate_contract_node=None, repair_rounds=0, journal=None,
+                 scheduler=None, near_duplicates=None, near_duplicate_action="skip", rng=None):
         self.cohere_tool = cohere_tool
         self.compile_contract_node = compile_contract_node
         self.analyze_contract_node = analyze_contract_node
+        self.validate_contract_node = validate_contract_node  # Optional in-process check ahead of solc
+        # Failed compiles are sent back through cohere_tool.chat for a fix, up to this many times.
+        # Needs a compile node that raises SolidityCompilationError, since repair works from solc's stderr.
+        self.repair_rounds = repair_rounds
         self.storage_tool = storage_tool
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self.journal = journal  # Optional journal.RunJournal; contracts it lists as finished are skipped
+        # Optional scheduler.CoverageScheduler choosing parameters in place of get_params; the run
+        # ends early once its targets are met. Confirmations come from structured Slither findings.
+        self.scheduler = scheduler
+        # Source for get_params. LangGraph draws checkpoint ids from the global random on every
+        # invoke, inside worker threads, so seeded runs pass their own random.Random here.
+        self.rng = rng if rng is not None else random
+        # Optional near_dup.NearDuplicateIndex consulted after exact dedupe; near-duplicates
+        # are either skipped before compilation ("skip") or carried on marked as such ("flag")
+        if near_duplicate_action not in ("skip", "flag"):
+            raise ValueError(f"near_duplicate_action must be 'skip' or 'flag', got {near_duplicate_action!r}.")
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_action = near_duplicate_action
 
-    def execute(self, num_contracts=1):
-        """Executes the contract workflow for the specified number of contracts."""
-        for i in range(num_contracts):
-            logger.info(f"Starting generation for contract {i+1}/{num_contracts}")
+        # With generations_per_prompt > 1, consecutive contracts share one set of parameters
+        # and their candidates come from a single batched request, buffered per group.
+        if generations_per_prompt < 1:
+            raise ValueError(f"generations_per_prompt must be at least 1, got {generations_per_prompt}.")
+        self.generations_per_prompt = generations_per_prompt
+        self._candidate_groups = {}
+        self._candidate_groups_lock = threading.Lock()
+
+        # Source hashes claimed by this run, so concurrent identical candidates are caught too
+        self._seen_hashes = set()
+        self._seen_hashes_lock = threading.Lock()
+        if journal is not None:
+            self._seen_hashes.update(
+                state["contract_hash"] for state in journal.contracts.values() if state.get("contract_hash")
+            )
+
+        # The workflow is defined and compiled once; every contract invokes the same
+        # compiled graph with its own state, so concurrent invocations can share it.
+        self.graph = self._build_graph()
+
+    def _build_graph(self):
+        """Defines and compiles the contract workflow graph."""
+        contract_graph = StateGraph(ContractState)
+        self._routes = {}  # Node -> router picking what follows it; also used to resume mid-workflow
+        contract_graph.add_node("generate_contract", self._timed("generate_contract", self._generate_contract))
+        contract_graph.add_node("deduplicate_contract", self._timed("deduplicate_contract", self._deduplicate_contract))
+        contract_graph.add_node("compile_contract", self._timed("compile_contract", self._compile_contract))
+        contract_graph.add_node("save_contract", self._timed("save_contract", self._save_contract))
+
+        # Validation cleans up the source before dedupe, so formatting variants hash alike
+        if self.validate_contract_node is not None:
+            contract_graph.add_node("validate_contract", self._timed("validate_contract", self._validate_contract))
+            self._route(contract_graph, "generate_contract", self._next("validate_contract"), ["validate_contract", END])
+            self._route(contract_graph, "validate_contract", self._next("deduplicate_contract"), ["deduplicate_contract", END])
+        else:
+            self._route(contract_graph, "generate_contract", self._next("deduplicate_contract"), ["deduplicate_contract", END])
+        self._route(contract_graph, "deduplicate_contract", self._next("compile_contract"), ["compile_contract", END])
+        if self.repair_rounds:
+            contract_graph.add_node("repair_contract", self._timed("repair_contract", self._repair_contract))
+            self._route(contract_graph, "compile_contract", self._after_compile, ["save_contract", "repair_contract", END])
+            self._route(contract_graph, "repair_contract", self._next("compile_contract"), ["compile_contract", END])
+        else:
+            self._route(contract_graph, "compile_contract", self._next("save_contract"), ["save_contract", END])
+
+        # Slither runs against the saved contract file, so analysis follows saving
+        if self.analyze_contract_node is not None:
+            contract_graph.add_node("analyze_contract", self._timed("analyze_contract", self._analyze_contract))
+            contract_graph.add_node("save_slither_report", self._timed("save_slither_report", self._save_slither_report))
+            self._route(contract_graph, "save_contract", self._next("analyze_contract"), ["analyze_contract", END])
+            self._route(contract_graph, "analyze_contract", self._next("save_slither_report"), ["save_slither_report", END])
+            self._route(contract_graph, "save_slither_report", lambda state: END, [END])
+        else:
+            self._route(contract_graph, "save_contract", lambda state: END, [END])
+
+        # A fresh contract starts at generation; a resumed one continues after its last completed stage
+        contract_graph.add_conditional_edges(START, self._resume_route, [*self._routes, END])
+        return contract_graph.compile()
+
+    def _route(self, contract_graph, node, router, destinations):
+        self._routes[node] = router
+        contract_graph.add_conditional_edges(node, router, destinations)
+
+    def _resume_route(self, state):
+        last_stage = state.get("last_stage")
+        return self._routes[last_stage](state) if last_stage else "generate_contract"
+
+    def _timed(self, name, node):
+        """Wraps a node so its wall time lands in the state's ``timings`` and in ``self.metrics``.
+
+        A node that ends the contract with a ``*_failed``/``*not_saved`` status counts as a
+        stage error, one ending with ``*_timeout`` as a timeout; exceptions count as errors.
+        """
+        def timed_node(state):
+            started = time.perf_counter()
+            with self.metrics.track(name):
+                update = node(state)
+            status = update.get("status") or ""
+            if status.endswith("_timeout"):
+                self.metrics.record_timeout(name)
+            elif status.endswith("_failed") or status.endswith("not_saved"):
+                self.metrics.record_error(name)
+            # Stages revisited by the repair loop accumulate their time
+            timings = state.get("timings", {})
+            elapsed = timings.get(name, 0.0) + time.perf_counter() - started
+            update = {**update, "timings": {**timings, name: elapsed}, "last_stage": name}
+            if self.journal is not None:
+                journaled = {key: value for key, value in update.items() if key not in _UNJOURNALED_FIELDS}
+                self.journal.record_stage(state["index"], name, journaled)
+            return update
+        return timed_node
+
+    @staticmethod
+    def _next(node):
+        """Routes to the given node unless an earlier node has settled the contract's status."""
+        return lambda state: END if state.get("status") else node
+
+    def _after_compile(self, state):
+        """Sends a failed compile with diagnostics to repair while rounds remain."""
+        if state.get("status") == "compile_failed" and state.get("compile_errors") \
+                and state.get("repair_rounds", 0) < self.repair_rounds:
+            return "repair_contract"
+        return END if state.get("status") else "save_contract"
+
+    def _generate_contract(self, state):
+        if self.generations_per_prompt > 1:
+            contract_code = self._next_candidate(state["index"])
+        else:
+            contract_code = self.cohere_tool.generate_contract(state["complexity"], state["vulnerabilities"])
+        if not contract_code:
+            logger.error(f"No contract generated for contract {state['index']+1}")
+            return {"status": "generation_failed"}
+        return {"contract_code": contract_code, "original_tokens": estimate_tokens(contract_code)}
+
+    def _candidate_group(self, i, num_contracts=None):
+        """Returns the candidate group for contract ``i``, creating it on first use."""
+        group_id = i // self.generations_per_prompt
+        with self._candidate_groups_lock:
+            group = self._candidate_groups.get(group_id)
+            if group is None:
+                size = self.generations_per_prompt
+                if num_contracts is not None:
+                    size = min(size, num_contracts - group_id * self.generations_per_prompt)
+                if self.journal is not None:
+                    # Members finished or resumed from the journal take no candidate from this batch
+                    first = group_id * self.generations_per_prompt
+                    size = sum(
+                        1 for j in range(first, first + size)
+                        if j not in self.journal.results and self._resumable_state(j) is None
+                    )
+                complexity, vulnerabilities = self._next_params(size)
+                group = self._candidate_groups[group_id] = {
+                    "complexity": complexity,
+                    "vulnerabilities": vulnerabilities,
+                    "candidates": [],
+                    "remaining": size,
+                    "lock": threading.Lock(),
+                }
+            return group
+
+    def _next_candidate(self, i):
+        """Takes the next buffered candidate for contract ``i``'s group, requesting a batch when empty."""
+        group = self._candidate_group(i)
+        with group["lock"]:
+            if not group["candidates"]:
+                group["candidates"].extend(self.cohere_tool.generate_contracts(
+                    group["complexity"], group["vulnerabilities"], num_generations=group["remaining"]
+                ))
+            group["remaining"] -= 1
+            contract_code = group["candidates"].pop(0) if group["candidates"] else None
+
+        if group["remaining"] == 0:
+            with self._candidate_groups_lock:
+                self._candidate_groups.pop(i // self.generations_per_prompt, None)
+        return contract_code
+
+    def _validate_contract(self, state):
+        """Extracts and normalizes the generated Solidity, rejecting output that cannot compile."""
+        contract_code, rejection_reason = self.validate_contract_node(state["contract_code"])()
+        if rejection_reason:
+            logger.warning(f"Contract {state['index']+1} rejected before compilation: {rejection_reason}")
+            return {"status": "rejected", "rejection_reason": rejection_reason}
+        return {"contract_code": contract_code}
+
+    def _deduplicate_contract(self, state):
+        """Drops exact, and optionally near, duplicates before they reach solc, Slither or storage."""
+        source_hash = contract_hash(state["contract_code"])
+        with self._seen_hashes_lock:
+            duplicate = source_hash in self._seen_hashes
+            self._seen_hashes.add(source_hash)
+
+        if duplicate or self.storage_tool.has_contract(state["contract_code"]):
+            logger.info(f"Contract {state['index']+1} is a duplicate of {source_hash[:12]}; skipping")
+            return {"contract_hash": source_hash, "status": "duplicate"}
+        if self.near_duplicates is None:
+            return {"contract_hash": source_hash}
+
+        flag = self.near_duplicate_action == "flag"
+        match = self.near_duplicates.check_and_add(source_hash, state["contract_code"], add_duplicates=flag)
+        if match is None:
+            return {"contract_hash": source_hash, "near_duplicate_of": None, "similarity": None}
+        near_hash, similarity = match
+        update = {"contract_hash": source_hash, "near_duplicate_of": near_hash, "similarity": similarity}
+        if flag:
+            self.metrics.increment("near_duplicates_flagged")
+            logger.info(f"Contract {state['index']+1} is {similarity:.0%} similar to {near_hash[:12]}; flagged")
+            return update
+        self.metrics.increment("near_duplicates_dropped")
+        logger.info(f"Contract {state['index']+1} is {similarity:.0%} similar to {near_hash[:12]}; skipping")
+        return {**update, "status": "near_duplicate"}
+
+    def _compile_contract(self, state):
+        compile_errors = None
+        try:
+            compiled_output = self.compile_contract_node(state["contract_code"])()
+        except SolidityCompilationError as e:
+            compiled_output, compile_errors = None, e.stderr
+
+        rounds = state.get("repair_rounds", 0)
+        if not compiled_output:
+            if rounds and (rounds >= self.repair_rounds or not compile_errors):
+                self.metrics.increment("repair_failed")
+            return {"status": "compile_failed", "compile_status": "failed", "compile_errors": compile_errors}
+
+        if rounds:
+            # A fresh attempt would have cost at least the original completion again
+            self.metrics.increment("repair_succeeded")
+            self.metrics.increment("repair_tokens_saved", state.get("original_tokens", 0))
+        return {"compiled_output": compiled_output, "compile_status": "success"}
+
+    def _repair_contract(self, state):
+        """Asks the model to fix the compiler errors in place instead of generating a new contract."""
+        rounds = state.get("repair_rounds", 0) + 1
+        messages = [
+            {"role": "system", "content": REPAIR_INSTRUCTIONS},
+            {"role": "user", "content": (
+                f"This contract fails to compile.\n\nCompiler errors:\n"
+                f"{state['compile_errors'][:REPAIR_MAX_DIAGNOSTIC_CHARS]}\n\n"
+                f"Source:\n```solidity\n{state['contract_code']}\n```"
+            )},
+        ]
+        logger.info(f"Repairing contract {state['index']+1} (round {rounds}/{self.repair_rounds})")
+        reply = self.cohere_tool.chat(messages)
+
+        # Repair tokens count against the savings, whether or not the fix compiles
+        spent = estimate_tokens(str(messages)) + estimate_tokens(reply or "")
+        self.metrics.increment("repair_rounds")
+        self.metrics.increment("repair_tokens_spent", spent)
+        self.metrics.increment("repair_tokens_saved", -spent)
+        original_tokens = state.get("original_tokens") or estimate_tokens(state["contract_code"])
+
+        contract_code, rejection_reason = reply, None
+        if reply and self.validate_contract_node is not None:
+            contract_code, rejection_reason = self.validate_contract_node(reply)()
+        if contract_code and contract_hash(contract_code) == state.get("contract_hash"):
+            contract_code, rejection_reason = None, "source unchanged"  # solc would fail the same way again
+        if not contract_code:
+            logger.error(f"Repair of contract {state['index']+1} returned no usable source: {rejection_reason or 'empty reply'}")
+            self.metrics.increment("repair_failed")
+            return {"status": "repair_failed", "repair_rounds": rounds, "original_tokens": original_tokens}
+
+        update = {
+            "contract_code": contract_code,
+            "status": None,
+            "compile_errors": None,
+            "repair_rounds": rounds,
+            "original_tokens": original_tokens,
+        }
+        # The repaired source is a new contract as far as dedupe and storage are concerned,
+        # and it replaces the broken one rather than duplicating it
+        if self.near_duplicates is not None:
+            self.near_duplicates.discard(state["contract_hash"])
+        return {**update, **self._deduplicate_contract({**state, "contract_code": contract_code})}
+
+    def _save_contract(self, state):
+        contract_path = self.storage_tool.save_contract(state["contract_code"])
+        if not contract_path:
+            logger.error(f"Contract {state['index']+1} was not saved")
+            return {"status": "not_saved"}
+        if self.analyze_contract_node is None:
+            return {"contract_path": contract_path, "status": "completed"}
+        return {"contract_path": contract_path}
+
+    def _analyze_contract(self, state):
+        try:
+            slither_report = self.analyze_contract_node(state["contract_path"])()
+        except TimeoutError:
+            logger.error(f"Slither analysis timed out for contract {state['index']+1}")
+            return {"status": "analysis_timeout"}
+        if slither_report is None or slither_report == "":  # An empty findings list is a clean result
+            return {"status": "analysis_failed"}
+        return {"slither_report": slither_report}
+
+    def _save_slither_report(self, state):
+        report_path = self.storage_tool.save_slither_report(state["contract_path"], state["slither_report"])
+        if not report_path:
+            logger.error(f"Slither report not saved for contract {state['index']+1}")
+            return {"status": "report_not_saved"}
+        logger.success(f"Slither report saved for contract {state['index']+1}")
+        return {"report_path": report_path, "status": "completed"}
+
+    def execute(self, num_contracts=1, concurrency=1):
+        """Executes the contract workflow for the specified number of contracts.
+
+        With ``concurrency`` > 1 up to that many contracts are kept in flight at once,
+        each carried through generate -> compile -> analyze -> save by its own worker.
+        A new contract is only admitted once an in-flight one finishes, so a slow stage
+        holds back intake instead of queueing unbounded work behind it.
+
+        With a coverage scheduler, ``num_contracts`` is a budget: no new contract is started
+        once the scheduler's targets are met.
+
+        Returns the per-contract results in contract order, regardless of completion order.
+        """
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1, got {concurrency}.")
 
-            try:
-                # Define tasks
-                generate_contract_task = self.cohere_tool.chat
-                compile_contract_task = self.compile_contract_node
-                analyze_contract_task = self.analyze_contract_node
-                save_contract_task = self.storage_tool.save_contract
-                save_slither_report_task = self.storage_tool.save_slither_report
-
-                # Build the graph
-                contract_graph = StateGraph(dict)
-                contract_graph.add_node("generate_contract", generate_contract_task)
-                contract_graph.add_node("compile_contract", compile_contract_task)
-
-                # Ensure proper flow with Slither analysis and saving of contract/report
-                contract_graph.add_node("analyze_contract", analyze_contract_task)
-                contract_graph.add_edge("compile_contract", "analyze_contract")
-                contract_graph.add_edge("analyze_contract", "save_contract")
-
-                contract_graph.add_edge("generate_contract", "compile_contract")
-                contract_graph.add_node("save_contract", save_contract_task)
-                contract_graph.add_node("save_slither_report", save_slither_report_task)
-                contract_graph.add_edge("save_contract", "save_slither_report")
-
-                # Initialize the state that will be passed between nodes
-                state = {"messages": []}
-
-                # Execute the graph starting from the first node
-                logger.info("Executing contract generation workflow...")
-                result = contract_graph.execute("generate_contract", state)
-
-                # Debugging: Log the state after each major step
-                logger.debug(f"Graph execution result: {result}")
-                logger.debug(f"Current state: {state}")
-
-                if result:
-                    logger.success(f"Contract {i+1}/{num_contracts} execution workflow completed")
-
-                    # Check if save_contract and save_slither_report are called
-                    save_contract_result = contract_graph.get_node_result("save_contract", state)
-                    logger.debug(f"save_contract_result: {save_contract_result}")
-
-                    if save_contract_result:
-                        save_slither_report_result = contract_graph.get_node_result("save_slither_report", state)
-                        logger.debug(f"save_slither_report_result: {save_slither_report_result}")
-
-                        if save_slither_report_result:
-                            logger.success(f"Slither report saved for contract {i+1}")
-                        else:
-                            logger.error(f"Slither report not saved for contract {i+1}")
+        # Contracts a resumed run already finished keep their journaled results
+        finished = self.journal.results if self.journal is not None else {}
+        if finished:
+            logger.info(f"Resuming run: {len(finished)} of {num_contracts} contracts already finished")
+        results = [finished.get(i) for i in range(num_contracts)]
+        todo = [i for i in range(num_contracts) if i not in finished]
+        if self.journal is not None:
+            self._reserve_journaled_slots()
+        if self.scheduler is not None:
+            # Coverage already confirmed by finished contracts still counts toward the targets
+            for outcome in finished.values():
+                detectors = outcome.get("detectors") or []
+                self.scheduler.record(outcome["complexity"], outcome["vulnerabilities"], [{"detector": d} for d in detectors])
+
+        if concurrency == 1:
+            for i in todo:
+                if self._coverage_met():
+                    break
+                results[i] = self._run_contract(i, num_contracts, self._draw_params(i, num_contracts))
+            return self._finish_run(results)
+
+        logger.info(f"Running {len(todo)} contracts with up to {concurrency} in flight")
+        indices = iter(todo)
+
+        def submit(i):
+            # Parameters are drawn here, in index order, so a seeded run matches a serial one
+            return pool.submit(self._run_contract, i, num_contracts, self._draw_params(i, num_contracts))
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="contract") as pool:
+            pending = {submit(i): i for i in itertools.islice(indices, concurrency)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+
+                    next_index = next(indices, None)
+                    if next_index is not None and not self._coverage_met():
+                        pending[submit(next_index)] = next_index
+
+        return self._finish_run(results)
+
+    def work(self, queue, concurrency=1, poll_interval=5.0):
+        """Leases contract jobs from a shared ``work_queue.WorkQueue`` until it is drained.
+
+        Any number of workers, on any hosts, can run this against the same queue. Up to
+        ``concurrency`` jobs are in flight at once; their leases are renewed while they
+        run, finished jobs are acknowledged with their result, and jobs that raised are
+        handed back for another attempt. While other workers still hold leases, this one
+        keeps polling, so it picks up their jobs should they crash.
+
+        Returns the results of the jobs this worker ran, in completion order.
+        """
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1, got {concurrency}.")
+        if self.generations_per_prompt > 1:
+            raise ValueError("Queued jobs carry one contract each; use generations_per_prompt=1 with a work queue.")
+
+        total = sum(queue.counts().values())
+        logger.info(f"Worker {queue.worker_id} taking jobs from {queue.path} with up to {concurrency} in flight")
+        results = []
+        in_flight = {}
+        renew_every = queue.lease_seconds / 3
+        renewed = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="contract") as pool:
+            while True:
+                if len(in_flight) < concurrency:
+                    for job in queue.lease(concurrency - len(in_flight)):
+                        params = (job.params["complexity"], job.params["vulnerabilities"])
+                        in_flight[pool.submit(self._run_contract, job.id - 1, total, params)] = job
+                if not in_flight:
+                    if queue.drained():
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(in_flight, timeout=min(poll_interval, renew_every), return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, result = in_flight.pop(future), future.result()
+                    if result["status"] == "error":
+                        queue.fail(job.id, result["error"])
                     else:
-                        logger.error(f"Contract {i+1} was not saved")
-                else:
-                    logger.error(f"Contract {i+1} workflow failed")
+                        queue.ack(job.id, result)
+                    results.append(result)
+
+                if time.monotonic() - renewed >= renew_every:
+                    queue.renew([job.id for job in in_flight.values()])
+                    renewed = time.monotonic()
+
+        logger.info(f"Work queue drained: {queue.counts()}")
+        self._log_summary(results)
+        return results
+
+    def _coverage_met(self):
+        return self.scheduler is not None and self.scheduler.done
+
+    def _finish_run(self, results):
+        # Contracts never started because coverage was already met are left out
+        results = [result for result in results if result is not None]
+        self._log_summary(results)
+        return results
+
+    def _draw_params(self, i, num_contracts):
+        """Parameters for contract ``i``, or None if it resumes from the journal with its own."""
+        if self._resumable_state(i) is not None:
+            return None
+        if self.generations_per_prompt > 1:
+            group = self._candidate_group(i, num_contracts)
+            return group["complexity"], group["vulnerabilities"]
+        return self._next_params()
+
+    def _next_params(self, count=1):
+        """Parameters for the next ``count`` contracts, from the coverage scheduler if there is one."""
+        if self.scheduler is not None:
+            return self.scheduler.next_params(count)
+        return get_params(self.rng)
+
+    @staticmethod
+    def _manifest_record(state):
+        """Builds the manifest row for a finished contract from its final state."""
+        report = state.get("slither_report")
+        return {
+            "contract_hash": state["contract_hash"],
+            "complexity": state.get("complexity"),
+            "vulnerabilities": state.get("vulnerabilities"),
+            "status": state.get("status"),
+            "compile_status": state.get("compile_status"),
+            "contract_path": state.get("contract_path"),
+            "report_path": state.get("report_path"),
+            "findings": report if isinstance(report, list) else [],
+            "report": report if isinstance(report, str) else None,
+            "contract_code": state.get("contract_code"),
+            "timings": state.get("timings", {}),
+        }
+
+    def _log_summary(self, results):
+        """Logs the end-of-run summary: outcomes per status and cache effectiveness."""
+        statuses = Counter(result["status"] for result in results)
+        logger.info(f"Run summary: {len(results)} contracts, {dict(statuses)}")
+        rejections = Counter(result["rejection_reason"] for result in results if result.get("rejection_reason"))
+        if rejections:
+            logger.info(f"Rejected before compilation: {dict(rejections)}")
+
+        if self.near_duplicates is not None:
+            stats = self.near_duplicates.stats()
+            logger.info(
+                f"Near-duplicates: {stats['matched']} of {stats['checked']} checked contracts "
+                f"{'flagged' if self.near_duplicate_action == 'flag' else 'skipped'}; index holds {stats['entries']}"
+            )
+
+        for name, stage in self.metrics.summary()["stages"].items():
+            latency = stage["latency_seconds"]
+            logger.info(
+                f"Stage {name}: {stage['count']} runs, p50 {latency['p50']:.3f}s, p95 {latency['p95']:.3f}s, "
+                f"{stage['errors']} errors, {stage['timeouts']} timeouts, peak {stage['max_in_flight']} in flight"
+            )
+
+        counters = self.metrics.summary()["counters"]
+        if counters.get("repair_rounds"):
+            repaired, failed = counters.get("repair_succeeded", 0), counters.get("repair_failed", 0)
+            logger.info(
+                f"Repair: {repaired}/{repaired + failed} contracts fixed "
+                f"({repaired / max(repaired + failed, 1):.0%} success) in {counters['repair_rounds']} rounds, "
+                f"~{counters.get('repair_tokens_saved', 0)} tokens saved vs. regenerating"
+            )
+
+        if self.scheduler is not None:
+            coverage = self.scheduler.summary()
+            unmet = [name for name, bucket in coverage["buckets"].items() if bucket["confirmed"] < bucket["target"]]
+            logger.info(
+                f"Coverage: {coverage['coverage']:.0%} of targets confirmed by Slither in {len(results)} contracts"
+                + (f"; {len(unmet)} buckets short: {', '.join(unmet)}" if unmet else "")
+            )
+
+        compile_stats = compile_cache_stats()
+        if compile_stats:
+            logger.info(
+                f"Compile cache: {compile_stats['hits']} hits / {compile_stats['misses']} misses "
+                f"({compile_stats['hit_rate']:.0%} hit rate), saved {compile_stats['saved_seconds']:.1f}s of solc time"
+            )
+
+    def _reserve_journaled_slots(self):
+        """Keeps the generation cache from serving contracts the journaled ones already took.
+
+        Slots are numbered per prompt and start at 0 in every process, so without this a
+        resumed run is handed the cached text of finished contracts, only to drop it as a
+        duplicate.
+        """
+        started = Counter(
+            (state["complexity"], tuple(state["vulnerabilities"]))
+            for state in self.journal.contracts.values() if state.get("complexity") is not None
+        )
+        for (complexity, vulnerabilities), count in started.items():
+            self.cohere_tool.reserve_slots(complexity, list(vulnerabilities), count)
+
+    def _resumable_state(self, i):
+        """Journaled state to continue contract ``i`` from, or None to start it afresh."""
+        if self.journal is None:
+            return None
+        state = self.journal.contracts.get(i)
+        # An untaken batched candidate was lost with the interrupted run, so the contract starts over
+        if state and self.generations_per_prompt > 1 and not state.get("contract_code"):
+            return None
+        return state
+
+    def _run_contract(self, i, num_contracts, params=None):
+        """Runs the workflow for a single contract; failures are contained to that contract.
+
+        ``params`` (complexity, vulnerabilities) are drawn by the caller, on the dispatching
+        thread for ``execute`` or from the job for ``work``; otherwise they are drawn here.
+        """
+        complexity = vulnerabilities = None
+        try:
+            resumed = self._resumable_state(i)
+            if resumed:
+                logger.info(f"Resuming contract {i+1}/{num_contracts} after {resumed.get('last_stage') or 'start'}")
+                result = self._invoke(dict(resumed), num_contracts)
+                return self._finish_contract(i, resumed["complexity"], resumed["vulnerabilities"], result)
+
+            logger.info(f"Starting generation for contract {i+1}/{num_contracts}")
+            if params is not None:
+                complexity, vulnerabilities = params
+            elif self.generations_per_prompt > 1:
+                group = self._candidate_group(i, num_contracts)
+                complexity, vulnerabilities = group["complexity"], group["vulnerabilities"]
+            else:
+                complexity, vulnerabilities = self._next_params()
+            if complexity is None and self._coverage_met():
+                logger.info(f"Coverage targets met; not starting contract {i+1}")
+                return None
+            if complexity is None:
+                logger.error(f"Could not generate parameters for contract {i+1}")
+                self.metrics.record_outcome("error")
+                return {"index": i, "status": "error", "error": "parameter generation failed"}
+
+            # Each contract gets a fresh state; the compiled graph itself is shared
+            state = {"index": i, "complexity": complexity, "vulnerabilities": vulnerabilities}
+            if self.journal is not None:
+                self.journal.record_start(i, state)
+
+            result = self._invoke(state, num_contracts)
+            return self._finish_contract(i, complexity, vulnerabilities, result)
+
+        except Exception as e:
+            logger.exception(f"Error in workflow execution for contract {i+1}: {e}")
+            self.metrics.record_outcome("error")
+            if self.scheduler is not None and complexity is not None:
+                self.scheduler.record(complexity, vulnerabilities, [])
+            return {"index": i, "status": "error", "error": str(e)}
+
+    def _invoke(self, state, num_contracts):
+        logger.info("Executing contract generation workflow...")
+        result = self.graph.invoke(state)
+        logger.opt(lazy=True).debug("Graph execution result: {}", lambda: result)  # Only formatted if DEBUG is on
+
+        if result.get("status") == "completed":
+            logger.success(f"Contract {state['index']+1}/{num_contracts} execution workflow completed")
+        else:
+            logger.error(f"Contract {state['index']+1} workflow failed: {result.get('status')}")
+        return result
+
+    def _finish_contract(self, i, complexity, vulnerabilities, result):
+        """Indexes a contract that went through the workflow and builds its run result."""
+        # Duplicates are already indexed under their first occurrence, near-duplicates were never kept
+        if result.get("contract_hash") and result.get("status") not in ("duplicate", "near_duplicate"):
+            self.storage_tool.record_contract(self._manifest_record(result))
+
+        # An unstored contract must not make a later, working near-identical one its near-duplicate
+        if self.near_duplicates is not None and result.get("status") in _UNSTORED_STATUSES and result.get("contract_hash"):
+            self.near_duplicates.discard(result["contract_hash"])
 
-            except Exception as e:
-                logger.exception(f"Error in workflow execution for contract {i+1}: {e}")
+        self.metrics.record_outcome(result.get("status", "failed"))
+        report = result.get("slither_report")
+        findings = report if isinstance(report, list) else []
+        if self.scheduler is not None:
+            self.scheduler.record(complexity, vulnerabilities, findings)
+        outcome = {
+            "index": i,
+            "status": result.get("status", "failed"),
+            "complexity": complexity,
+            "vulnerabilities": vulnerabilities,
+            "contract_hash": result.get("contract_hash"),
+            "contract_path": result.get("contract_path"),
+            "report_path": result.get("report_path"),
+            "rejection_reason": result.get("rejection_reason"),
+            "repair_rounds": result.get("repair_rounds", 0),
+            "near_duplicate_of": result.get("near_duplicate_of"),
+            # Detectors Slither confirmed, from structured reports; lets a resumed run restore coverage
+            "detectors": sorted({finding.get("detector") for finding in findings if finding.get("detector")}),
+        }
+        # Contracts that raised never get here, so a resumed run retries them
+        if self.journal is not None:
+            self.journal.record_result(i, outcome)
+        return outcome
@@ -0,0 +1,109 @@
+import re
+
+# Output without any Solidity after this many characters is treated as off the rails
+STREAM_ABORT_AFTER_CHARS = 600
+
+# Anchored to the start of a line, so prose like "I can't write a contract that..." is not code
+_SOLIDITY_START = re.compile(
+    r'^[ \t]*(//\s*SPDX|pragma\s+solidity|import\s|(abstract\s+)?contract\s+\w|library\s+\w|interface\s+\w)', re.M
+)
+
+# Words that may open another top-level declaration after a contract has closed
+_TOP_LEVEL_WORDS = {
+    'abstract', 'contract', 'interface', 'library', 'struct', 'enum', 'function', 'event',
+    'error', 'type', 'using', 'import', 'pragma', 'constant', 'uint256', 'address',
+}
+
+class ContractStreamMonitor:
+    """Watches a streamed generation and decides when to stop reading it.
+
+    ``feed`` returns None while the output should keep streaming, ``"abort"`` once no
+    Solidity has appeared within ``abort_after_chars``, and ``"complete"`` once every
+    top-level declaration is closed and what follows is not more code (a closing code
+    fence, prose or a stop marker). Braces inside comments and strings are ignored.
+    """
+
+    def __init__(self, abort_after_chars=STREAM_ABORT_AFTER_CHARS):
+        self.abort_after_chars = abort_after_chars
+        self.buffer = ""
+        self.verdict = None
+        self._seen_code = False
+        self._depth = 0
+        self._end = None  # Offset just past the last '}' that closed a top-level declaration
+        self._scanned = 0
+        self._comment_start = 0
+        self._state = "code"  # code | line_comment | block_comment | string
+        self._quote = None
+        self._escaped = False
+
+    @property
+    def text(self):
+        """The generation so far, cut at the end of the contract once complete."""
+        if self.verdict == "complete":
+            return self.buffer[:self._end]
+        return self.buffer
+
+    def feed(self, chunk):
+        if self.verdict is not None:
+            return self.verdict
+        self.buffer += chunk
+
+        if not self._seen_code:
+            start = _SOLIDITY_START.search(self.buffer)
+            if start is None:
+                if len(self.buffer) >= self.abort_after_chars:
+                    self.verdict = "abort"
+                return self.verdict
+            # Scan from the code itself so apostrophes in leading prose don't open strings
+            self._seen_code = True
+            self._scanned = start.start()
+
+        self._scan()
+        if self._end is not None and self._depth == 0 and self._trailer_is_not_code():
+            self.verdict = "complete"
+        return self.verdict
+
+    def _scan(self):
+        buffer = self.buffer
+        for i in range(self._scanned, len(buffer)):
+            char = buffer[i]
+            following = buffer[i + 1] if i + 1 < len(buffer) else ""
+            if self._state == "line_comment":
+                if char == "\n":
+                    self._state = "code"
+            elif self._state == "block_comment":
+                if char == "/" and buffer[i - 1] == "*" and i - 1 > self._comment_start:
+                    self._state = "code"
+            elif self._state == "string":
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._state = "code"
+            elif char == "/" and following in ("/", "*"):
+                self._state = "line_comment" if following == "/" else "block_comment"
+                self._comment_start = i + 1
+            elif char == "/" and not following:
+                break  # Could open a comment; decide once the next chunk arrives
+            elif char in ('"', "'"):
+                self._state, self._quote = "string", char
+            elif char == "{":
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = i + 1
+            self._scanned = i + 1
+
+    def _trailer_is_not_code(self):
+        trailer = self.buffer[self._end:].lstrip()
+        if trailer.startswith(("```", "END")):
+            return True
+        if trailer.startswith(("//", "/*")) or trailer == "/":
+            return False  # A comment, or a '/' that may open one once the next chunk arrives
+        word = re.match(r'([A-Za-z_]\w*)\W', trailer)
+        if word:
+            return word.group(1) not in _TOP_LEVEL_WORDS
+        # Punctuation or prose that cannot start a declaration; anything else is undecided
+        return bool(trailer) and not trailer[0].isalpha() and trailer[0] != "_"
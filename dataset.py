@@ -0,0 +1,116 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import re
+import threading
+from loguru import logger
+
+# Compression name -> (file extension, opener accepting a path or binary file object)
+COMPRESSIONS = {
+    "gzip": (".gz", gzip.open),
+    "bz2": (".bz2", bz2.open),
+    "xz": (".xz", lzma.open),
+    "none": ("", None),
+}
+
+class ShardedJSONLWriter:
+    """Streams records into size-bounded, compressed JSONL shards.
+
+    Shards are named ``<prefix>-00000.jsonl.gz`` and so on. A shard is written under a
+    ``.partial`` name and renamed once closed, so consumers only ever see complete
+    shards. A shard holds at most ``max_shard_bytes`` of uncompressed JSONL (a single
+    oversized record still gets a shard of its own), so its compressed size is bounded
+    too, independent of how much the compressor is buffering.
+    """
+
+    def __init__(self, directory, max_shard_bytes=256 * 1024 * 1024, compression="gzip", prefix="contracts"):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression '{compression}'. Choose from {sorted(COMPRESSIONS)}.")
+        self.directory = directory
+        self.max_shard_bytes = max_shard_bytes
+        self.compression = compression
+        self.prefix = prefix
+        self.shards = []
+        self.records_written = 0
+        self._lock = threading.Lock()
+        self._raw = None
+        self._stream = None
+        self._shard_path = None
+        self._shard_bytes = 0
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except Exception as e:
+            logger.exception(f"Error creating export directory '{directory}': {e}")
+            raise e
+
+        # Continue numbering after the highest shard left by earlier runs (.partial included),
+        # so shards a consumer already moved away never cause an existing one to be overwritten
+        shard_name = re.compile(rf"{re.escape(prefix)}-(\d+)\.jsonl")
+        numbers = [int(match.group(1)) for match in map(shard_name.match, os.listdir(directory)) if match]
+        self._next_index = max(numbers, default=-1) + 1
+
+    def write(self, record):
+        """Appends one record, rotating to a new shard when the current one is full."""
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            if self._stream is None or (self._shard_bytes and self._shard_bytes + len(line) > self.max_shard_bytes):
+                self._rotate()
+            self._stream.write(line)
+            self._shard_bytes += len(line)
+            self.records_written += 1
+
+    def _rotate(self):
+        self._close_shard()
+        extension = COMPRESSIONS[self.compression][0]
+        self._shard_path = os.path.join(self.directory, f"{self.prefix}-{self._next_index:05d}.jsonl{extension}")
+        self._next_index += 1
+        self._shard_bytes = 0
+        self._raw = open(self._shard_path + ".partial", "wb")
+        opener = COMPRESSIONS[self.compression][1]
+        self._stream = opener(self._raw, "wb") if opener else self._raw
+
+    def _close_shard(self):
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        os.replace(self._shard_path + ".partial", self._shard_path)
+        self.shards.append(self._shard_path)
+        logger.info(f"Export shard completed: {self._shard_path}")
+        self._stream = self._raw = None
+
+    def close(self):
+        with self._lock:
+            self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _open_shard(path):
+    for extension, opener in COMPRESSIONS.values():
+        if opener and path.endswith(extension):
+            return opener(path, "rb")
+    return open(path, "rb")
+
+def iter_records(path):
+    """Yields records from a shard file or every complete shard in a directory, one line at a time."""
+    if os.path.isdir(path):
+        shard_paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if ".jsonl" in name and not name.endswith(".partial")
+        )
+    else:
+        shard_paths = [path]
+
+    for shard_path in shard_paths:
+        with _open_shard(shard_path) as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+class RunJournal:
+    """Append-only JSONL journal of a run's per-contract progress, used to resume it.
+
+    Every started contract appends its initial state, every completed workflow stage its
+    state update, and every finished contract its result. Lines are written straight to the OS and fsync'd in batches
+    (every ``fsync_every`` records or ``fsync_interval`` seconds, and on ``close``), so
+    journaling is cheap while a crash loses at most the last unsynced batch.
+
+    Opening an existing journal replays it: ``contracts`` maps each contract index to
+    its accumulated state and ``results`` holds the contracts that already finished. A
+    torn last line from a crash is cut off, so appending resumes on a clean line.
+    """
+
+    def __init__(self, path, fsync_every=100, fsync_interval=1.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.run = {}
+        self.contracts = {}
+        self.results = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+        try:
+            if os.path.exists(path):
+                self._replay()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+        except Exception as e:
+            logger.exception(f"Error opening run journal at {path}: {e}")
+            raise e
+
+    @property
+    def run_id(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    def _replay(self):
+        complete = 0  # Bytes up to the end of the last newline-terminated line
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn tail: dropped below, or the next record would be appended onto it
+                complete += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line in run journal {self.path}")
+                    continue
+                if "run" in entry:
+                    self.run.update(entry["run"])
+                elif "state" in entry:
+                    self.contracts[entry["index"]] = entry["state"]
+                elif "finished" in entry:
+                    self.results[entry["index"]] = entry["finished"]
+                else:
+                    self.contracts.setdefault(entry["index"], {}).update(entry["update"])
+        if complete < os.path.getsize(self.path):
+            logger.warning(f"Truncating torn last line of run journal {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(complete)
+        logger.info(
+            f"Replayed run journal {self.path}: {len(self.results)} contracts finished, "
+            f"{len(set(self.contracts) - set(self.results))} in progress"
+        )
+
+    def start(self, **run):
+        """Records the run's settings (e.g. ``num_contracts``) unless resuming an existing run."""
+        if not self.run:
+            self.run = run
+            self._append({"run": run})
+
+    def record_start(self, index, state):
+        """Records contract ``index``'s initial state, superseding anything journaled for it before."""
+        self._append({"index": index, "state": state})
+
+    def record_stage(self, index, stage, update):
+        """Records that ``stage`` completed for contract ``index`` with the given state update."""
+        self._append({"index": index, "stage": stage, "update": update})
+
+    def record_result(self, index, result):
+        """Records that contract ``index`` finished; it is skipped when the run is resumed."""
+        self._append({"index": index, "finished": result})
+
+    def _append(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync_locked()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
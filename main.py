@@ -1,31 +1,245 @@
 import argparse
-from contract_agent import ContractAgent
-from cohere_api import CohereAPI
-from solidity_tools import compile_solidity_node, analyze_with_slither_node
+import os
+import random
+import time
+from loguru import logger
+from cache import DiskCache
+from config import (
+    COHERE_REQUESTS_PER_MINUTE, COHERE_TOKENS_PER_MINUTE, COHERE_STREAMING,
+    COHERE_RETRY_MAX_DELAY, COHERE_CIRCUIT_FAILURE_THRESHOLD, COHERE_CIRCUIT_COOLDOWN,
+    GENERATION_CACHE_PATH, GENERATION_CACHE_MAX_MB,
+    COMPILE_CACHE_PATH, COMPILE_CACHE_MAX_MB, REPAIR_ROUNDS, SOLC_DIR,
+    SLITHER_TIMEOUT, SLITHER_MEMORY_LIMIT_MB, SLITHER_WORKERS, SLITHER_STRUCTURED,
+    MANIFEST_PATH, MANIFEST_BATCH_SIZE,
+    EXPORT_DIR, EXPORT_SHARD_MB, EXPORT_COMPRESSION,
+    METRICS_JSON_PATH, METRICS_PROMETHEUS_PATH, RUN_DIR, JOURNAL_FSYNC_EVERY, LOG_FILE, COVERAGE_TARGET,
+    NEAR_DUP_THRESHOLD, NEAR_DUP_ACTION, NEAR_DUP_INDEX_PATH, NEAR_DUP_MAX_ENTRIES,
+    WORK_QUEUE_PATH, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS, WORK_QUEUE_POLL_SECONDS
+)
+from dataset import ShardedJSONLWriter
+from journal import RunJournal
+from manifest import ContractManifest
+from metrics import PipelineMetrics
+from near_dup import NearDuplicateIndex
+from rate_limit import RateLimiter
+from scheduler import CoverageScheduler
+from solc_versions import SolcVersionManager
+from solidity_tools import (
+    compile_solidity_checked_node, validate_solidity_node, enable_compile_cache, enable_solc_versions, SlitherExecutor
+)
 from storage import ContractStorage
+from utils import configure_logging, get_params
+from work_queue import WorkQueue
 
 def main():
     # Argument parser for number of contracts
     parser = argparse.ArgumentParser(description="Smart contract generation and analysis.")
     parser.add_argument('-c', '--contracts', type=int, default=1, help="Number of contracts to generate")
+    parser.add_argument('-j', '--concurrency', type=int, default=1, help="Maximum number of contracts in flight at once")
+    parser.add_argument('-k', '--generations-per-prompt', type=int, default=1, help="Contract candidates requested per prompt in one API call")
+    parser.add_argument('--stream', action='store_true', default=COHERE_STREAMING, help="Stream generations and cancel them as soon as they are unusable or complete")
+    parser.add_argument('--repair-rounds', type=int, default=REPAIR_ROUNDS, help="Rounds of sending compiler errors back to the model for a fix (0 disables)")
+    parser.add_argument('--generation-cache', default=GENERATION_CACHE_PATH, help="SQLite file caching LLM generations across runs")
+    parser.add_argument('--compile-cache', default=COMPILE_CACHE_PATH, help="SQLite file caching solc results across runs")
+    parser.add_argument('--solc-dir', default=SOLC_DIR, help="Directory of solc binaries to pick from by each contract's pragma")
+    parser.add_argument('--analysis-workers', type=int, default=SLITHER_WORKERS, help="Maximum number of parallel Slither processes")
+    parser.add_argument('--analysis-timeout', type=float, default=SLITHER_TIMEOUT, help="Seconds before a Slither job is killed (0 disables)")
+    parser.add_argument('--structured-reports', action='store_true', default=SLITHER_STRUCTURED, help="Store compact JSON findings instead of raw Slither text (implied by --manifest and --coverage-target)")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help="SQLite manifest indexing generated contracts and their findings; implies --structured-reports (off by default)")
+    parser.add_argument('--export-dir', default=EXPORT_DIR, help="Directory for streaming compressed JSONL dataset shards")
+    parser.add_argument('--metrics-json', default=METRICS_JSON_PATH, help="Write the end-of-run stage metrics summary as JSON")
+    parser.add_argument('--metrics-prom', default=METRICS_PROMETHEUS_PATH, help="Write stage metrics in Prometheus text format")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for parameter sampling, making runs replayable from the cache")
+    parser.add_argument('--near-dup-threshold', type=float, default=NEAR_DUP_THRESHOLD, help="Similarity above which a contract counts as a near-duplicate of an earlier one (0 disables)")
+    parser.add_argument('--near-dup-action', choices=['skip', 'flag'], default=NEAR_DUP_ACTION, help="Skip near-duplicates before compilation, or only flag them")
+    parser.add_argument('--near-dup-index', default=NEAR_DUP_INDEX_PATH, help="SQLite file persisting near-duplicate signatures across runs")
+    parser.add_argument('--coverage-target', type=int, default=COVERAGE_TARGET, help="Stop once Slither confirms this many contracts per complexity/vulnerability pair; --contracts becomes the budget (0 disables)")
+    parser.add_argument('--run-dir', default=RUN_DIR, help="Directory for per-run progress journals (empty to disable)")
+    parser.add_argument('--run-id', default=None, help="Name of this run's journal (defaults to a timestamp)")
+    parser.add_argument('--resume', metavar='RUN_ID', default=None, help="Continue an interrupted run, skipping finished contracts")
+    parser.add_argument('--queue', default=WORK_QUEUE_PATH, help="Shared SQLite work queue for --enqueue and --worker")
+    parser.add_argument('--enqueue', action='store_true', help="Add --contracts jobs to the work queue and exit")
+    parser.add_argument('--worker', action='store_true', help="Run jobs leased from the work queue until it is drained")
     
     args = parser.parse_args()
     num_contracts = args.contracts
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.generations_per_prompt < 1:
+        parser.error("--generations-per-prompt must be at least 1")
+    if args.repair_rounds < 0:
+        parser.error("--repair-rounds cannot be negative")
+    if args.analysis_workers < 1:
+        parser.error("--analysis-workers must be at least 1")
+    if not 0 <= args.near_dup_threshold <= 1:
+        parser.error("--near-dup-threshold must be between 0 and 1")
+    if args.coverage_target < 0:
+        parser.error("--coverage-target cannot be negative")
+    if args.resume and not args.run_dir:
+        parser.error("--resume needs a --run-dir")
+    if args.enqueue and args.worker:
+        parser.error("--enqueue and --worker are separate processes")
+    if args.worker and (args.resume or args.coverage_target or args.generations_per_prompt > 1):
+        parser.error("--worker runs queued jobs; it cannot be combined with --resume, --coverage-target or -k > 1")
+    if args.worker:
+        # Workers on several hosts share these files, so they are opened without WAL, as the queue is.
+        # A file another process holds in WAL mode cannot be switched out of it, nor can the queue double as one.
+        shared_databases = {
+            '--manifest': args.manifest, '--generation-cache': args.generation_cache,
+            '--compile-cache': args.compile_cache,
+            '--near-dup-index': args.near_dup_index if args.near_dup_threshold else '',
+        }
+        for flag, path in shared_databases.items():
+            if path and os.path.abspath(path) == os.path.abspath(args.queue):
+                parser.error(f"{flag} cannot be the work queue file {args.queue}")
+            if path and os.path.exists(f"{path}-wal"):
+                parser.error(f"{flag} {path} is open in WAL mode (found {path}-wal), which workers on several hosts "
+                             f"cannot share; stop the process using it or give each worker its own file")
     
+    # Side effects (log directory, sinks) start only now that a run is actually starting
+    log_sampler = configure_logging()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # Coordinator: queue the jobs for workers on any host, then leave
+    if args.enqueue:
+        queue = WorkQueue(args.queue, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS)
+        jobs = []
+        for _ in range(num_contracts):
+            complexity, vulnerabilities = get_params()
+            if complexity is not None:
+                jobs.append({"complexity": complexity, "vulnerabilities": vulnerabilities})
+        queue.enqueue(jobs)
+        logger.info(f"Work queue {args.queue}: {queue.counts()}")
+        queue.close()
+        return
+
+    # The Cohere SDK and LangGraph dominate startup, so they load only once a run needs them
+    from cohere_api import CohereAPI
+    from contract_agent import ContractAgent
+    from retry import CircuitBreaker, RetryPolicy
+
     # Initialize components
-    cohere_tool = CohereAPI(api_key="your_cohere_api_key")
-    storage_tool = ContractStorage()
+    journal = None
+    # A worker's progress lives in the work queue, so it keeps no journal of its own
+    if args.run_dir and not args.worker:
+        run_id = args.resume or args.run_id or time.strftime("%Y%m%d-%H%M%S")
+        journal_path = os.path.join(args.run_dir, f"{run_id}.jsonl")
+        if args.resume and not os.path.exists(journal_path):
+            parser.error(f"No journal for run '{args.resume}' in {args.run_dir}")
+        journal = RunJournal(journal_path, fsync_every=JOURNAL_FSYNC_EVERY)
+        # A resumed run keeps its original size
+        num_contracts = journal.run.get("num_contracts", num_contracts)
+        journal.start(num_contracts=num_contracts)
+        logger.info(f"Run {journal.run_id}: journaling progress to {journal_path}")
+    generation_cache = None
+    if args.generation_cache:
+        generation_cache = DiskCache(
+            args.generation_cache, max_bytes=GENERATION_CACHE_MAX_MB * 1024 * 1024, wal=not args.worker
+        )
+    compile_cache = None
+    if args.compile_cache:
+        compile_cache = DiskCache(args.compile_cache, max_bytes=COMPILE_CACHE_MAX_MB * 1024 * 1024, wal=not args.worker)
+        enable_compile_cache(compile_cache)
+    solc_versions = None
+    if args.solc_dir:
+        solc_versions = SolcVersionManager(args.solc_dir)
+        enable_solc_versions(solc_versions)
+    rate_limiter = None
+    if COHERE_REQUESTS_PER_MINUTE or COHERE_TOKENS_PER_MINUTE:
+        rate_limiter = RateLimiter(COHERE_REQUESTS_PER_MINUTE, COHERE_TOKENS_PER_MINUTE)
+    # One metrics object and one retry policy (with its circuit breaker) shared by every worker
+    metrics = PipelineMetrics()
+    retry_policy = RetryPolicy(
+        max_delay=COHERE_RETRY_MAX_DELAY,
+        circuit_breaker=CircuitBreaker(COHERE_CIRCUIT_FAILURE_THRESHOLD, COHERE_CIRCUIT_COOLDOWN),
+        metrics=metrics
+    )
+    cohere_tool = CohereAPI(api_key="your_cohere_api_key", rate_limiter=rate_limiter, cache=generation_cache,
+                            streaming=args.stream, retry_policy=retry_policy)
+    manifest = None
+    if args.manifest:
+        manifest = ContractManifest(args.manifest, batch_size=MANIFEST_BATCH_SIZE, wal=not args.worker)
+        # The manifest's findings table is filled from structured reports only
+        if not args.structured_reports:
+            logger.info("Manifest enabled; storing structured Slither reports so findings are indexed")
+            args.structured_reports = True
+    exporter = None
+    if args.export_dir:
+        exporter = ShardedJSONLWriter(
+            args.export_dir, max_shard_bytes=EXPORT_SHARD_MB * 1024 * 1024, compression=EXPORT_COMPRESSION
+        )
+    storage_tool = ContractStorage(manifest=manifest, exporter=exporter)
+    near_duplicates = None
+    if args.near_dup_threshold:
+        near_duplicates = NearDuplicateIndex(
+            args.near_dup_index, threshold=args.near_dup_threshold, max_entries=NEAR_DUP_MAX_ENTRIES,
+            wal=not args.worker
+        )
+    # Coverage is judged from Slither's findings, which needs the structured reports
+    scheduler = None
+    if args.coverage_target:
+        scheduler = CoverageScheduler.uniform(args.coverage_target, rng=random.Random(args.seed))
+        if not args.structured_reports:
+            logger.info("Coverage scheduling enabled; storing structured Slither reports")
+            args.structured_reports = True
+    slither_executor = SlitherExecutor(
+        max_workers=args.analysis_workers, timeout=args.analysis_timeout, memory_limit_mb=SLITHER_MEMORY_LIMIT_MB,
+        structured=args.structured_reports
+    )
     
     # Create and execute the contract agent
     agent = ContractAgent(
         cohere_tool=cohere_tool,
-        compile_contract_node=compile_solidity_node,
-        analyze_contract_node=analyze_with_slither_node,
-        storage_tool=storage_tool
+        compile_contract_node=compile_solidity_checked_node,
+        analyze_contract_node=slither_executor.analyze_node,
+        storage_tool=storage_tool,
+        generations_per_prompt=args.generations_per_prompt,
+        validate_contract_node=validate_solidity_node,
+        repair_rounds=args.repair_rounds,
+        metrics=metrics,
+        journal=journal,
+        scheduler=scheduler,
+        near_duplicates=near_duplicates,
+        near_duplicate_action=args.near_dup_action,
+        rng=random.Random(args.seed)
     )
     
     # Execute the agent's workflow
-    agent.execute(num_contracts=num_contracts)
+    if args.worker:
+        queue = WorkQueue(args.queue, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS)
+        agent.work(queue, concurrency=args.concurrency, poll_interval=WORK_QUEUE_POLL_SECONDS)
+        queue.close()
+    else:
+        agent.execute(num_contracts=num_contracts, concurrency=args.concurrency)
+    slither_executor.shutdown()
+    storage_tool.close()
+    if journal is not None:
+        journal.close()
+    if near_duplicates is not None:
+        near_duplicates.close()
+
+    if args.metrics_json:
+        agent.metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        agent.metrics.write_prometheus(args.metrics_prom)
+    logger.info(f"Slither analyses by outcome: {dict(slither_executor.statuses)}")
+    if args.stream:
+        logger.info(f"Streamed generations: {dict(cohere_tool.stream_stats)}")
+    if retry_policy.stats:
+        logger.info(f"Cohere retries: {dict(retry_policy.stats)}")
+    if log_sampler.dropped:
+        logger.info(f"Log sampling left out {log_sampler.dropped} repeated messages from {LOG_FILE}")
+
+    if generation_cache is not None:
+        logger.info(f"Generation cache: {generation_cache.stats()}")
+        generation_cache.close()
+    if compile_cache is not None:
+        enable_compile_cache(None)
+        compile_cache.close()
+    if solc_versions is not None:
+        logger.info(f"solc version resolution: {dict(solc_versions.stats)}")
+        enable_solc_versions(None)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from loguru import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    contract_hash TEXT PRIMARY KEY,
+    complexity TEXT,
+    vulnerabilities TEXT,
+    status TEXT,
+    compile_status TEXT,
+    contract_path TEXT,
+    report_path TEXT,
+    generate_seconds REAL,
+    compile_seconds REAL,
+    analyze_seconds REAL,
+    save_seconds REAL,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS contracts_complexity ON contracts(complexity);
+CREATE INDEX IF NOT EXISTS contracts_status ON contracts(status);
+
+CREATE TABLE IF NOT EXISTS requested_vulnerabilities (
+    contract_hash TEXT NOT NULL,
+    vulnerability TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requested_vulnerability ON requested_vulnerabilities(vulnerability);
+CREATE INDEX IF NOT EXISTS requested_contract ON requested_vulnerabilities(contract_hash);
+
+CREATE TABLE IF NOT EXISTS findings (
+    contract_hash TEXT NOT NULL,
+    detector TEXT NOT NULL,
+    impact TEXT,
+    confidence TEXT,
+    lines TEXT
+);
+CREATE INDEX IF NOT EXISTS findings_detector ON findings(detector);
+CREATE INDEX IF NOT EXISTS findings_contract ON findings(contract_hash);
+"""
+
+class ContractManifest:
+    """SQLite index of generated contracts: parameters, outcome, findings and stage timings.
+
+    ``record`` buffers rows in memory; they are written ``batch_size`` at a time in a
+    single transaction (and on ``flush``/``close``), so indexing adds no per-contract
+    commit to the hot path.
+
+    WAL relies on shared memory and only works for processes on one host; open a file
+    shared across hosts with ``wal=False``.
+    """
+
+    def __init__(self, path, batch_size=100, wal=True):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+            self._conn.executescript(_SCHEMA)
+        except Exception as e:
+            logger.exception(f"Error opening contract manifest at {path}: {e}")
+            raise e
+
+        logger.success(f"Contract manifest opened at {path}")
+
+    def record(self, record):
+        """Queues one contract record; see ``ContractAgent`` for the fields."""
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+
+        records, self._pending = self._pending, []
+        hashes = [(r["contract_hash"],) for r in records]
+        contracts, requested, findings = [], [], []
+        for r in records:
+            timings = r.get("timings") or {}
+            save_seconds = None
+            if "save_contract" in timings or "save_slither_report" in timings:
+                save_seconds = timings.get("save_contract", 0.0) + timings.get("save_slither_report", 0.0)
+            contracts.append((
+                r["contract_hash"], r.get("complexity"), json.dumps(r.get("vulnerabilities") or []),
+                r.get("status"), r.get("compile_status"), r.get("contract_path"), r.get("report_path"),
+                timings.get("generate_contract"), timings.get("compile_contract"),
+                timings.get("analyze_contract"), save_seconds, r.get("created_at", time.time()),
+            ))
+            requested.extend((r["contract_hash"], v) for v in r.get("vulnerabilities") or [])
+            findings.extend(
+                (r["contract_hash"], f["detector"], f.get("impact"), f.get("confidence"), json.dumps(f.get("lines", [])))
+                for f in r.get("findings") or []
+            )
+
+        try:
+            with self._conn:
+                self._conn.executemany("DELETE FROM requested_vulnerabilities WHERE contract_hash = ?", hashes)
+                self._conn.executemany("DELETE FROM findings WHERE contract_hash = ?", hashes)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", contracts
+                )
+                self._conn.executemany("INSERT INTO requested_vulnerabilities VALUES (?, ?)", requested)
+                self._conn.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?)", findings)
+            logger.debug(f"Indexed {len(records)} contracts in {self.path}")
+        except Exception as e:
+            logger.exception(f"Error writing {len(records)} records to contract manifest: {e}")
+            raise e
+
+    def query(self, complexity=None, status=None, requested=None, detected=None):
+        """Returns contract rows (as dicts) matching every given filter.
+
+        ``requested`` matches a vulnerability asked for in the prompt, ``detected`` a
+        detector Slither actually reported.
+        """
+        clauses, params = [], []
+        if complexity is not None:
+            clauses.append("c.complexity = ?")
+            params.append(complexity)
+        if status is not None:
+            clauses.append("c.status = ?")
+            params.append(status)
+        if requested is not None:
+            clauses.append("c.contract_hash IN (SELECT contract_hash FROM requested_vulnerabilities WHERE vulnerability = ?)")
+            params.append(requested)
+        if detected is not None:
+            clauses.append("c.contract_hash IN (SELECT contract_hash FROM findings WHERE detector = ?)")
+            params.append(detected)
+
+        sql = "SELECT * FROM contracts c"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+
+        with self._lock:
+            self._flush_locked()
+            cursor = self._conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            row["vulnerabilities"] = json.loads(row["vulnerabilities"])
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -0,0 +1,213 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from loguru import logger
+
+# Latency bucket upper bounds in seconds, spanning fast in-process stages to long Slither runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, math.inf)
+
+class Histogram:
+    """Cumulative-bucket latency histogram with a bounded reservoir for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size=10000):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.reservoir_size = reservoir_size
+        self._reservoir = []
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+        # Reservoir sampling keeps percentiles representative in constant memory
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.reservoir_size:
+                self._reservoir[slot] = value
+
+    def quantile(self, q):
+        if not self._reservoir:
+            return None
+        ordered = sorted(self._reservoir)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+class StageMetrics:
+    """Counters, gauges and latency for one workflow stage."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def summary(self):
+        count = self.latency.count
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "timeouts": self.timeouts,
+            "timeout_rate": self.timeouts / count if count else 0.0,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "latency_seconds": self.latency.summary(),
+        }
+
+class PipelineMetrics:
+    """Per-stage latency, throughput, error/timeout rates and in-flight gauges for a run.
+
+    Stages are created on first use. Export with ``summary``/``write_json`` for an
+    end-of-run report, or ``to_prometheus``/``write_prometheus`` for a text file that
+    node_exporter-style scrapers can pick up.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.outcomes = Counter()
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageMetrics()
+        return stage
+
+    @contextmanager
+    def track(self, name):
+        """Times a block as one execution of stage ``name``; exceptions count as errors."""
+        with self._lock:
+            stage = self._stage(name)
+            stage.in_flight += 1
+            stage.max_in_flight = max(stage.max_in_flight, stage.in_flight)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                stage.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stage.in_flight -= 1
+                stage.latency.observe(elapsed)
+
+    def record_error(self, name):
+        with self._lock:
+            self._stage(name).errors += 1
+
+    def record_timeout(self, name):
+        with self._lock:
+            self._stage(name).timeouts += 1
+
+    def record_outcome(self, status):
+        """Counts a contract's final status."""
+        with self._lock:
+            self.outcomes[status] += 1
+
+    def increment(self, name, amount=1):
+        """Adds to a named run-wide counter, e.g. repair rounds or tokens spent."""
+        with self._lock:
+            self.counters[name] += amount
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.time() - self.started
+            completed = sum(self.outcomes.values())
+            return {
+                "elapsed_seconds": elapsed,
+                "contracts": completed,
+                "contracts_per_second": completed / elapsed if elapsed > 0 else 0.0,
+                "outcomes": dict(self.outcomes),
+                "counters": dict(self.counters),
+                "stages": {name: stage.summary() for name, stage in self.stages.items()},
+            }
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP contract_stage_latency_seconds Wall time per workflow stage execution.",
+            "# TYPE contract_stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            for name, stage in stages:
+                cumulative = 0
+                for bound, bucket_count in zip(stage.latency.buckets, stage.latency.bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f'contract_stage_latency_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'contract_stage_latency_seconds_sum{{stage="{name}"}} {stage.latency.sum}')
+                lines.append(f'contract_stage_latency_seconds_count{{stage="{name}"}} {stage.latency.count}')
+
+            for metric, kind, help_text, attribute in (
+                ("contract_stage_errors_total", "counter", "Stage executions that failed.", "errors"),
+                ("contract_stage_timeouts_total", "counter", "Stage executions that timed out.", "timeouts"),
+                ("contract_stage_in_flight", "gauge", "Stage executions currently running.", "in_flight"),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for name, stage in stages:
+                    lines.append(f'{metric}{{stage="{name}"}} {getattr(stage, attribute)}')
+
+            lines.append("# HELP contract_outcomes_total Contracts finished, by final status.")
+            lines.append("# TYPE contract_outcomes_total counter")
+            for status, count in sorted(self.outcomes.items()):
+                lines.append(f'contract_outcomes_total{{status="{status}"}} {count}')
+
+            lines.append("# HELP contract_pipeline_events_total Run-wide event counters.")
+            lines.append("# TYPE contract_pipeline_events_total counter")
+            for name, count in sorted(self.counters.items()):
+                lines.append(f'contract_pipeline_events_total{{name="{name}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path):
+        self._write(path, self.to_prometheus())
+
+    @staticmethod
+    def _write(path, content):
+        # Scrapers may read at any moment, so the file is swapped in atomically
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+            logger.info(f"Metrics written to {path}")
+        except Exception as e:
+            logger.exception(f"Error writing metrics to {path}: {e}")
+            raise e
@@ -0,0 +1,175 @@
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from loguru import logger
+
+_COMMENTS = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+_TOKENS = re.compile(r'[A-Za-z_$][\w$]*|\d+|\S')
+_PRIME = (1 << 61) - 1
+
+def shingles(contract_code, size=5):
+    """Stable 32-bit hashes of every run of ``size`` tokens, ignoring comments and layout."""
+    tokens = _TOKENS.findall(_COMMENTS.sub(" ", contract_code))
+    if len(tokens) < size:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))} if tokens else set()
+    return {zlib.crc32(" ".join(tokens[i:i + size]).encode("utf-8")) for i in range(len(tokens) - size + 1)}
+
+class NearDuplicateIndex:
+    """MinHash/LSH index that spots generated contracts nearly identical to earlier ones.
+
+    Each contract is reduced to a ``num_perm``-value MinHash signature over token
+    shingles, split into ``bands`` for locality-sensitive lookup; candidates sharing a
+    band are confirmed by their estimated Jaccard similarity against ``threshold``.
+
+    The index keeps at most ``max_entries`` signatures (about 5 KB each with their LSH
+    buckets at the defaults), evicting the oldest first. With a ``path``, signatures are stored in
+    SQLite and reloaded on open, so near-duplicates are caught across runs; pass
+    ``wal=False`` when that file is shared by processes on several hosts.
+    """
+
+    def __init__(self, path="", threshold=0.85, num_perm=128, bands=16, shingle_size=5, max_entries=50000, wal=True):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands}).")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.checked = 0
+        self.matched = 0
+        self.evictions = 0
+        # Fixed seed: stored signatures stay comparable across runs
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._rows = num_perm // bands
+        self._signatures = OrderedDict()  # key -> signature, oldest first
+        self._buckets = [{} for _ in range(bands)]  # band -> {band hash: set of keys}
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+                if wal:
+                    self._conn.execute("PRAGMA journal_mode=WAL")
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+                else:
+                    self._conn.execute("PRAGMA journal_mode=DELETE")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, signature BLOB NOT NULL, added REAL NOT NULL)"
+                )
+                rows = self._conn.execute(
+                    "SELECT key, signature FROM signatures WHERE length(signature) = ? ORDER BY added DESC LIMIT ?",
+                    (num_perm * 4, max_entries)
+                ).fetchall()
+            except Exception as e:
+                logger.exception(f"Error opening near-duplicate index at {path}: {e}")
+                raise e
+            for key, blob in reversed(rows):
+                signature = array("I")
+                signature.frombytes(blob)
+                self._insert(key, signature)
+            logger.success(f"Near-duplicate index opened at {path} ({len(self._signatures)} signatures).")
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, contract_code):
+        """MinHash signature of the contract's shingles, or None for an empty contract."""
+        hashes = shingles(contract_code, self.shingle_size)
+        if not hashes:
+            return None
+        return array("I", (min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in self._perms))
+
+    def _bands(self, signature):
+        rows = self._rows
+        return [hash(signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def _similarity(self, first, second):
+        return sum(1 for a, b in zip(first, second) if a == b) / self.num_perm
+
+    def _best_match(self, key, signature):
+        candidates = set()
+        for band, band_hash in enumerate(self._bands(signature)):
+            candidates.update(self._buckets[band].get(band_hash, ()))
+        candidates.discard(key)
+        best = None
+        for key in candidates:
+            similarity = self._similarity(signature, self._signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def _insert(self, key, signature):
+        self._signatures[key] = signature
+        for band, band_hash in enumerate(self._bands(signature)):
+            self._buckets[band].setdefault(band_hash, set()).add(key)
+        evicted = []
+        while len(self._signatures) > self.max_entries:
+            evicted.append(next(iter(self._signatures)))
+            self._remove(evicted[-1])
+            self.evictions += 1
+        return evicted
+
+    def _remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return False
+        for band, band_hash in enumerate(self._bands(signature)):
+            keys = self._buckets[band].get(band_hash)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[band][band_hash]
+        return True
+
+    def check_and_add(self, key, contract_code, add_duplicates=False):
+        """Returns ``(matching key, similarity)`` if a near-duplicate is indexed, else None.
+
+        The contract is indexed under ``key`` unless it matched (or ``add_duplicates`` is
+        set); checking and adding happen atomically, so concurrent near-identical
+        contracts are caught too.
+        """
+        signature = self.signature(contract_code)
+        if signature is None:
+            return None
+        with self._lock:
+            self.checked += 1
+            match = self._best_match(key, signature)
+            if match is not None:
+                self.matched += 1
+            if key not in self._signatures and (match is None or add_duplicates):
+                evicted = self._insert(key, signature)
+                if self._conn is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO signatures (key, signature, added) VALUES (?, ?, ?)",
+                        (key, signature.tobytes(), time.time())
+                    )
+                    self._conn.executemany("DELETE FROM signatures WHERE key = ?", [(k,) for k in evicted])
+            return match
+
+    def discard(self, key):
+        """Forgets ``key``, e.g. when its contract is being replaced by a repaired version."""
+        with self._lock:
+            if self._remove(key) and self._conn is not None:
+                self._conn.execute("DELETE FROM signatures WHERE key = ?", (key,))
+
+    def stats(self):
+        return {"entries": len(self._signatures), "checked": self.checked, "matched": self.matched,
+                "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
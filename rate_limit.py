@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+from loguru import logger
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for client-side budgeting."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    """Token bucket that refills continuously at ``rate_per_minute`` up to ``capacity``."""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError(f"Rate must be positive, got {rate_per_minute}.")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` tokens are available (0 if they are available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # A single oversized request must still get through
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class RateLimiter:
+    """Client-side limiter enforcing requests/minute and tokens/minute budgets.
+
+    Either limit may be ``None`` (or 0) to disable it. The limiter is shared between
+    threads and coroutines; a request only proceeds once both buckets can cover it,
+    so callers back off locally instead of collecting 429s from the API.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """Takes capacity from both buckets atomically, or returns how long to wait."""
+        with self._lock:
+            wait = 0.0
+            if self.request_bucket:
+                wait = max(wait, self.request_bucket.wait_time(1))
+            if self.token_bucket and tokens:
+                wait = max(wait, self.token_bucket.wait_time(tokens))
+            if wait > 0:
+                return wait
+
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket and tokens:
+                self.token_bucket.consume(tokens)
+            return 0.0
+
+    def acquire(self, tokens=0):
+        """Blocks the calling thread until a request of ``tokens`` tokens may be sent."""
+        waited = 0.0
+        while (wait := self._reserve(tokens)) > 0:
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            logger.debug(f"Rate limiter delayed request by {waited:.2f}s")
+        return waited
+
+    async def acquire_async(self, tokens=0):
+        """Waits without blocking the event loop until a request may be sent."""
+        waited = 0.0
+        while (wait := self._reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            logger.debug(f"Rate limiter delayed request by {waited:.2f}s")
+        return waited
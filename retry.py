@@ -0,0 +1,206 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections import Counter
+import httpx
+from loguru import logger
+from requests.exceptions import RequestException
+
+# HTTP statuses worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class RetryExhaustedError(RequestException):
+    """Raised once a retryable call has failed on every attempt; wraps the last error."""
+
+    def __init__(self, message, last_error=None):
+        super().__init__(message)
+        self.last_error = last_error
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+def _headers(error):
+    headers = getattr(error, "headers", None)
+    if headers is None and getattr(error, "response", None) is not None:
+        headers = getattr(error.response, "headers", None)
+    return {str(k).lower(): v for k, v in (headers or {}).items()}
+
+def retry_after(error, now=time.time):
+    """Server-requested delay in seconds from a ``Retry-After`` header, if any."""
+    value = _headers(error).get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error):
+    """Network failures, timeouts, 429 and 5xx responses are retried; other errors are not."""
+    if isinstance(error, (RequestException, httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+class CircuitBreaker:
+    """Pauses every caller sharing it while the API looks degraded.
+
+    After ``failure_threshold`` consecutive retryable failures the circuit opens for
+    ``cooldown`` seconds (longer if the server asked for it). Callers block in
+    ``acquire`` until it elapses; then a single probe call goes through, and its
+    outcome either closes the circuit or opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"  # closed | open | half_open
+        self.times_opened = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        """Lets the caller through, or returns how long to wait before asking again."""
+        with self._lock:
+            now = self._clock()
+            if self.state == "open":
+                if now < self._open_until:
+                    return self._open_until - now
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    return min(1.0, self.cooldown)  # Wait for the probe's verdict
+                self._probing = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Cohere circuit closed; resuming requests")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, hint=None):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                pause = max(self.cooldown, hint or 0.0)
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning(f"Cohere circuit opened after {self._failures} failures; pausing {pause:.1f}s")
+                self.state = "open"
+                self._open_until = self._clock() + pause
+                self._probing = False
+
+    def acquire(self):
+        """Blocks the calling thread while the circuit is open; returns seconds paused."""
+        paused = 0.0
+        while (wait := self._admit()) > 0:
+            time.sleep(wait)
+            paused += wait
+        return paused
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop while the circuit is open."""
+        paused = 0.0
+        while (wait := self._admit()) > 0:
+            await asyncio.sleep(wait)
+            paused += wait
+        return paused
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, ``Retry-After`` support and a circuit breaker.
+
+    One policy (and so one breaker) is meant to be shared by all workers talking to the
+    API. Counters (``stats``, and ``metrics`` counters if a ``PipelineMetrics`` is given)
+    record retries, honored server hints, exhausted calls and time spent backing off.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=60.0, multiplier=2.0,
+                 circuit_breaker=None, metrics=None, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self.metrics = metrics
+        self.stats = Counter()
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+        if self.metrics is not None:
+            self.metrics.increment(f"cohere_{name}", amount)
+
+    def _paused(self, seconds):
+        if seconds:
+            self._count("circuit_paused_seconds", seconds)
+
+    def backoff(self, attempt, error=None, base_delay=None):
+        """Delay before retry number ``attempt`` (0-based): the server's hint or a jittered exponential."""
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            self._count("retry_after_honored")
+            return min(hint, self.max_delay)
+        ceiling = min(self.max_delay, (self.base_delay if base_delay is None else base_delay) * self.multiplier ** attempt)
+        with self._lock:
+            return self._rng.uniform(0, ceiling)  # Full jitter keeps workers from retrying in lockstep
+
+    def _on_error(self, error, attempt, attempts, name, base_delay):
+        """Records a failed attempt and returns the delay before the next one; raises if there is none."""
+        if not is_retryable(error):
+            self.circuit_breaker.record_success()  # The API answered; the request itself was bad
+            raise error
+        opened = self.circuit_breaker.times_opened
+        self.circuit_breaker.record_failure(retry_after(error))
+        if self.circuit_breaker.times_opened > opened:
+            self._count("circuit_opened")
+        if attempt + 1 >= attempts:
+            self._count("retries_exhausted")
+            logger.error(f"{name} failed after {attempts} attempts: {error}")
+            raise RetryExhaustedError(f"{name} failed after {attempts} attempts.", error) from error
+        delay = self.backoff(attempt, error, base_delay)
+        logger.warning(f"{name} failed (attempt {attempt + 1}/{attempts}): {error}; retrying in {delay:.2f}s")
+        self._count("retries")
+        self._count("backoff_seconds", delay)
+        return delay
+
+    def call(self, fn, name="Cohere request", attempts=None, base_delay=None):
+        """Calls ``fn()`` until it succeeds, a non-retryable error occurs, or attempts run out."""
+        attempts = attempts or self.max_attempts
+        for attempt in range(attempts):
+            self._paused(self.circuit_breaker.acquire())
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._on_error(e, attempt, attempts, name, base_delay))
+                continue
+            self.circuit_breaker.record_success()
+            return result
+
+    async def call_async(self, fn, name="Cohere request", attempts=None, base_delay=None):
+        """Awaits ``fn()`` with the same retry rules as ``call``, without blocking the event loop."""
+        attempts = attempts or self.max_attempts
+        for attempt in range(attempts):
+            self._paused(await self.circuit_breaker.acquire_async())
+            try:
+                result = await fn()
+            except Exception as e:
+                await asyncio.sleep(self._on_error(e, attempt, attempts, name, base_delay))
+                continue
+            self.circuit_breaker.record_success()
+            return result
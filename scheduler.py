@@ -0,0 +1,95 @@
+import random
+import threading
+from collections import Counter
+from loguru import logger
+from utils import COMPLEXITY, VULNERABILITIES
+
+class CoverageScheduler:
+    """Picks generation parameters where confirmed coverage is furthest from its target.
+
+    ``targets`` maps ``(complexity, vulnerability)`` buckets to the number of contracts
+    Slither should confirm for each. ``next_params`` requests the bucket with the lowest
+    expected coverage, where parameters still in flight count by the bucket's observed
+    hit rate, and pads the request with other unfilled vulnerabilities of the same
+    complexity. ``record`` feeds back what Slither actually reported, and ``done`` turns
+    true once every target is met, so no generations are spent on full buckets.
+    """
+
+    def __init__(self, targets, max_vulnerabilities=3, rng=None):
+        self.targets = {bucket: count for bucket, count in targets.items() if count > 0}
+        self.max_vulnerabilities = max_vulnerabilities
+        self.confirmed = Counter()
+        self.attempts = Counter()  # Contracts that requested the bucket's vulnerability
+        self.hits = Counter()  # ... and had it confirmed
+        self.pending = Counter()
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def uniform(cls, per_bucket, complexities=COMPLEXITY, vulnerabilities=VULNERABILITIES, **kwargs):
+        """Targets ``per_bucket`` confirmed contracts for every complexity and vulnerability pair."""
+        targets = {
+            (complexity, vulnerability): per_bucket
+            for complexity in complexities for vulnerability in vulnerabilities
+            if not (complexity == 'low' and vulnerability == 'arbitrary-send-erc20')  # Excluded as in get_params
+        }
+        return cls(targets, **kwargs)
+
+    @property
+    def done(self):
+        with self._lock:
+            return self._done_locked()
+
+    def _done_locked(self):
+        return all(self.confirmed[bucket] >= target for bucket, target in self.targets.items())
+
+    def _expected_coverage(self, bucket):
+        # Laplace-smoothed hit rate, so untried buckets are neither ignored nor trusted blindly
+        hit_rate = (self.hits[bucket] + 1) / (self.attempts[bucket] + 2)
+        return (self.confirmed[bucket] + self.pending[bucket] * hit_rate) / self.targets[bucket]
+
+    def next_params(self, count=1):
+        """Parameters for the next ``count`` contracts, or ``(None, None)`` once every target is met."""
+        with self._lock:
+            if self._done_locked():
+                return None, None
+            open_buckets = [bucket for bucket, target in self.targets.items() if self.confirmed[bucket] < target]
+            self._rng.shuffle(open_buckets)  # Break ties randomly
+            open_buckets.sort(key=self._expected_coverage)
+            complexity = open_buckets[0][0]
+
+            size = self._rng.randint(1, self.max_vulnerabilities)
+            vulnerabilities = [v for c, v in open_buckets if c == complexity][:size]
+            for vulnerability in vulnerabilities:
+                self.pending[(complexity, vulnerability)] += count
+            return complexity, vulnerabilities
+
+    def record(self, complexity, vulnerabilities, findings):
+        """Tallies one finished contract: its requested parameters and the findings Slither confirmed."""
+        detectors = {finding.get("detector") for finding in findings or []}
+        with self._lock:
+            was_done = self._done_locked()
+            for vulnerability in vulnerabilities or []:
+                bucket = (complexity, vulnerability)
+                self.pending[bucket] = max(0, self.pending[bucket] - 1)
+                self.attempts[bucket] += 1
+                if vulnerability in detectors:
+                    self.hits[bucket] += 1
+            # Detectors that fired without being asked for still fill their buckets
+            for detector in detectors:
+                if (complexity, detector) in self.targets:
+                    self.confirmed[(complexity, detector)] += 1
+            if not was_done and self._done_locked():
+                logger.success(f"Coverage targets met for all {len(self.targets)} buckets")
+
+    def summary(self):
+        """Confirmed versus target counts per bucket, and the share of targets met."""
+        with self._lock:
+            met = sum(min(self.confirmed[bucket], target) for bucket, target in self.targets.items())
+            return {
+                "buckets": {
+                    f"{complexity}/{vulnerability}": {"confirmed": self.confirmed[(complexity, vulnerability)], "target": target}
+                    for (complexity, vulnerability), target in sorted(self.targets.items())
+                },
+                "coverage": met / max(sum(self.targets.values()), 1),
+            }
@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+from collections import Counter
+from loguru import logger
+
+_COMMENTS = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+_PRAGMA = re.compile(r'\bpragma\s+solidity\s+([^;]+);')
+_COMPARATOR = re.compile(r'(\^|~|>=|<=|>|<|=)?\s*v?(\d+)(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?')
+_BINARY_VERSION = re.compile(r'(\d+)\.(\d+)\.(\d+)')
+
+def pragma_ranges(contract_code):
+    """The ``pragma solidity`` expressions of a source, comments ignored."""
+    return tuple(expression.strip() for expression in _PRAGMA.findall(_COMMENTS.sub(" ", contract_code)))
+
+def _partial(match):
+    """Version parts given in a comparator; wildcards end it like a missing part."""
+    parts = []
+    for part in match.groups()[1:]:
+        if part is None or not part.isdigit():
+            break
+        parts.append(int(part))
+    return parts
+
+def _bounds(op, parts):
+    """Translates one npm-style comparator into ``(operator, version)`` bounds."""
+    low = tuple(parts + [0] * (3 - len(parts)))
+    if op in (None, "=") and len(parts) < 3 or op == "~" and len(parts) < 2:
+        # A partial version matches anything it is a prefix of
+        if not parts:
+            return []
+        upper = parts[:-1] + [parts[-1] + 1]
+        return [(">=", low), ("<", tuple(upper + [0] * (3 - len(upper))))]
+    if op in (None, "="):
+        return [("=", low)]
+    if op == "~":
+        return [(">=", low), ("<", (low[0], low[1] + 1, 0))]
+    if op == "^":
+        # Caret allows changes that keep the leftmost non-zero part, so ^0.8.1 means <0.9.0
+        if low[0] or len(parts) == 1:
+            upper = (low[0] + 1, 0, 0)
+        elif low[1] or len(parts) == 2:
+            upper = (0, low[1] + 1, 0)
+        else:
+            upper = (0, 0, low[2] + 1)
+        return [(">=", low), ("<", upper)]
+    if op == "<=" and len(parts) < 3:
+        upper = parts[:-1] + [parts[-1] + 1]
+        return [("<", tuple(upper + [0] * (3 - len(upper))))]
+    if op == ">" and len(parts) < 3:
+        upper = parts[:-1] + [parts[-1] + 1]
+        return [(">=", tuple(upper + [0] * (3 - len(upper))))]
+    return [(op, low)]
+
+def parse_range(expression):
+    """Parses a pragma expression into alternatives (``||``), each a list of bounds to satisfy."""
+    alternatives = []
+    for alternative in expression.split("||"):
+        if " - " in alternative:
+            # Hyphen range: "0.8.0 - 0.8.20" is inclusive at both ends
+            first, last = alternative.split(" - ", 1)
+            low, high = _COMPARATOR.search(first), _COMPARATOR.search(last)
+            if low is None or high is None:
+                continue
+            alternatives.append(_bounds(">=", _partial(low)) + _bounds("<=", _partial(high)))
+            continue
+        bounds = []
+        for match in _COMPARATOR.finditer(alternative):
+            bounds.extend(_bounds(match.group(1), _partial(match)))
+        alternatives.append(bounds)
+    return alternatives
+
+_CHECKS = {
+    "=": lambda version, bound: version == bound,
+    ">=": lambda version, bound: version >= bound,
+    ">": lambda version, bound: version > bound,
+    "<=": lambda version, bound: version <= bound,
+    "<": lambda version, bound: version < bound,
+}
+
+def satisfies(version, expression):
+    """Whether ``version`` (a ``(major, minor, patch)`` tuple) satisfies a pragma expression."""
+    return any(
+        all(_CHECKS[op](version, bound) for op, bound in bounds)
+        for bounds in parse_range(expression)
+    )
+
+class SolcVersionManager:
+    """Picks, for each contract, the newest cached ``solc`` binary its pragmas allow.
+
+    Binaries are discovered under ``directory`` as executables named ``solc*`` with a
+    version in the name (``solc-0.8.19``, ``solc-v0.8.19``, solc-select's
+    ``artifacts/solc-0.8.19/solc-0.8.19``, ...). Contracts without a pragma, or whose
+    pragmas no cached binary satisfies, get ``default``. Resolutions are memoized per
+    distinct pragma set, so the hot path is one regex scan and a dict lookup.
+    """
+
+    def __init__(self, directory, default='solc'):
+        self.directory = directory
+        self.default = default
+        self.binaries = {}  # (major, minor, patch) -> path
+        self.stats = Counter()
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                version = _BINARY_VERSION.search(name)
+                if name.startswith("solc") and version and os.access(path, os.X_OK):
+                    self.binaries.setdefault(tuple(int(part) for part in version.groups()), path)
+        self._versions = sorted(self.binaries, reverse=True)
+        logger.info(
+            f"Found {len(self.binaries)} solc binaries in {directory}"
+            + (f" ({'.'.join(map(str, self._versions[-1]))} to {'.'.join(map(str, self._versions[0]))})" if self._versions else "")
+        )
+
+    def resolve(self, contract_code):
+        """Path of the solc binary to compile ``contract_code`` with."""
+        return self._resolve_pragmas(pragma_ranges(contract_code))
+
+    def _resolve_pragmas(self, pragmas):
+        with self._lock:
+            solc = self._resolved.get(pragmas)
+            if solc is not None:
+                self.stats["memoized"] += 1
+                return solc
+
+        if not pragmas:
+            outcome, solc = "no_pragma", self.default
+        else:
+            version = next((v for v in self._versions if all(satisfies(v, p) for p in pragmas)), None)
+            outcome, solc = ("resolved", self.binaries[version]) if version else ("unmatched", self.default)
+            if version is None:
+                logger.warning(f"No cached solc satisfies pragma {' '.join(pragmas)}; using {self.default}")
+        with self._lock:
+            self._resolved[pragmas] = solc
+            self.stats[outcome] += 1
+        return solc
+
@@ -1,61 +1,507 @@
+import functools
+import json
+import re
+import signal
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
+from cache import cache_key
+from config import SLITHER_TIMEOUT, SLITHER_MEMORY_LIMIT_MB, SLITHER_WORKERS
 
-def _compile_solidity(contract_code):
-    """Compiles Solidity contract code using solc."""
+SOLC_BIN_FLAGS = ['--bin']
+STANDARD_JSON_SETTINGS = {"outputSelection": {"*": {"*": ["evm.bytecode.object"]}}}
+
+# Optional compile cache (a cache.DiskCache), enabled with enable_compile_cache()
+_compile_cache = None
+_compile_cache_saved_seconds = 0.0
+_compile_cache_lock = threading.Lock()
+
+def enable_compile_cache(cache):
+    """Routes compilations through ``cache``; pass None to disable caching."""
+    global _compile_cache, _compile_cache_saved_seconds
+    with _compile_cache_lock:
+        _compile_cache = cache
+        _compile_cache_saved_seconds = 0.0
+
+# Optional per-contract compiler selection (a solc_versions.SolcVersionManager), enabled
+# with enable_solc_versions(); without it every contract goes to the solc on PATH
+_solc_versions = None
+
+def enable_solc_versions(manager):
+    """Picks each contract's solc binary from its pragma via ``manager``; pass None to use PATH."""
+    global _solc_versions
+    _solc_versions = manager
+
+def _solc_for(contract_code):
+    manager = _solc_versions
+    return manager.resolve(contract_code) if manager is not None else 'solc'
+
+def compile_cache_stats():
+    """Hit/miss counters plus compile time saved by cache hits, or None if caching is off."""
+    if _compile_cache is None:
+        return None
+    stats = _compile_cache.stats()
+    stats["saved_seconds"] = _compile_cache_saved_seconds
+    return stats
+
+@functools.lru_cache(maxsize=None)
+def _solc_version(solc='solc'):
+    """The compiler's ``--version`` banner, part of every compile cache key."""
+    try:
+        result = subprocess.run([solc, '--version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.stdout.strip()
+    except Exception as e:
+        logger.warning(f"Could not determine solc version: {e}")
+        return "unknown"
+
+def _normalize_source(contract_code):
+    """Normalizes line endings and trailing whitespace without shifting line numbers."""
+    lines = contract_code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).rstrip()
+
+class SolidityCompilationError(Exception):
+    """Raised by a checked compile when solc rejects the source; carries its diagnostics."""
+
+    def __init__(self, stderr):
+        super().__init__(stderr)
+        self.stderr = stderr
+
+_FENCED_BLOCK = re.compile(r'```[^\n]*\n(.*?)(?:```|\Z)', re.S)
+_SOLIDITY_START = re.compile(
+    r'^[ \t]*(//\s*SPDX|pragma\s+solidity|import\s|(abstract\s+)?contract\s+\w|library\s+\w|interface\s+\w)', re.M
+)
+_DECLARATION = re.compile(r'\b((abstract\s+)?contract|library|interface)\s+\w+')
+_PRAGMA = re.compile(r'^\s*pragma\s+solidity\s+[^;\n]+;', re.M)
+_COMMENTS_AND_STRINGS = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.S)
+
+def extract_solidity(text):
+    """Pulls the Solidity source out of an LLM response.
+
+    Takes the largest fenced code block that declares a contract; without fences, drops
+    prose before the first pragma or declaration and after the last closing brace.
+    """
+    blocks = [block for block in _FENCED_BLOCK.findall(text) if _DECLARATION.search(block)]
+    if blocks:
+        return max(blocks, key=len)
+    start = _SOLIDITY_START.search(text)
+    if start is None:
+        return text
+    code = text[start.start():]
+    end = code.rfind('}')
+    return code[:end + 1] if end != -1 else code
+
+def normalize_whitespace(contract_code):
+    """Normalizes line endings, strips trailing whitespace and collapses runs of blank lines."""
+    return re.sub(r'\n{3,}', '\n\n', _normalize_source(contract_code)).strip('\n') + '\n'
+
+def validate_solidity(text):
+    """Extracts and normalizes the Solidity in ``text`` and rejects source that cannot compile.
+
+    Checks are in-process and cheap, so clearly broken output never costs a solc or
+    Slither process. Returns ``(contract_code, None)`` or ``(None, rejection_reason)``.
+    """
+    contract_code = normalize_whitespace(extract_solidity(text or ""))
+    if not contract_code.strip():
+        return None, "empty output"
+    if not _PRAGMA.search(contract_code):
+        return None, "missing pragma solidity"
+
+    code = _COMMENTS_AND_STRINGS.sub('', contract_code)
+    if '/*' in code:
+        return None, "truncated: unterminated comment"
+    if '"' in code or "'" in code:
+        return None, "truncated: unterminated string literal"
+    if not _DECLARATION.search(code):
+        return None, "no contract, library or interface declaration"
+
+    depth = code.count('{') - code.count('}')
+    if depth > 0:
+        return None, f"truncated: {depth} unclosed brace(s)"
+    if depth < 0:
+        return None, f"unbalanced braces: {-depth} extra closing brace(s)"
+    if not code.rstrip().endswith('}'):
+        return None, "truncated: source does not end with a closing brace"
+    return contract_code, None
+
+def _compile_solidity(contract_code, raise_on_error=False):
+    """Compiles Solidity contract code using solc.
+
+    Returns the compiler output, or None on failure; with ``raise_on_error`` a failure
+    raises ``SolidityCompilationError`` carrying solc's stderr instead.
+    """
+    global _compile_cache_saved_seconds
+
+    solc = _solc_for(contract_code)
+    cache = _compile_cache
+    if cache is not None:
+        key = cache_key("solc", _normalize_source(contract_code), _solc_version(solc), SOLC_BIN_FLAGS)
+        entry = cache.get_json(key)
+        if entry is not None:
+            with _compile_cache_lock:
+                _compile_cache_saved_seconds += entry["seconds"]
+            if entry["returncode"] == 0:
+                logger.info("Solidity compilation served from cache.")
+                return entry["stdout"]
+            logger.error(f"Solidity compilation failed (cached): {entry['stderr']}")
+            if raise_on_error:
+                raise SolidityCompilationError(entry["stderr"])
+            return None
+
+    temp_contract_file_path = None
     try:
         with tempfile.NamedTemporaryFile(suffix=".sol", delete=False) as temp_contract_file:
             temp_contract_file.write(contract_code.encode('utf-8'))
             temp_contract_file_path = temp_contract_file.name
 
         # Run solc compiler on the temp contract file
+        started = time.perf_counter()
         result = subprocess.run(
-            ['solc', '--bin', temp_contract_file_path],
+            [solc, *SOLC_BIN_FLAGS, temp_contract_file_path],
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
 
+        if cache is not None:
+            cache.set_json(key, {
+                "returncode": result.returncode,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+                "seconds": time.perf_counter() - started,
+            })
+
         if result.returncode == 0:
             logger.info(f"Solidity compilation successful for {temp_contract_file_path}.")
             return result.stdout  # Return compilation output
         else:
             logger.error(f"Solidity compilation failed for {temp_contract_file_path}: {result.stderr}")
+            if raise_on_error:
+                raise SolidityCompilationError(result.stderr)
             return None  # Compilation failed
 
+    except SolidityCompilationError:
+        raise
     except Exception as e:
         logger.exception(f"Error during Solidity compilation: {e}")
         raise e
     finally:
         try:
-            if os.path.exists(temp_contract_file_path):
+            if temp_contract_file_path and os.path.exists(temp_contract_file_path):
                 os.remove(temp_contract_file_path)  # Clean up temp file
         except Exception as cleanup_error:
             logger.warning(f"Error cleaning up temp file {temp_contract_file_path}: {cleanup_error}")
 
-def _analyze_with_slither(contract_file_path):
-    """Runs Slither analysis on a compiled contract using Slither."""
+def compile_solidity_batch(contract_codes, solc=None):
+    """Compiles many contracts with one ``solc --standard-json`` process per compiler version.
+
+    Unless a ``solc`` binary is given, contracts are grouped by the binary their pragmas
+    resolve to (see ``enable_solc_versions``), and each group is compiled together.
+    Sources are sent over stdin, so no temp files are written. Returns one result per
+    input, in order: ``{"bytecode": {contract_name: hex} or None, "errors": [...],
+    "warnings": [...]}``. solc withholds all bytecode when any source fails, so failing
+    sources are dropped and the rest recompiled; a broken contract only fails itself.
+    """
+    global _compile_cache_saved_seconds
+
+    sources = {f"contract_{i}.sol": code for i, code in enumerate(contract_codes)}
+    solcs = {name: solc or _solc_for(code) for name, code in sources.items()}
+    results = {}
+
+    cache = _compile_cache
+    keys = {}
+    if cache is not None:
+        for name, code in sources.items():
+            keys[name] = cache_key("solc", _normalize_source(code), _solc_version(solcs[name]), ['--standard-json'], STANDARD_JSON_SETTINGS)
+            entry = cache.get_json(keys[name])
+            if entry is not None:
+                with _compile_cache_lock:
+                    _compile_cache_saved_seconds += entry.pop("seconds")
+                results[name] = entry
+
+    pending = {name: code for name, code in sources.items() if name not in results}
+    if pending:
+        groups = {}
+        for name in pending:
+            groups.setdefault(solcs[name], []).append(name)
+        failed = 0
+        for binary, names in groups.items():
+            started = time.perf_counter()
+            compiled = _compile_isolated({name: pending[name] for name in names}, binary)
+            seconds_each = (time.perf_counter() - started) / len(names)
+            for name, result in compiled.items():
+                results[name] = result
+                if cache is not None:
+                    cache.set_json(keys[name], {**result, "seconds": seconds_each})
+            failed += sum(1 for result in compiled.values() if result["bytecode"] is None)
+        logger.info(
+            f"Batch compilation of {len(pending)} contracts with {len(groups)} solc version(s) finished ({failed} failed)."
+        )
+
+    return [results[name] for name in sources]
+
+def _run_standard_json(sources, solc):
+    """Runs one ``solc --standard-json`` process over ``{name: source}``."""
+    request = {
+        "language": "Solidity",
+        "sources": {name: {"content": code} for name, code in sources.items()},
+        "settings": STANDARD_JSON_SETTINGS,
+    }
     try:
         result = subprocess.run(
-            ['slither', contract_file_path],
+            [solc, '--standard-json'], input=json.dumps(request),
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"solc --standard-json exited with {result.returncode}: {result.stderr}")
+        return json.loads(result.stdout)
+    except Exception as e:
+        logger.exception(f"Error during batch Solidity compilation: {e}")
+        raise e
 
-        if result.returncode == 0:
+def _compile_isolated(sources, solc):
+    """Compiles ``sources`` together, peeling off failing sources until the rest compile."""
+    results = {}
+    pending = dict(sources)
+
+    while pending:
+        output = _run_standard_json(pending, solc)
+        diagnostics = output.get("errors", [])
+        errors = [d for d in diagnostics if d.get("severity") == "error"]
+
+        if not errors:
+            for name in pending:
+                contracts = output.get("contracts", {}).get(name, {})
+                results[name] = {
+                    "bytecode": {contract: data["evm"]["bytecode"]["object"] for contract, data in contracts.items()},
+                    "errors": [],
+                    "warnings": _messages_for(diagnostics, name),
+                }
+            break
+
+        failed = {d.get("sourceLocation", {}).get("file") for d in errors} & pending.keys()
+        for name in failed:
+            results[name] = {"bytecode": None, "errors": _messages_for(errors, name), "warnings": []}
+            del pending[name]
+
+        if not failed:
+            # Errors that name no source: narrow them down by halving the batch
+            names = list(pending)
+            if len(names) == 1:
+                results[names[0]] = {"bytecode": None, "errors": [d.get("formattedMessage", d.get("message")) for d in errors], "warnings": []}
+                break
+            half = len(names) // 2
+            results.update(_compile_isolated({name: pending[name] for name in names[:half]}, solc))
+            results.update(_compile_isolated({name: pending[name] for name in names[half:]}, solc))
+            break
+
+    return results
+
+def _messages_for(diagnostics, name):
+    return [
+        d.get("formattedMessage", d.get("message"))
+        for d in diagnostics
+        if d.get("sourceLocation", {}).get("file") == name
+    ]
+
+class SlitherTimeoutError(TimeoutError):
+    """Raised when a Slither job exceeds its wall-clock budget and is killed."""
+
+# Runs in the child in place of a preexec_fn, which can deadlock between fork and exec while
+# other threads are running: caps the address space, then becomes the real command
+_LIMIT_AND_EXEC = (
+    "import os, resource, sys; limit = int(sys.argv[1]); "
+    "resource.setrlimit(resource.RLIMIT_AS, (limit, limit)); os.execvp(sys.argv[2], sys.argv[2:])"
+)
+
+def _memory_limited(command, memory_limit_mb):
+    """Wraps ``command`` so it runs with its address space capped, unless uncapped."""
+    if not memory_limit_mb:
+        return command
+    return [sys.executable, '-c', _LIMIT_AND_EXEC, str(memory_limit_mb * 1024 * 1024), *command]
+
+def run_slither(contract_file_path, timeout=SLITHER_TIMEOUT, memory_limit_mb=SLITHER_MEMORY_LIMIT_MB, extra_args=()):
+    """Runs Slither in its own process group under a wall-clock timeout and memory cap.
+
+    On timeout the whole process group is killed (Slither spawns solc itself), and the
+    result has status ``"timeout"``. Returns ``{"status": "ok" | "failed" | "timeout",
+    "output", "stderr", "seconds"}``.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        _memory_limited(['slither', contract_file_path, *extra_args], memory_limit_mb),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=timeout or None)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        stdout, stderr = process.communicate()
+        logger.error(f"Slither analysis timed out after {timeout}s for {contract_file_path}; process killed.")
+        return {"status": "timeout", "output": stdout, "stderr": stderr, "seconds": time.perf_counter() - started}
+
+    status = "ok" if process.returncode == 0 else "failed"
+    return {"status": status, "output": stdout, "stderr": stderr, "seconds": time.perf_counter() - started}
+
+SLITHER_JSON_ARGS = ('--json', '-')
+
+def parse_slither_json(slither_output):
+    """Parses ``slither --json -`` output into compact findings.
+
+    Each finding is ``{"detector", "impact", "confidence", "lines"}`` where ``lines`` are
+    the source lines of all elements involved. Returns None if Slither reported failure.
+    """
+    try:
+        report = json.loads(slither_output)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Could not parse Slither JSON output: {e}")
+        return None
+
+    if not report.get("success"):
+        logger.error(f"Slither reported failure: {report.get('error')}")
+        return None
+
+    findings = []
+    for detector in (report.get("results") or {}).get("detectors", []):
+        lines = set()
+        for element in detector.get("elements", []):
+            lines.update(element.get("source_mapping", {}).get("lines", []))
+        findings.append({
+            "detector": detector.get("check"),
+            "impact": detector.get("impact"),
+            "confidence": detector.get("confidence"),
+            "lines": sorted(lines),
+        })
+    return findings
+
+def _structured_result(contract_file_path, result):
+    """Turns a JSON-mode ``run_slither`` result into findings (or None on failure)."""
+    if result["status"] == "timeout":
+        raise SlitherTimeoutError(f"Slither analysis timed out for {contract_file_path}")
+
+    # Slither exits non-zero when it has findings, so success is read from the JSON itself
+    findings = parse_slither_json(result["output"])
+    if findings is None:
+        logger.error(f"Slither analysis failed for {contract_file_path}: {result['stderr']}")
+        return None
+    logger.info(f"Slither analysis successful for {contract_file_path} ({len(findings)} findings).")
+    return findings
+
+def _analyze_with_slither(contract_file_path, timeout=SLITHER_TIMEOUT, memory_limit_mb=SLITHER_MEMORY_LIMIT_MB, structured=False):
+    """Runs Slither analysis on a compiled contract using Slither.
+
+    With ``structured=True`` Slither runs with JSON output and the compact findings list
+    from ``parse_slither_json`` is returned instead of the human-readable report.
+    """
+    try:
+        extra_args = SLITHER_JSON_ARGS if structured else ()
+        result = run_slither(contract_file_path, timeout=timeout, memory_limit_mb=memory_limit_mb, extra_args=extra_args)
+
+        if structured:
+            return _structured_result(contract_file_path, result)
+
+        if result["status"] == "ok":
             logger.info(f"Slither analysis successful for {contract_file_path}.")
-            return result.stdout  # Return analysis output
+            return result["output"]  # Return analysis output
+        elif result["status"] == "timeout":
+            raise SlitherTimeoutError(f"Slither analysis timed out for {contract_file_path}")
         else:
-            logger.error(f"Slither analysis failed for {contract_file_path}: {result.stderr}")
+            logger.error(f"Slither analysis failed for {contract_file_path}: {result['stderr']}")
             return None  # Slither analysis failed
 
+    except SlitherTimeoutError:
+        raise
     except Exception as e:
         logger.exception(f"Error during Slither analysis: {e}")
         raise e
 
+class SlitherExecutor:
+    """Runs Slither jobs in parallel, at most ``max_workers`` analyses at a time.
+
+    Every job is its own OS process (see ``run_slither``); the pool threads only wait on
+    them, so analyses run truly in parallel across cores while the number of live
+    Slither processes, their wall time and their memory stay bounded.
+    """
+
+    def __init__(self, max_workers=SLITHER_WORKERS, timeout=SLITHER_TIMEOUT, memory_limit_mb=SLITHER_MEMORY_LIMIT_MB,
+                 structured=False):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.structured = structured
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="slither")
+        logger.success(f"Slither executor started with {max_workers} workers (timeout {timeout}s, memory cap {memory_limit_mb} MB).")
+
+    def submit(self, contract_file_path):
+        """Queues an analysis; the future resolves to a ``run_slither`` result dict."""
+        return self._pool.submit(self._run, contract_file_path)
+
+    def _run(self, contract_file_path):
+        try:
+            result = run_slither(
+                contract_file_path, timeout=self.timeout, memory_limit_mb=self.memory_limit_mb,
+                extra_args=SLITHER_JSON_ARGS if self.structured else ()
+            )
+        except Exception as e:
+            logger.exception(f"Error during Slither analysis: {e}")
+            result = {"status": "failed", "output": "", "stderr": str(e), "seconds": 0.0}
+        with self._lock:
+            self.statuses[result["status"]] += 1
+        return result
+
+    def map(self, contract_file_paths):
+        """Analyzes many contracts in parallel, yielding results in input order."""
+        futures = [self.submit(path) for path in contract_file_paths]
+        for future in futures:
+            yield future.result()
+
+    def analyze(self, contract_file_path):
+        """Blocking analysis with ``_analyze_with_slither`` semantics (raises on timeout)."""
+        result = self.submit(contract_file_path).result()
+        if self.structured:
+            return _structured_result(contract_file_path, result)
+        if result["status"] == "timeout":
+            raise SlitherTimeoutError(f"Slither analysis timed out for {contract_file_path}")
+        if result["status"] != "ok":
+            logger.error(f"Slither analysis failed for {contract_file_path}: {result['stderr']}")
+            return None
+        logger.info(f"Slither analysis successful for {contract_file_path}.")
+        return result["output"]
+
+    def analyze_node(self, compiled_contract_file):
+        """Node wrapper, interchangeable with ``analyze_with_slither_node``."""
+        return lambda: self.analyze(compiled_contract_file)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+def validate_solidity_node(contract_code):
+    """Node wrapper for extracting and validating Solidity before compilation."""
+    return lambda: validate_solidity(contract_code)
+
 def compile_solidity_node(contract_code):
     """Node wrapper for compiling Solidity contract using solc."""
     return lambda: _compile_solidity(contract_code)
 
+def compile_solidity_checked_node(contract_code):
+    """Node wrapper for compiling Solidity that raises SolidityCompilationError with solc's diagnostics."""
+    return lambda: _compile_solidity(contract_code, raise_on_error=True)
+
+def compile_solidity_batch_node(contract_codes):
+    """Node wrapper for compiling a batch of Solidity contracts in one solc process."""
+    return lambda: compile_solidity_batch(contract_codes)
+
 def analyze_with_slither_node(compiled_contract_file):
     """Node wrapper for analyzing compiled contract with Slither."""
     return lambda: _analyze_with_slither(compiled_contract_file)
+
+def analyze_with_slither_json_node(compiled_contract_file):
+    """Node wrapper for analyzing a compiled contract into structured Slither findings."""
+    return lambda: _analyze_with_slither(compiled_contract_file, structured=True)
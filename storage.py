@@ -1,53 +1,114 @@
+import hashlib
+import json
 import os
+import uuid
 from loguru import logger
-from datetime import datetime
+
+def contract_hash(contract_code: str):
+    """SHA-256 of the contract source; the contract's identity in storage."""
+    return hashlib.sha256(contract_code.encode('utf-8')).hexdigest()
 
 class ContractStorage:
-    def __init__(self):
-        # Fixed directories
-        try:
-            os.makedirs('contracts', exist_ok=True)
-            logger.success("Contracts directory created or already exists.")
-        except Exception as e:
-            logger.exception(f"Error creating 'contracts' directory: {e}")
-            raise e
-        
-        try:
-            os.makedirs('reports', exist_ok=True)
-            logger.success("Reports directory created or already exists.")
-        except Exception as e:
-            logger.exception(f"Error creating 'reports' directory: {e}")
-            raise e
+    """Content-addressed store for contracts and their Slither reports.
+
+    A contract lives at ``<contracts_dir>/<hash[:2]>/<hash>.sol`` and its report at
+    ``<reports_dir>/<hash[:2]>/<hash>_SlitherReport.txt`` (or ``_SlitherFindings.json``),
+    so identical sources share one file and no directory grows unbounded. Files are
+    written to a temp name and renamed into place, so readers never see partial files.
+    """
+
+    def __init__(self, contracts_dir='contracts', reports_dir='reports', manifest=None, exporter=None):
+        self.contracts_dir = contracts_dir
+        self.reports_dir = reports_dir
+        self.manifest = manifest  # Optional manifest.ContractManifest indexing every stored contract
+        self.exporter = exporter  # Optional dataset.ShardedJSONLWriter streaming records out as the run goes
+        # Directories are created by the first write into them, not here
+
+    def contract_path(self, source_hash: str):
+        return os.path.join(self.contracts_dir, source_hash[:2], f"{source_hash}.sol")
+
+    def report_path(self, source_hash: str, structured=False):
+        suffix = "_SlitherFindings.json" if structured else "_SlitherReport.txt"
+        return os.path.join(self.reports_dir, source_hash[:2], f"{source_hash}{suffix}")
+
+    def has_contract(self, contract_code: str):
+        """Whether an identical contract has already been saved."""
+        return os.path.exists(self.contract_path(contract_hash(contract_code)))
 
     def save_contract(self, contract_code: str):
         """Saves the generated Solidity contract to the contracts directory."""
         if not contract_code:
             raise ValueError("Contract code is empty. Cannot save an empty contract.")
-            
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"contract_{timestamp}.sol"
-        filepath = os.path.join('contracts', filename)
+
+        filepath = self.contract_path(contract_hash(contract_code))
+        if os.path.exists(filepath):
+            logger.info(f"Identical contract already stored at {filepath}")
+            return filepath
+
         try:
-            with open(filepath, 'w') as f:
-                f.write(contract_code)
+            self._atomic_write(filepath, contract_code)
             logger.success(f"Contract saved at {filepath}")
             return filepath
         except Exception as e:
             logger.exception(f"Error saving contract: {e}")
             raise e
 
-    def save_slither_report(self, contract_filepath: str, slither_report: str):
-        """Saves the Slither analysis report to the reports directory."""
-        if not slither_report:
+    def save_slither_report(self, contract_filepath: str, slither_report):
+        """Saves the Slither analysis report to the reports directory.
+
+        The report is linked to its contract by the contract's source hash. Text reports
+        are written verbatim; structured findings (a list, possibly empty) are written as
+        compact JSON.
+        """
+        if slither_report is None or slither_report == "":
             raise ValueError("Slither report is empty. Cannot save an empty report.")
-            
-        report_filename = os.path.splitext(os.path.basename(contract_filepath))[0] + "_SlitherReport.txt"
-        report_filepath = os.path.join('reports', report_filename)
+
+        structured = isinstance(slither_report, list)
+        source_hash = os.path.splitext(os.path.basename(contract_filepath))[0]
+        report_filepath = self.report_path(source_hash, structured)
         try:
-            with open(report_filepath, 'w') as f:
-                f.write(slither_report)
+            if structured:
+                self._atomic_write(report_filepath, json.dumps(slither_report, separators=(",", ":")))
+            else:
+                self._atomic_write(report_filepath, slither_report)
             logger.success(f"Slither report saved at {report_filepath}")
             return report_filepath
         except Exception as e:
             logger.exception(f"Error saving Slither report: {e}")
             raise e
+
+    def record_contract(self, record):
+        """Adds a finished contract to the manifest and the dataset export, if configured."""
+        if self.manifest is not None:
+            self.manifest.record(record)
+        if self.exporter is not None and record.get("contract_code"):
+            self.exporter.write({
+                "contract_hash": record["contract_hash"],
+                "complexity": record.get("complexity"),
+                "vulnerabilities": record.get("vulnerabilities"),
+                "status": record.get("status"),
+                "compile_status": record.get("compile_status"),
+                "contract_code": record["contract_code"],
+                "findings": record.get("findings"),
+                "report": record.get("report"),
+            })
+
+    def close(self):
+        """Flushes pending manifest writes and completes the current export shard."""
+        if self.manifest is not None:
+            self.manifest.close()
+        if self.exporter is not None:
+            self.exporter.close()
+
+    @staticmethod
+    def _atomic_write(filepath, content):
+        """Writes to a unique temp file in the target directory, then renames it into place."""
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        temp_filepath = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_filepath, 'w') as f:
+                f.write(content)
+            os.replace(temp_filepath, filepath)
+        finally:
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
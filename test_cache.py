@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch
+from cache import DiskCache, cache_key
+
+# Test storing and reading values with hit/miss accounting
+def test_cache_get_set(tmp_path):
+    # Arrange
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+
+    # Act
+    cache.set("a", b"alpha")
+    cache.set_json("b", {"text": "beta"})
+
+    # Assert
+    assert cache.get("a") == b"alpha"
+    assert cache.get_json("b") == {"text": "beta"}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["entries"] == 2
+
+# Test that entries survive reopening the cache file
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = DiskCache(path)
+    first.set("key", b"value")
+    first.close()
+
+    second = DiskCache(path)
+
+    assert second.get("key") == b"value"
+    assert second.stats()["bytes"] == 5
+
+# Test that the least recently read entries are evicted once over the size bound
+@patch("cache.time.time")
+def test_cache_lru_eviction(mock_time, tmp_path):
+    # Arrange
+    mock_time.side_effect = [float(t) for t in range(100)]
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=30)
+    cache.set("old", b"x" * 10)
+    cache.set("recent", b"x" * 10)
+    cache.set("newer", b"x" * 10)
+    cache.get("old")  # Refresh "old" so "recent" becomes the LRU entry
+
+    # Act
+    cache.set("newest", b"x" * 10)
+
+    # Assert
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    assert cache.stats()["evictions"] >= 1
+    assert cache.stats()["bytes"] <= 30
+
+def test_cache_key_is_stable():
+    assert cache_key("generate", {"b": 1, "a": 2}, 0) == cache_key("generate", {"a": 2, "b": 1}, 0)
+    assert cache_key("generate", {"a": 2}, 0) != cache_key("generate", {"a": 2}, 1)
+
+# Test that a cache shared across hosts leaves WAL mode, keeping the entries written in it
+def test_cache_without_wal(tmp_path):
+    # Arrange
+    path = str(tmp_path / "cache.sqlite")
+    first = DiskCache(path)
+    first.set("key", b"value")
+    first.close()
+
+    # Act
+    shared = DiskCache(path, wal=False)
+
+    # Assert
+    assert shared._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert shared.get("key") == b"value"
+    shared.close()
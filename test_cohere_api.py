@@ -1,6 +1,13 @@
+import asyncio
+import json
+import threading
 import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, Mock
-from cohere_api import CohereAPI
+from cohere_api import CohereAPI, AsyncCohereAPI
+from rate_limit import RateLimiter
+from cache import DiskCache
+from cohere.core.api_error import ApiError
 from requests.exceptions import RequestException
 
 # Mock API key for testing
@@ -11,7 +18,7 @@ API_KEY = "test_api_key"
 def test_chat(mock_cohere_client):
     # Arrange
     mock_client_instance = mock_cohere_client.return_value
-    mock_client_instance.chat.return_value = Mock(generations=[Mock(text="Chat response")])
+    mock_client_instance.chat.return_value = Mock(text="Chat response")
 
     api = CohereAPI(api_key=API_KEY)
     messages = ["Hello Cohere"]
@@ -21,7 +28,32 @@ def test_chat(mock_cohere_client):
 
     # Assert
     assert response == "Chat response"
-    mock_client_instance.chat.assert_called_once_with(messages=messages)
+    assert mock_client_instance.chat.call_args[1]["message"] == "Hello Cohere"
+
+# Test that role/content messages map onto the preamble, history and current message
+@patch("cohere_api.cohere.Client")
+def test_chat_messages_mapping(mock_cohere_client):
+    # Arrange
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.chat.return_value = Mock(text="Fixed")
+    api = CohereAPI(api_key=API_KEY)
+
+    # Act
+    api.chat([
+        {"role": "system", "content": "You fix Solidity."},
+        {"role": "user", "content": "Fix this."},
+        {"role": "assistant", "content": "Here."},
+        {"role": "user", "content": "Still broken."},
+    ])
+
+    # Assert
+    kwargs = mock_client_instance.chat.call_args[1]
+    assert kwargs["preamble"] == "You fix Solidity."
+    assert kwargs["message"] == "Still broken."
+    assert kwargs["chat_history"] == [
+        {"role": "USER", "message": "Fix this."},
+        {"role": "CHATBOT", "message": "Here."},
+    ]
 
 # Test contract generation with a successful response
 @patch("cohere_api.cohere.Client")
@@ -76,9 +108,218 @@ def test_generate_contract_network_error(mock_cohere_client):
 
     assert mock_client_instance.generate.call_count == 3  # Should retry 3 times before failing
 
+# Test that batched generation splits into request-sized calls and drops empty candidates
+@patch("cohere_api.cohere.Client")
+def test_generate_contracts_batched(mock_cohere_client):
+    # Arrange
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.generate.side_effect = [
+        Mock(generations=[Mock(text=f"contract {i}") for i in range(4)] + [Mock(text="")]),
+        Mock(generations=[Mock(text="contract 5"), Mock(text="contract 6")]),
+    ]
+
+    api = CohereAPI(api_key=API_KEY)
+
+    # Act
+    contracts = api.generate_contracts("medium", ["reentrancy"], num_generations=7)
+
+    # Assert
+    assert contracts == ["contract 0", "contract 1", "contract 2", "contract 3", "contract 5", "contract 6"]
+    sizes = [call[1]["num_generations"] for call in mock_client_instance.generate.call_args_list]
+    assert sizes == [5, 2]
+
+@patch("cohere_api.cohere.Client")
+def test_generate_contracts_rejects_zero(mock_cohere_client):
+    api = CohereAPI(api_key=API_KEY)
+
+    with pytest.raises(ValueError, match="num_generations must be at least 1"):
+        api.generate_contracts("low", ["reentrancy"], num_generations=0)
+
+# Test that a rerun with the same prompts is served from the generation cache
+@patch("cohere_api.cohere.Client")
+def test_generate_contracts_cached_replay(mock_cohere_client, tmp_path):
+    # Arrange
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.generate.return_value = Mock(generations=[Mock(text="contract A"), Mock(text="contract B")])
+    cache = DiskCache(str(tmp_path / "generations.sqlite"))
+
+    first_run = CohereAPI(api_key=API_KEY, cache=cache)
+    first = first_run.generate_contracts("low", ["reentrancy"], num_generations=2)
+
+    # Act
+    replay = CohereAPI(api_key=API_KEY, cache=cache)
+    replayed = replay.generate_contracts("low", ["reentrancy"], num_generations=2)
+    partial = replay.generate_contracts("low", ["reentrancy"], num_generations=1)  # Slot 2 was never generated
+
+    # Assert
+    assert replayed == first == ["contract A", "contract B"]
+    assert mock_client_instance.generate.call_count == 2  # First run plus the uncached slot
+    assert mock_client_instance.generate.call_args[1]["num_generations"] == 1
+    assert partial == ["contract A"]
+    assert cache.stats()["hits"] == 2
+
+# Test that chat responses are cached by message content
+@patch("cohere_api.cohere.Client")
+def test_chat_cached(mock_cohere_client, tmp_path):
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.chat.return_value = Mock(text="Chat response")
+    api = CohereAPI(api_key=API_KEY, cache=DiskCache(str(tmp_path / "chat.sqlite")))
+
+    assert api.chat(["Hello"]) == api.chat(["Hello"]) == "Chat response"
+    mock_client_instance.chat.assert_called_once()
+
+# Test that a different chat model misses the cached reply instead of returning a stale one
+@patch("cohere_api.cohere.Client")
+def test_chat_cache_keyed_on_model(mock_cohere_client, tmp_path):
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.chat.return_value = Mock(text="Chat response")
+    api = CohereAPI(api_key=API_KEY, cache=DiskCache(str(tmp_path / "chat.sqlite")))
+    api.chat(["Hello"])
+
+    with patch("cohere_api.GENERATION_MODEL", "another-model"):
+        api.chat(["Hello"])
+
+    assert mock_client_instance.chat.call_count == 2
+    assert mock_client_instance.chat.call_args[1]["model"] == "another-model"
+
 # Test the prompt builder
 def test_build_prompt():
     api = CohereAPI(api_key=API_KEY)
     prompt = api._build_prompt("low", ["reentrancy", "arbitrary-send-erc20"])
 
     assert prompt == "Complexity level: low\nGenerate a Solidity contract with the following vulnerabilities: reentrancy, arbitrary-send-erc20."
+
+
+class FakeCohereHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Cohere /v1/generate endpoint."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        payload = json.dumps({
+            "id": "gen-1",
+            "generations": [{"id": "g-1", "text": f"contract Fake {{}} // {body['prompt']}"}]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def fake_cohere_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCohereHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+# Test the async client end to end against a local fake HTTP server
+def test_async_generate_contract_fake_server(fake_cohere_server):
+    # Arrange
+    base_url = f"http://127.0.0.1:{fake_cohere_server.server_address[1]}"
+
+    async def run():
+        async with AsyncCohereAPI(api_key=API_KEY, base_url=base_url, max_connections=4) as api:
+            return await asyncio.gather(*[
+                api.generate_contract("low", [f"vuln-{i}"]) for i in range(8)
+            ])
+
+    # Act
+    contracts = asyncio.run(run())
+
+    # Assert
+    assert len(fake_cohere_server.requests) == 8
+    assert all(path == "/v1/generate" for path, _ in fake_cohere_server.requests)
+    assert contracts[3].endswith("vulnerabilities: vuln-3.")
+    assert fake_cohere_server.requests[0][1]["num_generations"] == 1
+
+# Test that the async client waits on the shared limiter before each request
+def test_async_generate_contract_uses_rate_limiter(fake_cohere_server):
+    # Arrange
+    base_url = f"http://127.0.0.1:{fake_cohere_server.server_address[1]}"
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000)
+
+    async def run():
+        async with AsyncCohereAPI(api_key=API_KEY, base_url=base_url, rate_limiter=limiter) as api:
+            return await api.generate_contract("medium", ["reentrancy"])
+
+    # Act
+    with patch.object(limiter, "acquire_async", wraps=limiter.acquire_async) as mock_acquire:
+        contract = asyncio.run(run())
+
+    # Assert
+    assert contract.startswith("contract Fake")
+    mock_acquire.assert_called_once()
+    assert mock_acquire.call_args[0][0] > 2000  # Prompt estimate plus completion ceiling
+
+def stream_events(texts, consumed):
+    """Stream of text-generation events recording how many were read."""
+    for index, text in texts:
+        consumed.append(text)
+        yield Mock(event_type="text-generation", text=text, index=index)
+    yield Mock(event_type="stream-end")
+
+# Test that a streamed generation is cancelled once the contract has closed
+@patch("cohere_api.cohere.Client")
+def test_generate_contract_streaming_stops_at_contract_end(mock_cohere_client):
+    # Arrange
+    consumed = []
+    chunks = ["pragma solidity ^0.8.0;\ncontract A {\n", "    uint x;\n}\n", "\nThis contract ", "stores a number.", " More prose."]
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.generate_stream.return_value = stream_events([(None, c) for c in chunks], consumed)
+
+    api = CohereAPI(api_key=API_KEY, streaming=True)
+
+    # Act
+    contract = api.generate_contract("low", ["reentrancy"])
+
+    # Assert
+    assert contract == "pragma solidity ^0.8.0;\ncontract A {\n    uint x;\n}"
+    assert len(consumed) == 3  # The rest of the explanation was never read
+    mock_client_instance.generate.assert_not_called()
+    assert api.stream_stats["stopped_early"] == 1
+    assert api.stream_stats["cancelled"] == 1
+
+# Test that prose-only generations are aborted and dropped while good ones are kept
+@patch("cohere_api.cohere.Client")
+def test_generate_contracts_streaming_aborts_unusable(mock_cohere_client):
+    # Arrange
+    consumed = []
+    prose = "Smart contracts are programs on a blockchain. " * 3
+    events = [(0, "contract A {}\n"), (1, prose), (1, prose), (0, "It works."), (1, prose)]
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.generate_stream.return_value = stream_events(events, consumed)
+
+    api = CohereAPI(api_key=API_KEY, streaming=True, stream_abort_after_chars=200)
+
+    # Act
+    contracts = api.generate_contracts("low", ["reentrancy"], num_generations=2)
+
+    # Assert
+    assert contracts == ["contract A {}"]
+    assert len(consumed) == 4  # Cancelled once both generations were decided
+    assert api.stream_stats["aborted"] == 1
+
+# Test that chat shares the retry policy and that the SDK's own retries are switched off
+@patch("retry.time.sleep")
+@patch("cohere_api.cohere.Client")
+def test_chat_retries_server_errors(mock_cohere_client, mock_sleep):
+    # Arrange
+    mock_client_instance = mock_cohere_client.return_value
+    mock_client_instance.chat.side_effect = [ApiError(status_code=503), Mock(text="Recovered")]
+    api = CohereAPI(api_key=API_KEY)
+
+    # Act
+    response = api.chat(["Hello"])
+
+    # Assert
+    assert response == "Recovered"
+    assert mock_client_instance.chat.call_count == 2
+    assert mock_client_instance.chat.call_args[1]["request_options"] == {"max_retries": 0}
+    assert api.retry_policy.stats["retries"] == 1
@@ -1,71 +1,546 @@
 import pytest
+import random
+import threading
+import time
 from unittest.mock import patch, Mock
-from contract_agent import ContractAgent
+from cache import DiskCache
+from cohere_api import CohereAPI
+from contract_agent import ContractAgent, StateGraph
+from journal import RunJournal
+from near_dup import NearDuplicateIndex
+from scheduler import CoverageScheduler
+from work_queue import WorkQueue
+from solidity_tools import validate_solidity_node, SolidityCompilationError
+
+PARAMS = ("medium", ["reentrancy", "arbitrary-send-eth"])
+
+def make_tools():
+    """Builds mock tools that let a contract pass through every stage."""
+    cohere_tool = Mock()
+    cohere_tool.generate_contract.return_value = "pragma solidity ^0.8.0; contract Test {}"
+    compile_node = Mock(return_value=lambda: "Compiled contract")
+    analyze_node = Mock(return_value=lambda: "Slither analysis report")
+    storage_tool = Mock()
+    storage_tool.has_contract.return_value = False
+    storage_tool.save_contract.return_value = "contracts/contract_1.sol"
+    storage_tool.save_slither_report.return_value = "reports/contract_1_SlitherReport.txt"
+    return cohere_tool, compile_node, analyze_node, storage_tool
 
 # Test the full workflow (contract generation, compilation, analysis, saving)
-@patch("contract_agent.StateGraph")
-@patch("contract_agent.ContractStorage.save_contract")  # Mocking save_contract method in the ContractStorage class
-@patch("contract_agent.ContractStorage.save_slither_report")  # Mocking save_slither_report method in the ContractStorage class
-@patch("contract_agent.compile_solidity_node")
-@patch("contract_agent.analyze_with_slither_node")
-@patch("contract_agent.CohereAPI")
-def test_full_workflow(mock_cohere_api, mock_compile_node, mock_analyze_node, mock_save_contract, mock_save_slither_report, mock_state_graph):
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_full_workflow(mock_get_params):
     # Arrange
-    mock_state_graph_instance = mock_state_graph.return_value
-    mock_state_graph_instance.execute.return_value = True  # Simulate successful workflow execution
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    agent = ContractAgent(
+        cohere_tool=cohere_tool,
+        compile_contract_node=compile_node,
+        analyze_contract_node=analyze_node,
+        storage_tool=storage_tool
+    )
 
-    mock_cohere_tool = mock_cohere_api.return_value
-    mock_compile_tool = mock_compile_node
-    mock_analyze_tool = mock_analyze_node
+    # Act
+    results = agent.execute(num_contracts=1)
 
-    mock_save_contract.return_value = "contract saved"  # Simulate successful contract saving
-    mock_save_slither_report.return_value = "report saved"  # Simulate successful report saving
+    # Assert
+    cohere_tool.generate_contract.assert_called_once_with(*PARAMS)
+    compile_node.assert_called_once_with("pragma solidity ^0.8.0; contract Test {}")
+    analyze_node.assert_called_once_with("contracts/contract_1.sol")
+    storage_tool.save_contract.assert_called_once()  # Ensure save_contract is called
+    storage_tool.save_slither_report.assert_called_once_with("contracts/contract_1.sol", "Slither analysis report")
+    assert results[0]["status"] == "completed"
+    assert results[0]["report_path"] == "reports/contract_1_SlitherReport.txt"
+
+    # The finished contract is indexed with its parameters and per-stage timings
+    record = storage_tool.record_contract.call_args[0][0]
+    assert record["complexity"] == "medium"
+    assert record["vulnerabilities"] == ["reentrancy", "arbitrary-send-eth"]
+    assert record["compile_status"] == "success"
+    assert set(record["timings"]) == {
+        "generate_contract", "deduplicate_contract", "compile_contract",
+        "save_contract", "analyze_contract", "save_slither_report"
+    }
+
+# Test the workflow without analysis node
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_workflow_without_analysis(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, _, storage_tool = make_tools()
 
-    # Initialize the agent with mock components
+    # Initialize the agent without the analysis node, passing None explicitly
     agent = ContractAgent(
-        cohere_tool=mock_cohere_tool,
-        compile_contract_node=mock_compile_tool,
-        analyze_contract_node=mock_analyze_tool,  # Ensure Slither analysis is included
-        storage_tool=Mock()  # Create a mock for storage_tool to handle saving methods
+        cohere_tool=cohere_tool,
+        compile_contract_node=compile_node,
+        analyze_contract_node=None,  # Pass None when analysis is skipped
+        storage_tool=storage_tool
     )
 
     # Act
-    agent.execute(num_contracts=1)
+    results = agent.execute(num_contracts=1)
 
     # Assert
-    mock_state_graph_instance.execute.assert_called_once_with("generate_contract", {'messages': []})
-    mock_save_contract.assert_called_once()  # Ensure save_contract is called
-    mock_save_slither_report.assert_called_once()  # Ensure save_slither_report is called
+    storage_tool.save_contract.assert_called_once()  # Ensure save_contract is called
+    storage_tool.save_slither_report.assert_not_called()  # No report without analysis
+    assert results[0]["status"] == "completed"
 
-# Test the workflow without analysis node
-@patch("contract_agent.StateGraph")
-@patch("contract_agent.ContractStorage.save_contract")  # Mocking save_contract method in the ContractStorage class
-@patch("contract_agent.ContractStorage.save_slither_report")  # Mocking save_slither_report method in the ContractStorage class
-@patch("contract_agent.compile_solidity_node")
-@patch("contract_agent.CohereAPI")
-def test_workflow_without_analysis(mock_cohere_api, mock_compile_node, mock_save_contract, mock_save_slither_report, mock_state_graph):
+# Test that a compilation failure stops the contract before saving
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_workflow_stops_on_compile_failure(mock_get_params):
     # Arrange
-    mock_state_graph_instance = mock_state_graph.return_value
-    mock_state_graph_instance.execute.return_value = True  # Simulate successful workflow execution
+    cohere_tool, _, analyze_node, storage_tool = make_tools()
+    agent = ContractAgent(cohere_tool, Mock(return_value=lambda: None), analyze_node, storage_tool)
 
-    mock_cohere_tool = mock_cohere_api.return_value
-    mock_compile_tool = mock_compile_node
+    # Act
+    results = agent.execute(num_contracts=1)
 
-    mock_save_contract.return_value = "contract saved"  # Simulate successful contract saving
-    mock_save_slither_report.return_value = "report saved"  # Simulate successful report saving
+    # Assert
+    assert results[0]["status"] == "compile_failed"
+    assert storage_tool.record_contract.call_args[0][0]["compile_status"] == "failed"
+    assert agent.metrics.summary()["stages"]["compile_contract"]["errors"] == 1
+    storage_tool.save_contract.assert_not_called()
+    analyze_node.assert_not_called()
 
-    # Initialize the agent without the analysis node, passing None explicitly
+# Test that identical contracts are skipped before compilation
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_workflow_skips_duplicates(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = ["contract A {}", "contract A {}", "contract B {}"]
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool)
+
+    # Act
+    results = agent.execute(num_contracts=3)
+
+    # Assert
+    assert [r["status"] for r in results] == ["completed", "duplicate", "completed"]
+    assert results[0]["contract_hash"] == results[1]["contract_hash"]
+    assert compile_node.call_count == 2
+
+# Test that contracts already in storage from an earlier run are skipped
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_workflow_skips_stored_contracts(mock_get_params):
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    storage_tool.has_contract.return_value = True
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool)
+
+    results = agent.execute(num_contracts=1)
+
+    assert results[0]["status"] == "duplicate"
+    compile_node.assert_not_called()
+
+# Test that an analysis timeout is recorded as its own result state
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_workflow_analysis_timeout(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, _, storage_tool = make_tools()
+
+    def timed_out():
+        raise TimeoutError("Slither analysis timed out")
+
+    agent = ContractAgent(cohere_tool, compile_node, Mock(return_value=timed_out), storage_tool)
+
+    # Act
+    results = agent.execute(num_contracts=1)
+
+    # Assert
+    assert results[0]["status"] == "analysis_timeout"
+    assert agent.metrics.summary()["stages"]["analyze_contract"]["timeouts"] == 1
+    assert agent.metrics.summary()["outcomes"] == {"analysis_timeout": 1}
+    assert results[0]["contract_path"] == "contracts/contract_1.sol"
+    storage_tool.save_slither_report.assert_not_called()
+
+# Test that the graph is built and compiled once per agent, not per contract
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_graph_compiled_once(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = ["contract A {}", "contract B {}", "contract C {}"]
+    with patch("contract_agent.StateGraph", wraps=StateGraph) as mock_state_graph:
+        agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool)
+
+        # Act
+        results = agent.execute(num_contracts=3, concurrency=2)
+
+    # Assert
+    assert mock_state_graph.call_count == 1
+    assert [r["status"] for r in results] == ["completed"] * 3
+
+# Test that batched candidates for one prompt flow through the pipeline one contract at a time
+@patch("contract_agent.get_params", side_effect=[("low", ["reentrancy"]), ("high", ["arbitrary-send-eth"])])
+def test_batched_generation_groups(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    cohere_tool.generate_contracts.side_effect = lambda c, v, num_generations: [
+        f"contract {c} {n}" for n in range(num_generations)
+    ]
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, generations_per_prompt=3)
+
+    # Act
+    results = agent.execute(num_contracts=5)
+
+    # Assert
+    assert [r["complexity"] for r in results] == ["low"] * 3 + ["high"] * 2
+    assert [call[1]["num_generations"] for call in cohere_tool.generate_contracts.call_args_list] == [3, 2]
+    assert [call[0][0] for call in compile_node.call_args_list] == [
+        "contract low 0", "contract low 1", "contract low 2", "contract high 0", "contract high 1"
+    ]
+    cohere_tool.generate_contract.assert_not_called()
+    assert agent._candidate_groups == {}  # Exhausted groups are released
+
+# Test that concurrent execution keeps results in contract order and bounds in-flight work
+def test_concurrent_execution_bounded_and_ordered():
+    # Arrange
     agent = ContractAgent(
-        cohere_tool=mock_cohere_tool,
-        compile_contract_node=mock_compile_tool,
-        analyze_contract_node=None,  # Pass None when analysis is skipped
-        storage_tool=Mock()  # Create a mock for storage_tool to handle saving methods
+        cohere_tool=Mock(),
+        compile_contract_node=Mock(),
+        analyze_contract_node=Mock(),
+        storage_tool=Mock()
     )
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def fake_run_contract(i, num_contracts, params=None):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01 * (i % 3))  # Finish out of order
+        with lock:
+            in_flight -= 1
+        return {"index": i, "status": "completed"}
+
+    agent._run_contract = fake_run_contract
+
+    # Act
+    results = agent.execute(num_contracts=12, concurrency=3)
+
+    # Assert
+    assert [r["index"] for r in results] == list(range(12))
+    assert all(r["status"] == "completed" for r in results)
+    assert 1 < peak <= 3
+
+# Test that concurrent and serial runs report the same per-contract outcomes
+def test_concurrent_matches_serial():
+    # Arrange
+    agent = ContractAgent(
+        cohere_tool=Mock(),
+        compile_contract_node=Mock(),
+        analyze_contract_node=Mock(),
+        storage_tool=Mock()
+    )
+
+    def fake_run_contract(i, num_contracts, params=None):
+        if i % 4 == 0:
+            return {"index": i, "status": "error", "error": "boom"}  # Failures stay per-contract
+        return {"index": i, "status": "completed"}
+
+    agent._run_contract = fake_run_contract
+
+    # Act
+    serial = agent.execute(num_contracts=10)
+    concurrent = agent.execute(num_contracts=10, concurrency=4)
+
+    # Assert
+    assert serial == concurrent
+
+# Test that a seeded concurrent run draws the same parameters per contract as a serial one
+def test_concurrent_params_match_serial():
+    # Arrange
+    def run(concurrency):
+        cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+        drawn = {}
+
+        def generate(complexity, vulnerabilities):
+            time.sleep(0.001 * (len(drawn) % 3))  # Finish out of order
+            return "pragma solidity ^0.8.0; contract Test {}"
+
+        cohere_tool.generate_contract.side_effect = generate
+        agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, rng=random.Random(1))
+        original = agent._run_contract
+
+        def record_params(i, num_contracts, params=None):
+            drawn[i] = params
+            return original(i, num_contracts, params)
+
+        agent._run_contract = record_params
+        agent.execute(num_contracts=16, concurrency=concurrency)
+        return drawn
+
+    # Act
+    serial = run(1)
+    concurrent = run(8)
+
+    # Assert
+    assert len(serial) == 16
+    assert concurrent == serial
+
+def test_execute_rejects_invalid_concurrency():
+    agent = ContractAgent(Mock(), Mock(), Mock(), Mock())
+
+    with pytest.raises(ValueError, match="Concurrency must be at least 1"):
+        agent.execute(num_contracts=1, concurrency=0)
+
+# Test that output failing pre-compile validation is rejected before solc, with the reason kept
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_validation_rejects_before_compile(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = [
+        "Sure! ```solidity\npragma solidity ^0.8.0;\ncontract A {}\n```",
+        "pragma solidity ^0.8.0;\ncontract B {\n    function f() public {",
+    ]
+    agent = ContractAgent(
+        cohere_tool=cohere_tool,
+        compile_contract_node=compile_node,
+        analyze_contract_node=analyze_node,
+        storage_tool=storage_tool,
+        validate_contract_node=validate_solidity_node
+    )
+
+    # Act
+    results = agent.execute(num_contracts=2)
+
+    # Assert
+    compile_node.assert_called_once_with("pragma solidity ^0.8.0;\ncontract A {}\n")
+    assert results[0]["status"] == "completed"
+    assert results[1]["status"] == "rejected"
+    assert results[1]["rejection_reason"] == "truncated: 2 unclosed brace(s)"
+    assert agent.metrics.summary()["stages"]["validate_contract"]["count"] == 2
+
+def failing_compile(*errors):
+    """Compile node failing with the given diagnostics, then succeeding."""
+    outcomes = iter(errors)
+
+    def compile_once():
+        error = next(outcomes, None)
+        if error:
+            raise SolidityCompilationError(error)
+        return "Compiled contract"
+    return Mock(side_effect=lambda code: compile_once)
+
+# Test that a compile failure is repaired from solc's diagnostics instead of being lost
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_repair_loop_fixes_compile_error(mock_get_params):
+    # Arrange
+    cohere_tool, _, analyze_node, storage_tool = make_tools()
+    cohere_tool.chat.return_value = "```solidity\npragma solidity ^0.8.0; contract Test { uint x; }\n```"
+    compile_node = failing_compile("Error: Expected ';'")
+    agent = ContractAgent(
+        cohere_tool=cohere_tool,
+        compile_contract_node=compile_node,
+        analyze_contract_node=analyze_node,
+        storage_tool=storage_tool,
+        validate_contract_node=validate_solidity_node,
+        repair_rounds=2
+    )
+
+    # Act
+    results = agent.execute(num_contracts=1)
+
+    # Assert
+    assert results[0]["status"] == "completed"
+    assert results[0]["repair_rounds"] == 1
+    messages = cohere_tool.chat.call_args[0][0]
+    assert "Error: Expected ';'" in messages[-1]["content"]
+    assert "contract Test {}" in messages[-1]["content"]
+    storage_tool.save_contract.assert_called_once_with("pragma solidity ^0.8.0; contract Test { uint x; }\n")
+    counters = agent.metrics.summary()["counters"]
+    assert counters["repair_succeeded"] == 1
+    assert counters["repair_tokens_spent"] > 0
+
+# Test that repair stops after the configured number of rounds
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_repair_loop_is_bounded(mock_get_params):
+    # Arrange
+    cohere_tool, _, analyze_node, storage_tool = make_tools()
+    cohere_tool.chat.side_effect = [
+        f"pragma solidity ^0.8.0; contract Test {{ uint x{n}; }}" for n in range(5)
+    ]
+    compile_node = failing_compile(*["Error: still broken"] * 5)
+    agent = ContractAgent(
+        cohere_tool=cohere_tool,
+        compile_contract_node=compile_node,
+        analyze_contract_node=analyze_node,
+        storage_tool=storage_tool,
+        repair_rounds=2
+    )
+
+    # Act
+    results = agent.execute(num_contracts=1)
+
+    # Assert
+    assert results[0]["status"] == "compile_failed"
+    assert cohere_tool.chat.call_count == 2
+    assert compile_node.call_count == 3
+    assert agent.metrics.summary()["counters"]["repair_failed"] == 1
+    storage_tool.save_contract.assert_not_called()
+
+# Test that a resumed run skips finished contracts and continues others after their last completed stage
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_resume_from_journal(mock_get_params, tmp_path):
+    # Arrange
+    cohere_tool, compile_node, _, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = [f"pragma solidity ^0.8.0; contract Test{n} {{}}" for n in range(3)]
+    crashing_analyze = Mock(side_effect=[lambda: "report", RuntimeError("killed"), lambda: "report"])
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        first = ContractAgent(cohere_tool, compile_node, crashing_analyze, storage_tool, journal=journal)
+        first_results = first.execute(num_contracts=3)
+
+    cohere_tool.generate_contract.reset_mock()
+    compile_node.reset_mock()
+    analyze_node = Mock(return_value=lambda: "Slither analysis report")
+
+    # Act
+    with RunJournal(path) as journal:
+        resumed = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, journal=journal)
+        results = resumed.execute(num_contracts=3)
+
+    # Assert
+    assert [r["status"] for r in first_results] == ["completed", "error", "completed"]
+    assert [r["status"] for r in results] == ["completed", "completed", "completed"]
+    cohere_tool.generate_contract.assert_not_called()
+    compile_node.assert_not_called()
+    analyze_node.assert_called_once_with("contracts/contract_1.sol")
+    assert storage_tool.save_contract.call_count == 3  # The interrupted contract was not saved twice
+    assert results[1]["report_path"] == "reports/contract_1_SlitherReport.txt"
+
+# Test that a resumed run is not served the cached generations of contracts that already finished
+@patch("contract_agent.get_params", return_value=PARAMS)
+@patch("cohere_api.cohere.Client")
+def test_resume_skips_used_cache_slots(mock_cohere_client, mock_get_params, tmp_path):
+    # Arrange
+    texts = iter(f"pragma solidity ^0.8.0; contract Test{n} {{}}" for n in range(10))
+    mock_cohere_client.return_value.generate.side_effect = lambda **kwargs: Mock(generations=[Mock(text=next(texts))])
+    _, compile_node, analyze_node, storage_tool = make_tools()
+    saved = set()
+    storage_tool.save_contract.side_effect = lambda code, *args, **kwargs: saved.add(code) or "contracts/contract.sol"
+    storage_tool.has_contract.side_effect = lambda code: code in saved
+    cache = DiskCache(str(tmp_path / "generations.sqlite"))
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        first = ContractAgent(CohereAPI(api_key="key", cache=cache), compile_node, analyze_node, storage_tool, journal=journal)
+        first.execute(num_contracts=2)
+
+    # Act
+    with RunJournal(path) as journal:
+        resumed = ContractAgent(CohereAPI(api_key="key", cache=cache), compile_node, analyze_node, storage_tool, journal=journal)
+        results = resumed.execute(num_contracts=4)
+
+    # Assert
+    assert [r["status"] for r in results] == ["completed"] * 4
+    assert mock_cohere_client.return_value.generate.call_count == 4
+    assert len(saved) == 4
+
+# Test that a coverage scheduler picks parameters and ends the run once Slither confirms the targets
+@patch("contract_agent.get_params")
+def test_coverage_scheduler_stops_run(mock_get_params):
+    # Arrange
+    cohere_tool, compile_node, _, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = [f"pragma solidity ^0.8.0; contract Test{n} {{}}" for n in range(10)]
+    analyze_node = Mock(return_value=lambda: [{"detector": "reentrancy-eth", "impact": "High", "confidence": "Medium", "lines": [3]}])
+    scheduler = CoverageScheduler({("high", "reentrancy-eth"): 2})
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, scheduler=scheduler)
+
+    # Act
+    results = agent.execute(num_contracts=10)
+
+    # Assert
+    mock_get_params.assert_not_called()
+    cohere_tool.generate_contract.assert_called_with("high", ["reentrancy-eth"])
+    assert len(results) == 2
+    assert all(result["status"] == "completed" for result in results)
+    assert scheduler.done
+
+# Test that a resumed coverage run counts what its finished contracts already confirmed
+def test_coverage_restored_on_resume(tmp_path):
+    # Arrange
+    cohere_tool, compile_node, _, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = [f"pragma solidity ^0.8.0; contract Test{n} {{}}" for n in range(10)]
+    analyze_node = Mock(return_value=lambda: [{"detector": "reentrancy-eth", "impact": "High", "confidence": "Medium", "lines": [3]}])
+    targets = {("high", "reentrancy-eth"): 2}
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        first = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, journal=journal,
+                              scheduler=CoverageScheduler(targets))
+        first.execute(num_contracts=1)  # Interrupted after one contract
+
+    # Act
+    with RunJournal(path) as journal:
+        resumed = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, journal=journal,
+                                scheduler=CoverageScheduler(targets))
+        results = resumed.execute(num_contracts=10)
+
+    # Assert
+    assert results[0]["detectors"] == ["reentrancy-eth"]
+    assert len(results) == 2
+    assert cohere_tool.generate_contract.call_count == 2
+    assert resumed.scheduler.done
+
+# Test that near-duplicates are skipped before compilation, or flagged and carried on
+@pytest.mark.parametrize("action, expected", [("skip", "near_duplicate"), ("flag", "completed")])
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_near_duplicates(mock_get_params, action, expected):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    body = " ".join(f"uint256 public value{n} = {n};" for n in range(30))
+    cohere_tool.generate_contract.side_effect = [
+        f"pragma solidity ^0.8.0; contract Test {{ {body} }}",
+        f"pragma solidity ^0.8.0; contract Test2 {{ {body} }}",
+    ]
+    agent = ContractAgent(
+        cohere_tool, compile_node, analyze_node, storage_tool,
+        near_duplicates=NearDuplicateIndex(threshold=0.8), near_duplicate_action=action
+    )
+
+    # Act
+    results = agent.execute(num_contracts=2)
+
+    # Assert
+    assert results[0]["status"] == "completed"
+    assert results[1]["status"] == expected
+    assert results[1]["near_duplicate_of"] == results[0]["contract_hash"]
+    assert compile_node.call_count == (1 if action == "skip" else 2)
+    assert agent.metrics.summary()["counters"][f"near_duplicates_{'dropped' if action == 'skip' else 'flagged'}"] == 1
+
+# Test that a contract which failed to compile does not shadow its fixed near-identical successor
+@patch("contract_agent.get_params", return_value=PARAMS)
+def test_near_duplicate_of_failed_compile_is_kept(mock_get_params):
+    # Arrange
+    cohere_tool, _, analyze_node, storage_tool = make_tools()
+    body = " ".join(f"uint256 public value{n} = {n};" for n in range(30))
+    cohere_tool.generate_contract.side_effect = [
+        f"pragma solidity ^0.8.0; contract Test {{ {body} uint256 broken = }}",
+        f"pragma solidity ^0.8.0; contract Test {{ {body} }}",
+    ]
+    compile_node = Mock(side_effect=lambda code: lambda: None if "broken" in code else "Compiled contract")
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool, near_duplicates=NearDuplicateIndex(threshold=0.8))
+
+    # Act
+    results = agent.execute(num_contracts=2)
+
+    # Assert
+    assert [r["status"] for r in results] == ["compile_failed", "completed"]
+    assert storage_tool.save_contract.call_count == 1
+
+# Test that a worker runs queued jobs with their parameters and settles each one
+def test_worker_drains_queue(tmp_path):
+    # Arrange
+    cohere_tool, compile_node, analyze_node, storage_tool = make_tools()
+    cohere_tool.generate_contract.side_effect = [
+        "pragma solidity ^0.8.0; contract Test0 {}",
+        RuntimeError("API down"),
+        "pragma solidity ^0.8.0; contract Test1 {}",
+        "pragma solidity ^0.8.0; contract Test2 {}",
+    ]
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    queue.enqueue([{"complexity": "low", "vulnerabilities": ["reentrancy-eth"]}] * 3)
+    agent = ContractAgent(cohere_tool, compile_node, analyze_node, storage_tool)
 
     # Act
-    agent.execute(num_contracts=1)
+    results = agent.work(queue, concurrency=1, poll_interval=0.01)
 
     # Assert
-    mock_state_graph_instance.execute.assert_called_once_with("generate_contract", {'messages': []})
-    mock_save_contract.assert_called_once()  # Ensure save_contract is called
-    mock_save_slither_report.assert_called_once()  # Ensure save_slither_report is called
+    cohere_tool.generate_contract.assert_called_with("low", ["reentrancy-eth"])
+    assert [result["status"] for result in results] == ["completed", "error", "completed", "completed"]
+    assert queue.counts() == {"queued": 0, "leased": 0, "done": 3, "failed": 0}
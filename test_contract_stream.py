@@ -0,0 +1,121 @@
+from contract_stream import ContractStreamMonitor
+
+CONTRACT = """pragma solidity ^0.8.0;
+
+contract Vault {
+    // A stray } in a comment must not end the contract
+    string public note = "}}";
+    function withdraw() public {
+        require(true, "no { here");
+    }
+}"""
+
+def feed_in_chunks(monitor, text, size=7):
+    verdict = None
+    for i in range(0, len(text), size):
+        verdict = monitor.feed(text[i:i + size])
+        if verdict:
+            break
+    return verdict
+
+# Test that prose following the closed contract completes the stream and is cut off
+def test_monitor_completes_after_contract():
+    # Arrange
+    monitor = ContractStreamMonitor()
+
+    # Act
+    verdict = feed_in_chunks(monitor, CONTRACT + "\n\nThis contract is vulnerable to reentrancy because...")
+
+    # Assert
+    assert verdict == "complete"
+    assert monitor.text == CONTRACT
+
+# Test that a further declaration after the first contract keeps the stream going
+def test_monitor_waits_for_following_declarations():
+    # Arrange
+    monitor = ContractStreamMonitor()
+    text = "interface IToken {\n    function transfer() external;\n}\n\ncontract Token is IToken {\n    function transfer() external {}\n}\n```\nDone."
+
+    # Act
+    verdict = feed_in_chunks(monitor, text)
+
+    # Assert
+    assert verdict == "complete"
+    assert monitor.text.endswith("function transfer() external {}\n}")
+    assert monitor.text.startswith("interface IToken")
+
+# Test that output with no Solidity is aborted once the threshold is reached
+def test_monitor_aborts_prose():
+    # Arrange
+    monitor = ContractStreamMonitor(abort_after_chars=100)
+    prose = "Smart contracts are programs that run on a blockchain when conditions are met. " * 5
+
+    # Act
+    verdict = feed_in_chunks(monitor, prose)
+
+    # Assert
+    assert verdict == "abort"
+    assert len(monitor.buffer) < len(prose)
+
+# Test that a leading explanation with apostrophes does not confuse brace tracking
+def test_monitor_ignores_leading_prose():
+    # Arrange
+    monitor = ContractStreamMonitor()
+
+    # Act
+    verdict = feed_in_chunks(monitor, "Here's the contract you asked for:\n```solidity\n" + CONTRACT + "\n```")
+
+    # Assert
+    assert verdict == "complete"
+    assert monitor.text.endswith(CONTRACT)
+
+# Test that an unfinished contract keeps streaming
+def test_monitor_undecided_while_open():
+    # Arrange
+    monitor = ContractStreamMonitor()
+
+    # Act
+    verdict = feed_in_chunks(monitor, CONTRACT[:-1])
+
+    # Assert
+    assert verdict is None
+    assert monitor.text == CONTRACT[:-1]
+
+# Test that a prose-only refusal mentioning contracts is still aborted
+def test_monitor_aborts_refusal_mentioning_contracts():
+    # Arrange
+    monitor = ContractStreamMonitor(abort_after_chars=100)
+    prose = "I can't write a contract that drains funds. If the contract you describe is for testing, consider... " * 3
+
+    # Act
+    verdict = feed_in_chunks(monitor, prose)
+
+    # Assert
+    assert verdict == "abort"
+
+# Test that an apostrophe in leading prose naming a contract does not hide the closed contract
+def test_monitor_completes_after_prose_naming_contract():
+    # Arrange
+    monitor = ContractStreamMonitor()
+
+    # Act
+    verdict = feed_in_chunks(monitor, "Here's a contract that's vulnerable:\n```solidity\n" + CONTRACT + "\n```\nNotes follow.")
+
+    # Assert
+    assert verdict == "complete"
+    assert monitor.text.endswith(CONTRACT)
+
+# Test that a '/' ending a chunk after a closed contract waits to see whether it opens a comment
+def test_monitor_waits_on_trailing_slash():
+    # Arrange
+    monitor = ContractStreamMonitor()
+
+    # Act
+    first = monitor.feed("contract A {\n}\n\n/")
+    second = monitor.feed("/ Second contract\ncontract B {}")
+    third = monitor.feed("\nThat's all.")
+
+    # Assert
+    assert first is None and second is None
+    assert third == "complete"
+    assert monitor.text.endswith("contract B {}")
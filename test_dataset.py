@@ -0,0 +1,70 @@
+import os
+import pytest
+from dataset import ShardedJSONLWriter, iter_records
+
+def make_record(i):
+    return {"contract_hash": f"{i:064x}", "complexity": "low", "contract_code": f"contract C{i} {{}}" * 20}
+
+# Test that records are split into size-bounded shards and read back in order
+@pytest.mark.parametrize("compression", ["gzip", "bz2", "xz", "none"])
+def test_sharded_roundtrip(tmp_path, compression):
+    # Arrange
+    writer = ShardedJSONLWriter(str(tmp_path), max_shard_bytes=2048, compression=compression)
+
+    # Act
+    with writer:
+        for i in range(300):
+            writer.write(make_record(i))
+
+    # Assert
+    assert len(writer.shards) > 1
+    assert all(os.path.exists(path) for path in writer.shards)
+    records = list(iter_records(str(tmp_path)))
+    assert [r["contract_hash"] for r in records] == [f"{i:064x}" for i in range(300)]
+
+# Test that an open shard stays invisible to readers until it is closed
+def test_partial_shard_hidden(tmp_path):
+    writer = ShardedJSONLWriter(str(tmp_path))
+    writer.write(make_record(1))
+
+    assert list(iter_records(str(tmp_path))) == []
+
+    writer.close()
+    assert len(list(iter_records(str(tmp_path)))) == 1
+
+# Test that a later run appends new shards instead of overwriting earlier ones
+def test_shard_numbering_continues(tmp_path):
+    with ShardedJSONLWriter(str(tmp_path)) as first:
+        first.write(make_record(1))
+    with ShardedJSONLWriter(str(tmp_path)) as second:
+        second.write(make_record(2))
+
+    assert os.path.basename(second.shards[0]) == "contracts-00001.jsonl.gz"
+    assert len(list(iter_records(str(tmp_path)))) == 2
+
+# Test that numbering continues after the highest shard even when earlier ones were moved away
+def test_shard_numbering_after_gap(tmp_path):
+    for i in range(3):
+        with ShardedJSONLWriter(str(tmp_path)) as writer:
+            writer.write(make_record(i))
+    os.remove(tmp_path / "contracts-00000.jsonl.gz")
+
+    with ShardedJSONLWriter(str(tmp_path)) as writer:
+        writer.write(make_record(3))
+
+    assert os.path.basename(writer.shards[0]) == "contracts-00003.jsonl.gz"
+    assert len(list(iter_records(str(tmp_path)))) == 3
+
+# Test that the reader is lazy and can stream a single shard file
+def test_iter_records_streams(tmp_path):
+    with ShardedJSONLWriter(str(tmp_path)) as writer:
+        for i in range(5):
+            writer.write(make_record(i))
+
+    stream = iter_records(writer.shards[0])
+
+    assert next(stream)["contract_hash"] == f"{0:064x}"
+
+def test_unsupported_compression(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported compression"):
+        ShardedJSONLWriter(str(tmp_path), compression="rar")
@@ -0,0 +1,97 @@
+import pytest
+from unittest.mock import patch
+from journal import RunJournal
+
+# Test that reopening a journal replays run settings, contract progress and results
+def test_journal_replays_progress(tmp_path):
+    # Arrange
+    path = str(tmp_path / "runs" / "run-1.jsonl")
+    with RunJournal(path) as journal:
+        journal.start(num_contracts=3)
+        journal.record_start(0, {"index": 0, "complexity": "low"})
+        journal.record_stage(0, "generate_contract", {"contract_code": "contract A {}", "last_stage": "generate_contract"})
+        journal.record_result(0, {"index": 0, "status": "completed"})
+        journal.record_start(1, {"index": 1, "complexity": "high"})
+        journal.record_stage(1, "generate_contract", {"contract_code": "contract B {}", "last_stage": "generate_contract"})
+        journal.record_stage(1, "deduplicate_contract", {"contract_hash": "bb", "last_stage": "deduplicate_contract"})
+
+    # Act
+    with RunJournal(path) as resumed:
+        resumed.start(num_contracts=10)
+
+    # Assert
+    assert resumed.run_id == "run-1"
+    assert resumed.run == {"num_contracts": 3}  # A resumed run keeps its original settings
+    assert resumed.results == {0: {"index": 0, "status": "completed"}}
+    assert resumed.contracts[1] == {
+        "index": 1, "complexity": "high", "contract_code": "contract B {}",
+        "contract_hash": "bb", "last_stage": "deduplicate_contract",
+    }
+
+# Test that restarting a contract discards what was journaled for it before
+def test_journal_start_supersedes_stages(tmp_path):
+    # Arrange
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        journal.record_stage(2, "generate_contract", {"status": "generation_failed", "last_stage": "generate_contract"})
+        journal.record_start(2, {"index": 2})
+
+    # Act
+    resumed = RunJournal(path)
+    resumed.close()
+
+    # Assert
+    assert resumed.contracts[2] == {"index": 2}
+
+# Test that a line torn by a crash is skipped instead of failing the resume
+def test_journal_skips_torn_line(tmp_path):
+    # Arrange
+    path = tmp_path / "run.jsonl"
+    with RunJournal(str(path)) as journal:
+        journal.record_result(0, {"index": 0, "status": "completed"})
+    with open(path, "a") as f:
+        f.write('{"index":1,"finished":{"ind')
+
+    # Act
+    resumed = RunJournal(str(path))
+    resumed.close()
+
+    # Assert
+    assert resumed.results == {0: {"index": 0, "status": "completed"}}
+
+# Test that a record written after a torn tail survives the next replay
+def test_journal_appends_after_torn_line(tmp_path):
+    # Arrange
+    path = tmp_path / "run.jsonl"
+    with RunJournal(str(path)) as journal:
+        journal.record_start(1, {"index": 1})
+    with open(path, "a") as f:
+        f.write('{"index":1,"stage":"gen')
+
+    # Act
+    with RunJournal(str(path)) as resumed:
+        resumed.record_start(2, {"index": 2, "complexity": "low"})
+    replayed = RunJournal(str(path))
+    replayed.close()
+
+    # Assert
+    assert replayed.contracts == {1: {"index": 1}, 2: {"index": 2, "complexity": "low"}}
+
+# Test that records are flushed at once but fsync'd in batches
+def test_journal_batches_fsync(tmp_path):
+    # Arrange
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal(str(path), fsync_every=3, fsync_interval=3600)
+
+    # Act
+    with patch("journal.os.fsync") as mock_fsync:
+        for i in range(4):
+            journal.record_stage(i, "generate_contract", {"contract_code": "contract A {}"})
+        lines_written = len(path.read_text().splitlines())
+        fsyncs_before_close = mock_fsync.call_count
+        journal.close()
+
+    # Assert
+    assert lines_written == 4
+    assert fsyncs_before_close == 1
+    assert mock_fsync.call_count == 2  # Closing syncs the remainder
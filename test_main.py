@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def _run(args, cwd):
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, timeout=60)
+
+# Test that importing the CLI loads no heavy dependencies and touches no files
+def test_import_is_light_and_side_effect_free(tmp_path):
+    # Arrange
+    script = (
+        "import sys, main\n"
+        "heavy = ('cohere', 'langgraph', 'langchain_core', 'httpx')\n"
+        "print(sorted(name for name in sys.modules if name.split('.')[0] in heavy))\n"
+    )
+
+    # Act
+    result = _run(["-c", script], str(tmp_path))
+
+    # Assert
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+    assert os.listdir(tmp_path) == []
+
+# Test that --help works without creating log or output directories
+def test_help_creates_no_files(tmp_path):
+    # Act
+    result = _run([os.path.join(REPO_ROOT, "main.py"), "--help"], str(tmp_path))
+
+    # Assert
+    assert result.returncode == 0, result.stderr
+    assert "usage" in result.stdout
+    assert os.listdir(tmp_path) == []
+
+# Test that a worker refuses to share the work queue file as another database
+def test_worker_rejects_queue_as_database(tmp_path):
+    # Act
+    result = _run([os.path.join(REPO_ROOT, "main.py"), "--worker", "--manifest", "queue.sqlite"], str(tmp_path))
+
+    # Assert
+    assert result.returncode == 2
+    assert "--manifest cannot be the work queue file" in result.stderr
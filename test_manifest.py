@@ -0,0 +1,65 @@
+import pytest
+from manifest import ContractManifest
+
+def make_record(contract_hash, complexity="high", vulnerabilities=("reentrancy-eth",), detectors=(), status="completed"):
+    return {
+        "contract_hash": contract_hash,
+        "complexity": complexity,
+        "vulnerabilities": list(vulnerabilities),
+        "status": status,
+        "compile_status": "success",
+        "contract_path": f"contracts/{contract_hash[:2]}/{contract_hash}.sol",
+        "report_path": None,
+        "findings": [{"detector": d, "impact": "High", "confidence": "Medium", "lines": [3]} for d in detectors],
+        "timings": {"generate_contract": 1.5, "compile_contract": 0.2, "save_contract": 0.01, "save_slither_report": 0.02},
+    }
+
+# Test that records are buffered and written in batches
+def test_manifest_batches_writes(tmp_path):
+    # Arrange
+    manifest = ContractManifest(str(tmp_path / "manifest.sqlite"), batch_size=3)
+
+    # Act
+    manifest.record(make_record("aa01"))
+    manifest.record(make_record("aa02"))
+    pending_before = len(manifest._pending)
+    manifest.record(make_record("aa03"))
+
+    # Assert
+    assert pending_before == 2
+    assert manifest._pending == []  # Third record triggered one transaction for all three
+    assert len(manifest.query()) == 3
+
+# Test querying by complexity, requested vulnerability and actually detected findings
+def test_manifest_query(tmp_path):
+    # Arrange
+    manifest = ContractManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.record(make_record("aa01", detectors=["reentrancy-eth"]))
+    manifest.record(make_record("aa02", detectors=[]))
+    manifest.record(make_record("aa03", complexity="low", detectors=["reentrancy-eth"]))
+    manifest.record(make_record("aa04", vulnerabilities=["arbitrary-send-eth"], status="compile_failed"))
+
+    # Act
+    detected = manifest.query(complexity="high", detected="reentrancy-eth")
+    requested = manifest.query(requested="arbitrary-send-eth")
+
+    # Assert
+    assert [row["contract_hash"] for row in detected] == ["aa01"]
+    assert detected[0]["vulnerabilities"] == ["reentrancy-eth"]
+    assert detected[0]["generate_seconds"] == 1.5
+    assert detected[0]["save_seconds"] == pytest.approx(0.03)
+    assert [row["status"] for row in requested] == ["compile_failed"]
+
+# Test that re-recording a contract replaces its row and findings
+def test_manifest_rerecord_replaces(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    manifest = ContractManifest(path)
+    manifest.record(make_record("aa01", detectors=["reentrancy-eth"]))
+    manifest.flush()
+
+    manifest.record(make_record("aa01", detectors=["tx-origin"]))
+    manifest.close()
+
+    reopened = ContractManifest(path)
+    assert reopened.query(detected="reentrancy-eth") == []
+    assert len(reopened.query(detected="tx-origin")) == 1
@@ -0,0 +1,75 @@
+import json
+import pytest
+from metrics import Histogram, PipelineMetrics
+
+# Test histogram buckets and percentiles
+def test_histogram_summary():
+    # Arrange
+    histogram = Histogram(buckets=(0.1, 1, float("inf")))
+
+    # Act
+    for value in [0.05] * 90 + [0.5] * 9 + [5.0]:
+        histogram.observe(value)
+
+    # Assert
+    assert histogram.bucket_counts == [90, 9, 1]
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == 0.05
+    assert summary["p95"] == 0.5
+    assert summary["p99"] == 5.0
+    assert summary["max"] == 5.0
+
+# Test that the reservoir stays bounded on long runs
+def test_histogram_reservoir_bounded():
+    histogram = Histogram(reservoir_size=50)
+
+    for i in range(1000):
+        histogram.observe(i / 1000)
+
+    assert len(histogram._reservoir) == 50
+    assert histogram.count == 1000
+
+# Test stage tracking: counts, in-flight gauge, and exceptions counted as errors
+def test_track_stage():
+    # Arrange
+    metrics = PipelineMetrics()
+
+    # Act
+    with metrics.track("compile_contract"):
+        with metrics.track("compile_contract"):
+            pass
+    with pytest.raises(RuntimeError):
+        with metrics.track("compile_contract"):
+            raise RuntimeError("solc crashed")
+    metrics.record_timeout("analyze_contract")
+
+    # Assert
+    stage = metrics.summary()["stages"]["compile_contract"]
+    assert stage["count"] == 3
+    assert stage["errors"] == 1
+    assert stage["in_flight"] == 0
+    assert stage["max_in_flight"] == 2
+    assert metrics.summary()["stages"]["analyze_contract"]["timeouts"] == 1
+
+# Test the JSON and Prometheus exports
+def test_exports(tmp_path):
+    # Arrange
+    metrics = PipelineMetrics()
+    with metrics.track("generate_contract"):
+        pass
+    metrics.record_outcome("completed")
+
+    # Act
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+
+    # Assert
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    assert summary["outcomes"] == {"completed": 1}
+    assert summary["stages"]["generate_contract"]["count"] == 1
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'contract_stage_latency_seconds_bucket{stage="generate_contract",le="+Inf"} 1' in text
+    assert 'contract_stage_latency_seconds_count{stage="generate_contract"} 1' in text
+    assert 'contract_outcomes_total{status="completed"} 1' in text
+    assert "# TYPE contract_stage_in_flight gauge" in text
@@ -0,0 +1,90 @@
+import pytest
+from near_dup import NearDuplicateIndex, shingles
+
+CONTRACT = """pragma solidity ^0.8.0;
+
+contract Vault {
+    mapping(address => uint256) public balances;
+
+    function deposit() public payable {
+        balances[msg.sender] += msg.value;
+    }
+
+    function withdraw() public {
+        uint256 amount = balances[msg.sender];
+        (bool ok, ) = msg.sender.call{value: amount}("");
+        require(ok);
+        balances[msg.sender] = 0;
+    }
+}
+"""
+
+UNRELATED = """pragma solidity ^0.8.0;
+
+contract Counter {
+    uint256 private count;
+    event Incremented(uint256 value);
+
+    function increment() external returns (uint256) {
+        count += 1;
+        emit Incremented(count);
+        return count;
+    }
+}
+"""
+
+# Test that comments and layout do not change a contract's shingles
+def test_shingles_ignore_comments_and_layout():
+    # Act
+    reformatted = shingles("// header\n" + CONTRACT.replace("    ", "\t").replace("{\n", "{ /* body */\n"))
+
+    # Assert
+    assert reformatted == shingles(CONTRACT)
+
+# Test that a lightly edited contract is matched while an unrelated one is not
+def test_near_duplicate_detected():
+    # Arrange
+    index = NearDuplicateIndex(threshold=0.8)
+    index.check_and_add("vault", CONTRACT)
+
+    # Act
+    edited = index.check_and_add("vault2", CONTRACT.replace("contract Vault", "contract Vault2"))
+    unrelated = index.check_and_add("counter", UNRELATED)
+
+    # Assert
+    assert edited[0] == "vault"
+    assert 0.8 <= edited[1] < 1.0
+    assert unrelated is None
+    assert len(index) == 2  # The near-duplicate itself is not indexed
+    assert index.stats()["matched"] == 1
+
+# Test that signatures persist across runs and the index stays within its bound
+def test_near_duplicate_index_persists_and_evicts(tmp_path):
+    # Arrange
+    path = str(tmp_path / "near_dup.sqlite")
+    index = NearDuplicateIndex(path, threshold=0.8, max_entries=2)
+    index.check_and_add("vault", CONTRACT)
+    index.check_and_add("counter", UNRELATED)
+    index.check_and_add("other", UNRELATED.replace("Counter", "Tally").replace("count", "total"))
+    index.close()
+
+    # Act
+    reopened = NearDuplicateIndex(path, threshold=0.8, max_entries=2)
+
+    # Assert
+    assert index.evictions == 1
+    assert len(reopened) == 2
+    assert reopened.check_and_add("counter-again", UNRELATED + "// again\n")[0] == "counter"
+    assert reopened.check_and_add("vault-again", CONTRACT + "// again\n") is None  # Evicted as the oldest
+
+# Test that a discarded contract no longer matches
+def test_near_duplicate_discard():
+    # Arrange
+    index = NearDuplicateIndex(threshold=0.8)
+    index.check_and_add("vault", CONTRACT)
+
+    # Act
+    index.discard("vault")
+
+    # Assert
+    assert index.check_and_add("vault2", CONTRACT.replace("Vault", "Vault2")) is None
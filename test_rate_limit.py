@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from rate_limit import TokenBucket, RateLimiter, estimate_tokens
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+# Test that a bucket drains and refills at its per-minute rate
+def test_token_bucket_refill():
+    # Arrange
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)  # One token per second
+
+    # Act
+    bucket.consume(60)
+
+    # Assert
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 30.0
+    assert bucket.wait_time(30) == 0.0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+
+# Test that a request larger than the bucket is clamped instead of waiting forever
+def test_token_bucket_oversized_request():
+    bucket = TokenBucket(100, clock=FakeClock())
+
+    assert bucket.wait_time(1000) == 0.0
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError, match="Rate must be positive"):
+        TokenBucket(0)
+
+# Test that the limiter only proceeds when both budgets can cover the request
+def test_rate_limiter_requires_both_budgets():
+    # Arrange
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=600, clock=clock)
+
+    # Act & Assert
+    assert limiter._reserve(600) == 0.0
+    wait = limiter._reserve(300)  # Requests remain, tokens do not
+    assert wait == pytest.approx(30.0)
+    assert limiter.request_bucket.tokens == pytest.approx(9)  # Nothing consumed while waiting
+
+# Test that a blocking acquire sleeps for the reported wait
+@patch("rate_limit.time.sleep")
+def test_rate_limiter_acquire_sleeps(mock_sleep):
+    # Arrange
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, clock=clock)
+    limiter.request_bucket.consume(60)
+    mock_sleep.side_effect = lambda seconds: setattr(clock, "now", clock.now + seconds)
+
+    # Act
+    waited = limiter.acquire()
+
+    # Assert
+    assert waited == pytest.approx(1.0)
+    mock_sleep.assert_called_once()
+
+def test_rate_limiter_async_acquire_without_limits():
+    limiter = RateLimiter()
+
+    assert asyncio.run(limiter.acquire_async(tokens=5000)) == 0.0
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("a" * 400) == 100
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from unittest.mock import patch, Mock
+from cohere.core.api_error import ApiError
+from requests.exceptions import RequestException
+from retry import RetryPolicy, CircuitBreaker, RetryExhaustedError, retry_after, is_retryable
+from metrics import PipelineMetrics
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_is_retryable_by_status():
+    assert is_retryable(RequestException("boom"))
+    assert is_retryable(ApiError(status_code=429))
+    assert is_retryable(ApiError(status_code=503))
+    assert not is_retryable(ApiError(status_code=400))
+    assert not is_retryable(ValueError("bad input"))
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after(ApiError(status_code=429, headers={"Retry-After": "7"})) == 7.0
+    date = format_datetime(datetime.fromtimestamp(1_000_030, tz=timezone.utc), usegmt=True)
+    assert retry_after(ApiError(status_code=503, headers={"retry-after": date}), now=lambda: 1_000_000) == 30.0
+    assert retry_after(ApiError(status_code=503)) is None
+
+# Test that backoff grows exponentially, stays jittered below the ceiling and is capped
+def test_backoff_is_jittered_and_capped():
+    # Arrange
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, circuit_breaker=CircuitBreaker())
+
+    # Act
+    delays = {attempt: [policy.backoff(attempt) for _ in range(200)] for attempt in range(5)}
+
+    # Assert
+    assert all(0 <= d <= 1.0 for d in delays[0])
+    assert all(0 <= d <= 4.0 for d in delays[2])
+    assert all(d <= 5.0 for d in delays[4])
+    assert len(set(delays[2])) > 100  # Jittered, not synchronized
+
+# Test that a server Retry-After hint replaces the computed backoff
+@patch("retry.time.sleep")
+def test_call_honors_retry_after(mock_sleep):
+    # Arrange
+    metrics = PipelineMetrics()
+    policy = RetryPolicy(circuit_breaker=CircuitBreaker(), metrics=metrics)
+    fn = Mock(side_effect=[ApiError(status_code=429, headers={"retry-after": "3"}), "ok"])
+
+    # Act
+    result = policy.call(fn)
+
+    # Assert
+    assert result == "ok"
+    mock_sleep.assert_called_once_with(3.0)
+    assert policy.stats["retry_after_honored"] == 1
+    assert metrics.summary()["counters"]["cohere_backoff_seconds"] == 3.0
+
+# Test that non-retryable errors are raised at once and exhausted retries are wrapped
+@patch("retry.time.sleep")
+def test_call_gives_up(mock_sleep):
+    # Arrange
+    policy = RetryPolicy(max_attempts=4, circuit_breaker=CircuitBreaker())
+    bad_request = Mock(side_effect=ApiError(status_code=400))
+    unavailable = Mock(side_effect=ApiError(status_code=503))
+
+    # Act & Assert
+    with pytest.raises(ApiError):
+        policy.call(bad_request)
+    assert bad_request.call_count == 1
+
+    with pytest.raises(RetryExhaustedError) as excinfo:
+        policy.call(unavailable)
+    assert unavailable.call_count == 4
+    assert excinfo.value.last_error.status_code == 503
+    assert policy.stats["retries"] == 3
+    assert policy.stats["retries_exhausted"] == 1
+
+# Test that the breaker opens after consecutive failures, pauses callers and closes after a good probe
+def test_circuit_breaker_opens_and_recovers():
+    # Arrange
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10.0, clock=clock)
+
+    # Act & Assert
+    breaker.record_failure()
+    assert breaker._admit() == 0.0
+    breaker.record_failure(hint=20.0)  # The server asked for longer than the cooldown
+    assert breaker.state == "open"
+    assert breaker._admit() == 20.0
+
+    clock.now = 20.0
+    assert breaker._admit() == 0.0  # Single probe goes through
+    assert breaker._admit() > 0  # Everyone else waits on its verdict
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker._admit() == 0.0
+    assert breaker.times_opened == 1
+
+# Test that a failed probe reopens the circuit straight away
+def test_circuit_breaker_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=5.0, clock=clock)
+    breaker.record_failure()
+    clock.now = 5.0
+    assert breaker._admit() == 0.0
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert breaker._admit() == 5.0
+
+# Test the async path retries without blocking the event loop
+def test_call_async_retries():
+    # Arrange
+    policy = RetryPolicy(base_delay=0.01, circuit_breaker=CircuitBreaker())
+    outcomes = iter([RequestException("reset"), "ok"])
+
+    async def fn():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    # Act
+    result = asyncio.run(policy.call_async(fn))
+
+    # Assert
+    assert result == "ok"
+    assert policy.stats["retries"] == 1
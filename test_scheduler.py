@@ -0,0 +1,59 @@
+import pytest
+import random
+from scheduler import CoverageScheduler
+
+def findings(*detectors):
+    return [{"detector": d, "impact": "High", "confidence": "Medium", "lines": [3]} for d in detectors]
+
+# Test that parameters go to the bucket furthest from its target
+def test_scheduler_targets_lowest_coverage():
+    # Arrange
+    scheduler = CoverageScheduler(
+        {("low", "reentrancy-eth"): 2, ("high", "arbitrary-send-eth"): 2}, max_vulnerabilities=1, rng=random.Random(0)
+    )
+    scheduler.record("low", ["reentrancy-eth"], findings("reentrancy-eth"))
+
+    # Act
+    params = scheduler.next_params()
+
+    # Assert
+    assert params == ("high", ["arbitrary-send-eth"])
+
+# Test that in-flight parameters count toward coverage, so concurrent requests spread out
+def test_scheduler_spreads_in_flight_requests():
+    # Arrange
+    scheduler = CoverageScheduler(
+        {("low", "a"): 1, ("low", "b"): 1, ("high", "c"): 1}, max_vulnerabilities=1, rng=random.Random(1)
+    )
+
+    # Act
+    issued = [scheduler.next_params() for _ in range(3)]
+
+    # Assert
+    assert sorted((c, v[0]) for c, v in issued) == [("high", "c"), ("low", "a"), ("low", "b")]
+
+# Test that only confirmed findings fill buckets and the scheduler stops once targets are met
+def test_scheduler_stops_when_targets_met():
+    # Arrange
+    scheduler = CoverageScheduler({("medium", "a"): 1, ("medium", "b"): 1}, rng=random.Random(2))
+
+    # Act
+    scheduler.record("medium", ["a"], [])  # Requested but not confirmed
+    not_done = scheduler.done
+    scheduler.record("medium", ["a"], findings("a", "b", "unrelated"))  # b confirmed unasked
+
+    # Assert
+    assert not_done is False
+    assert scheduler.done is True
+    assert scheduler.next_params() == (None, None)
+    assert scheduler.summary()["coverage"] == 1.0
+    assert scheduler.attempts[("medium", "a")] == 2
+    assert scheduler.hits[("medium", "a")] == 1
+
+# Test that uniform targets skip the combination get_params never produces
+def test_scheduler_uniform_targets():
+    # Act
+    scheduler = CoverageScheduler.uniform(3, complexities=["low", "high"], vulnerabilities=["a", "arbitrary-send-erc20"])
+
+    # Assert
+    assert scheduler.targets == {("low", "a"): 3, ("high", "a"): 3, ("high", "arbitrary-send-erc20"): 3}
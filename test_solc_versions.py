@@ -0,0 +1,58 @@
+import os
+import pytest
+from solc_versions import SolcVersionManager, pragma_ranges, satisfies
+
+def install_binaries(directory, *versions):
+    for version in versions:
+        path = directory / f"solc-{version}" / f"solc-{version}"
+        path.parent.mkdir(parents=True)
+        path.write_text("#!/bin/sh\n")
+        os.chmod(path, 0o755)
+
+# Test npm-style pragma ranges as solc interprets them
+@pytest.mark.parametrize("version, expression, expected", [
+    ((0, 8, 19), "^0.8.0", True),
+    ((0, 9, 0), "^0.8.0", False),
+    ((0, 7, 6), "^0.8.0", False),
+    ((0, 8, 4), "~0.8.1", True),
+    ((0, 8, 0), ">=0.7.0 <0.8.0", False),
+    ((0, 7, 6), ">=0.7.0 <0.8.0", True),
+    ((0, 8, 17), "0.8.17", True),
+    ((0, 8, 18), "=0.8.17", False),
+    ((0, 6, 12), "^0.5.0 || ^0.6.0", True),
+    ((0, 8, 20), "0.8.0 - 0.8.20", True),
+    ((0, 8, 21), "0.8.0 - 0.8.20", False),
+    ((0, 8, 25), "0.8", True),
+    ((0, 8, 3), ">0.8", False),
+])
+def test_satisfies(version, expression, expected):
+    assert satisfies(version, expression) is expected
+
+# Test that pragmas in comments are ignored
+def test_pragma_ranges_ignore_comments():
+    # Act
+    pragmas = pragma_ranges("// pragma solidity ^0.4.0;\npragma solidity >=0.8.0 <0.9.0;\ncontract A {}")
+
+    # Assert
+    assert pragmas == (">=0.8.0 <0.9.0",)
+
+# Test that the newest cached binary satisfying the pragma is chosen, with PATH solc as fallback
+def test_version_manager_resolves(tmp_path):
+    # Arrange
+    install_binaries(tmp_path, "0.7.6", "0.8.19", "0.8.26")
+    manager = SolcVersionManager(str(tmp_path))
+
+    # Act
+    caret_08 = manager.resolve("pragma solidity ^0.8.0; contract A {}")
+    pinned = manager.resolve("pragma solidity 0.8.19; contract A {}")
+    old = manager.resolve("pragma solidity ^0.7.0; contract A {}")
+    unmatched = manager.resolve("pragma solidity ^0.4.24; contract A {}")
+    no_pragma = manager.resolve("contract A {}")
+    manager.resolve("pragma solidity ^0.8.0; contract B {}")
+
+    # Assert
+    assert caret_08.endswith("solc-0.8.26")
+    assert pinned.endswith("solc-0.8.19")
+    assert old.endswith("solc-0.7.6")
+    assert unmatched == no_pragma == "solc"
+    assert manager.stats == {"resolved": 3, "unmatched": 1, "no_pragma": 1, "memoized": 1}
@@ -1,6 +1,15 @@
 import pytest
 from unittest.mock import patch, Mock, ANY
-from solidity_tools import _compile_solidity, _analyze_with_slither
+import json
+import os
+import subprocess
+import time
+from solidity_tools import (
+    _compile_solidity, _analyze_with_slither, enable_compile_cache, compile_cache_stats, compile_solidity_batch,
+    run_slither, SlitherExecutor, SlitherTimeoutError, parse_slither_json, validate_solidity,
+    SolidityCompilationError, enable_solc_versions
+)
+from cache import DiskCache
 
 # Test Solidity compilation with solc
 @patch("subprocess.run")
@@ -37,37 +46,310 @@ def test_compile_solidity_failure(mock_subprocess_run):
     )
     assert result is None  # Check that failure returns None
 
-# Test Slither analysis
+# Test that a repeated compile of the same source is served from the cache
+@patch("solidity_tools._solc_version", return_value="solc, the solidity compiler commandline interface\nVersion: 0.8.19")
 @patch("subprocess.run")
-def test_analyze_with_slither_success(mock_subprocess_run):
+def test_compile_solidity_cached(mock_subprocess_run, mock_solc_version, tmp_path):
+    # Arrange
+    mock_subprocess_run.return_value = Mock(returncode=0, stdout="Compiled contract", stderr="")
+    enable_compile_cache(DiskCache(str(tmp_path / "compile.sqlite")))
+
+    try:
+        # Act
+        first = _compile_solidity("pragma solidity ^0.8.0;\ncontract Test {}\n")
+        second = _compile_solidity("pragma solidity ^0.8.0;   \r\ncontract Test {}")  # Same source after normalization
+        stats = compile_cache_stats()
+    finally:
+        enable_compile_cache(None)
+
+    # Assert
+    assert first == second == "Compiled contract"
+    mock_subprocess_run.assert_called_once()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["saved_seconds"] >= 0
+
+# Test that cached failures are returned without spawning solc again
+@patch("solidity_tools._solc_version", return_value="Version: 0.8.19")
+@patch("subprocess.run")
+def test_compile_solidity_cached_failure(mock_subprocess_run, mock_solc_version, tmp_path):
+    mock_subprocess_run.return_value = Mock(returncode=1, stdout="", stderr="Error: Invalid contract")
+    enable_compile_cache(DiskCache(str(tmp_path / "compile.sqlite")))
+
+    try:
+        assert _compile_solidity("invalid contract") is None
+        assert _compile_solidity("invalid contract") is None
+    finally:
+        enable_compile_cache(None)
+
+    mock_subprocess_run.assert_called_once()
+
+def test_compile_cache_stats_disabled():
+    assert compile_cache_stats() is None
+
+def fake_standard_json(args, input, **kwargs):
+    """Mimics solc --standard-json: any error suppresses bytecode for the whole batch."""
+    sources = json.loads(input)["sources"]
+    errors = []
+    for name, source in sources.items():
+        if "broken" in source["content"]:
+            errors.append({"severity": "error", "formattedMessage": f"ParserError in {name}", "sourceLocation": {"file": name}})
+        if "mystery" in source["content"]:
+            errors.append({"severity": "error", "formattedMessage": "Unlocated error"})
+    contracts = {} if errors else {name: {"Test": {"evm": {"bytecode": {"object": "6080"}}}} for name in sources}
+    return Mock(returncode=0, stdout=json.dumps({"errors": errors, "contracts": contracts}), stderr="")
+
+# Test batch compilation in a single solc process over stdin
+@patch("subprocess.run", side_effect=fake_standard_json)
+def test_compile_solidity_batch_success(mock_subprocess_run):
+    # Act
+    results = compile_solidity_batch(["contract A {}", "contract B {}", "contract C {}"])
+
+    # Assert
+    mock_subprocess_run.assert_called_once_with(
+        ['solc', '--standard-json'], input=ANY, stdout=ANY, stderr=ANY, text=True
+    )
+    assert [r["bytecode"] for r in results] == [{"Test": "6080"}] * 3
+
+# Test that one broken contract does not sink the rest of the batch
+@patch("subprocess.run", side_effect=fake_standard_json)
+def test_compile_solidity_batch_isolates_failures(mock_subprocess_run):
+    # Act
+    results = compile_solidity_batch(["contract A {}", "broken", "contract C {}", "mystery"])
+
+    # Assert
+    assert results[0]["bytecode"] == {"Test": "6080"}
+    assert results[1]["bytecode"] is None
+    assert results[1]["errors"] == ["ParserError in contract_1.sol"]
+    assert results[2]["bytecode"] == {"Test": "6080"}
+    assert results[3]["bytecode"] is None
+    assert results[3]["errors"] == ["Unlocated error"]
+
+# Test that a batch is split into one solc process per resolved compiler version
+@patch("subprocess.run", side_effect=fake_standard_json)
+def test_compile_solidity_batch_groups_by_version(mock_subprocess_run):
     # Arrange
-    mock_subprocess_run.return_value = Mock(returncode=0, stdout="Slither analysis report", stderr="")
+    manager = Mock()
+    manager.resolve.side_effect = lambda code: "/solc/0.7.6" if "^0.7" in code else "/solc/0.8.26"
+    enable_solc_versions(manager)
+
+    # Act
+    try:
+        results = compile_solidity_batch([
+            "pragma solidity ^0.8.0; contract A {}",
+            "pragma solidity ^0.7.0; contract B {}",
+            "pragma solidity ^0.8.0; contract C {}",
+        ])
+    finally:
+        enable_solc_versions(None)
+
+    # Assert
+    binaries = [c.args[0][0] for c in mock_subprocess_run.call_args_list]
+    assert sorted(binaries) == ["/solc/0.7.6", "/solc/0.8.26"]
+    assert [r["bytecode"] for r in results] == [{"Test": "6080"}] * 3
+
+# Test that cached batch entries skip solc entirely
+@patch("solidity_tools._solc_version", return_value="Version: 0.8.19")
+@patch("subprocess.run", side_effect=fake_standard_json)
+def test_compile_solidity_batch_cached(mock_subprocess_run, mock_solc_version, tmp_path):
+    enable_compile_cache(DiskCache(str(tmp_path / "compile.sqlite")))
+
+    try:
+        first = compile_solidity_batch(["contract A {}", "broken"])
+        second = compile_solidity_batch(["contract A {}", "broken"])
+    finally:
+        enable_compile_cache(None)
+
+    assert first == second
+    assert mock_subprocess_run.call_count == 2  # Initial batch plus the retry without the broken source
+
+# Test Slither analysis
+@patch("subprocess.Popen")
+def test_analyze_with_slither_success(mock_popen):
+    # Arrange
+    mock_popen.return_value = Mock(returncode=0, communicate=Mock(return_value=("Slither analysis report", "")))
     
     contract_file_path = "/path/to/compiled_contract.sol"
 
     # Act
-    result = _analyze_with_slither(contract_file_path)
+    result = _analyze_with_slither(contract_file_path, memory_limit_mb=0)
 
     # Assert
-    mock_subprocess_run.assert_called_once_with(
+    mock_popen.assert_called_once_with(
         ['slither', contract_file_path],
-        stdout=ANY, stderr=ANY, text=True
+        stdout=ANY, stderr=ANY, text=True, start_new_session=True
     )
     assert result == "Slither analysis report"  # Check successful output
 
-@patch("subprocess.run")
-def test_analyze_with_slither_failure(mock_subprocess_run):
+@patch("subprocess.Popen")
+def test_analyze_with_slither_failure(mock_popen):
     # Arrange
-    mock_subprocess_run.return_value = Mock(returncode=1, stdout="", stderr="Error: Slither failed")
+    mock_popen.return_value = Mock(returncode=1, communicate=Mock(return_value=("", "Error: Slither failed")))
     
     contract_file_path = "/path/to/compiled_contract.sol"
 
     # Act
-    result = _analyze_with_slither(contract_file_path)
+    result = _analyze_with_slither(contract_file_path, memory_limit_mb=0)
 
     # Assert
-    mock_subprocess_run.assert_called_once_with(
+    mock_popen.assert_called_once_with(
         ['slither', contract_file_path],
-        stdout=ANY, stderr=ANY, text=True
+        stdout=ANY, stderr=ANY, text=True, start_new_session=True
     )
     assert result is None  # Check that failure returns None
+
+@pytest.fixture
+def fake_slither(tmp_path, monkeypatch):
+    """Puts a stand-in ``slither`` on PATH that sleeps when the contract says so."""
+    script = tmp_path / "slither"
+    script.write_text(
+        "#!/usr/bin/env python3\n"
+        "import sys, time\n"
+        "source = open(sys.argv[1]).read()\n"
+        "if 'slow' in source:\n"
+        "    time.sleep(30)\n"
+        "print('analysis of ' + sys.argv[1])\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return tmp_path
+
+# Test that a runaway Slither process is killed and reported as timed out
+def test_run_slither_timeout(fake_slither):
+    # Arrange
+    contract = fake_slither / "slow.sol"
+    contract.write_text("slow")
+
+    # Act
+    started = time.perf_counter()
+    result = run_slither(str(contract), timeout=0.5, memory_limit_mb=0)
+
+    # Assert
+    assert result["status"] == "timeout"
+    assert time.perf_counter() - started < 10
+
+# Test that the memory cap is applied by an exec wrapper rather than a preexec_fn
+def test_run_slither_memory_limit(fake_slither):
+    # Arrange
+    contract = fake_slither / "a.sol"
+    contract.write_text("contract A {}")
+
+    # Act
+    with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+        result = run_slither(str(contract), timeout=10, memory_limit_mb=2048)
+
+    # Assert
+    assert result["status"] == "ok"
+    assert result["output"].strip() == f"analysis of {contract}"
+    assert "preexec_fn" not in popen.call_args.kwargs
+    assert popen.call_args[0][0][-2:] == ['slither', str(contract)]
+    assert str(2048 * 1024 * 1024) in popen.call_args[0][0]
+
+# Test parallel analysis with per-job outcomes and a timeout surfaced as an exception
+def test_slither_executor(fake_slither):
+    # Arrange
+    paths = []
+    for name in ["a", "b", "slow"]:
+        contract = fake_slither / f"{name}.sol"
+        contract.write_text(name)
+        paths.append(str(contract))
+    executor = SlitherExecutor(max_workers=3, timeout=1, memory_limit_mb=0)
+
+    try:
+        # Act
+        results = list(executor.map(paths))
+
+        # Assert
+        assert [r["status"] for r in results] == ["ok", "ok", "timeout"]
+        assert results[0]["output"].strip() == f"analysis of {paths[0]}"
+        assert executor.analyze(paths[1]).startswith("analysis of")
+        with pytest.raises(SlitherTimeoutError):
+            executor.analyze_node(paths[2])()
+        assert executor.statuses == {"ok": 3, "timeout": 2}
+    finally:
+        executor.shutdown()
+
+SLITHER_JSON = json.dumps({
+    "success": True,
+    "error": None,
+    "results": {"detectors": [{
+        "check": "reentrancy-eth",
+        "impact": "High",
+        "confidence": "Medium",
+        "description": "Reentrancy in Bank.withdraw() ...",
+        "elements": [
+            {"type": "function", "source_mapping": {"lines": [12, 13, 14]}},
+            {"type": "node", "source_mapping": {"lines": [13]}}
+        ]
+    }]}
+})
+
+# Test parsing Slither JSON into compact findings
+def test_parse_slither_json():
+    findings = parse_slither_json(SLITHER_JSON)
+
+    assert findings == [{"detector": "reentrancy-eth", "impact": "High", "confidence": "Medium", "lines": [12, 13, 14]}]
+
+def test_parse_slither_json_failure():
+    assert parse_slither_json(json.dumps({"success": False, "error": "compilation failed"})) is None
+    assert parse_slither_json("not json") is None
+    assert parse_slither_json(json.dumps({"success": True, "results": {}})) == []
+
+# Test structured analysis: findings are read from JSON even though Slither exits non-zero
+@patch("subprocess.Popen")
+def test_analyze_with_slither_structured(mock_popen):
+    # Arrange
+    mock_popen.return_value = Mock(returncode=255, communicate=Mock(return_value=(SLITHER_JSON, "")))
+
+    # Act
+    findings = _analyze_with_slither("/path/to/contract.sol", memory_limit_mb=0, structured=True)
+
+    # Assert
+    assert mock_popen.call_args[0][0] == ['slither', "/path/to/contract.sol", '--json', '-']
+    assert findings[0]["detector"] == "reentrancy-eth"
+
+# Test that the Solidity block is pulled out of a chatty, fenced LLM response and normalized
+def test_validate_solidity_extracts_fenced_code():
+    # Arrange
+    response = (
+        "Here's the contract you asked for:\n```solidity\r\npragma solidity ^0.8.0;   \r\n\r\n\r\n\r\n"
+        "contract Vault {\r\n    string note = \"}\"; // }\r\n}\r\n```\nIt is vulnerable to reentrancy."
+    )
+
+    # Act
+    contract_code, reason = validate_solidity(response)
+
+    # Assert
+    assert reason is None
+    assert contract_code == 'pragma solidity ^0.8.0;\n\ncontract Vault {\n    string note = "}"; // }\n}\n'
+
+# Test that clearly invalid output is rejected with a reason and never reaches solc
+@pytest.mark.parametrize("response, reason", [
+    ("", "empty output"),
+    ("I am sorry, I cannot help with that.", "missing pragma solidity"),
+    ("pragma solidity ^0.8.0;\ncontract A {\n    function f() public {", "truncated: 2 unclosed brace(s)"),
+    ("pragma solidity ^0.8.0;\ncontract A {\n    /* unfinished", "truncated: unterminated comment"),
+    ("pragma solidity ^0.8.0;\ncontract A {\n    string s = \"abc", "truncated: unterminated string literal"),
+    ("pragma solidity ^0.8.0;\nuint256 constant X = 1;", "no contract, library or interface declaration"),
+    ("pragma solidity ^0.8.0;\ncontract A {}\n}", "unbalanced braces: 1 extra closing brace(s)"),
+])
+@patch("subprocess.run")
+def test_validate_solidity_rejects(mock_subprocess_run, response, reason):
+    # Act
+    contract_code, rejection_reason = validate_solidity(response)
+
+    # Assert
+    assert contract_code is None
+    assert rejection_reason == reason
+    mock_subprocess_run.assert_not_called()
+
+# Test that a checked compile surfaces solc's diagnostics instead of returning None
+@patch("subprocess.run")
+def test_compile_solidity_raise_on_error(mock_subprocess_run):
+    # Arrange
+    mock_subprocess_run.return_value = Mock(returncode=1, stdout="", stderr="ParserError: Expected ';'")
+
+    # Act & Assert
+    with pytest.raises(SolidityCompilationError) as excinfo:
+        _compile_solidity("pragma solidity ^0.8.0; contract A { uint x }", raise_on_error=True)
+    assert excinfo.value.stderr == "ParserError: Expected ';'"
@@ -1,21 +1,54 @@
+import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, mock_open
-from storage import ContractStorage
+from storage import ContractStorage, contract_hash
+from dataset import ShardedJSONLWriter, iter_records
+
+@pytest.fixture
+def storage(tmp_path):
+    return ContractStorage(contracts_dir=str(tmp_path / "contracts"), reports_dir=str(tmp_path / "reports"))
 
 # Test saving a contract successfully
-@patch("builtins.open", new_callable=mock_open)
-@patch("os.makedirs")
-def test_save_contract_success(mock_makedirs, mock_file_open):
+def test_save_contract_success(storage):
     # Arrange
-    storage = ContractStorage()
     contract_code = "pragma solidity ^0.8.0; contract Test {}"
+    source_hash = contract_hash(contract_code)
     
     # Act
     result = storage.save_contract(contract_code)
 
     # Assert
-    mock_file_open.assert_called_once_with(result, 'w')  # Ensure file was opened with correct filename
-    mock_file_open().write.assert_called_once_with(contract_code)  # Ensure contract was written to file
+    assert result == os.path.join(storage.contracts_dir, source_hash[:2], f"{source_hash}.sol")  # Sharded by hash
+    with open(result) as f:
+        assert f.read() == contract_code
+    assert os.listdir(os.path.dirname(result)) == [f"{source_hash}.sol"]  # No temp files left behind
+
+# Test that identical contracts are stored once
+def test_save_contract_deduplicates(storage):
+    contract_code = "pragma solidity ^0.8.0; contract Test {}"
+
+    assert not storage.has_contract(contract_code)
+    first = storage.save_contract(contract_code)
+
+    with patch("storage.ContractStorage._atomic_write") as mock_write:
+        second = storage.save_contract(contract_code)
+
+    assert first == second
+    assert storage.has_contract(contract_code)
+    mock_write.assert_not_called()
+
+# Test that contracts saved at the same moment never overwrite each other
+def test_save_contract_concurrent(storage):
+    codes = [f"contract C{i} {{}}" for i in range(50)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(storage.save_contract, codes))
+
+    assert len(set(paths)) == 50
+    for code, path in zip(codes, paths):
+        with open(path) as f:
+            assert f.read() == code
 
 # Test saving a contract with empty code (should raise ValueError)
 @patch("os.makedirs")
@@ -27,21 +60,21 @@ def test_save_contract_empty_code(mock_makedirs):
     with pytest.raises(ValueError, match="Contract code is empty"):
         storage.save_contract("")
 
-# Test saving a Slither report successfully
-@patch("builtins.open", new_callable=mock_open)
-@patch("os.makedirs")
-def test_save_slither_report_success(mock_makedirs, mock_file_open):
+# Test saving a Slither report successfully, linked to its contract by hash
+def test_save_slither_report_success(storage):
     # Arrange
-    storage = ContractStorage()
-    contract_filepath = "/contracts/contract_20211010.sol"
+    contract_filepath = storage.save_contract("pragma solidity ^0.8.0; contract Test {}")
+    source_hash = contract_hash("pragma solidity ^0.8.0; contract Test {}")
     slither_report = "Slither analysis report"
 
     # Act
     result = storage.save_slither_report(contract_filepath, slither_report)
 
     # Assert
-    mock_file_open.assert_called_once_with(result, 'w')  # Ensure file was opened with correct filename
-    mock_file_open().write.assert_called_once_with(slither_report)  # Ensure report was written to file
+    assert result == storage.report_path(source_hash)
+    assert os.path.basename(result) == f"{source_hash}_SlitherReport.txt"
+    with open(result) as f:
+        assert f.read() == slither_report
 
 # Test saving an empty Slither report (should raise ValueError)
 @patch("os.makedirs")
@@ -78,3 +111,66 @@ def test_save_slither_report_permission_error(mock_makedirs, mock_file_open):
     # Act & Assert
     with pytest.raises(PermissionError, match="No write permission"):
         storage.save_slither_report(contract_filepath, slither_report)
+
+# Test that structured findings are stored as compact JSON
+@patch("builtins.open", new_callable=mock_open)
+@patch("os.makedirs")
+@patch("os.replace")
+def test_save_slither_findings(mock_replace, mock_makedirs, mock_file_open):
+    # Arrange
+    storage = ContractStorage()
+    findings = [{"detector": "reentrancy-eth", "impact": "High", "confidence": "Medium", "lines": [12, 13]}]
+
+    # Act
+    result = storage.save_slither_report("/contracts/ab/abcdef.sol", findings)
+
+    # Assert
+    assert result == os.path.join("reports", "ab", "abcdef_SlitherFindings.json")
+    mock_file_open().write.assert_called_once_with(
+        '[{"detector":"reentrancy-eth","impact":"High","confidence":"Medium","lines":[12,13]}]'
+    )
+
+# Test that an empty findings list (a clean contract) is still saved
+@patch("builtins.open", new_callable=mock_open)
+@patch("os.makedirs")
+@patch("os.replace")
+def test_save_slither_findings_empty(mock_replace, mock_makedirs, mock_file_open):
+    storage = ContractStorage()
+
+    storage.save_slither_report("/contracts/ab/abcdef.sol", [])
+
+    mock_file_open().write.assert_called_once_with("[]")
+
+# Test that recorded contracts stream into the dataset export
+def test_record_contract_exports(tmp_path):
+    # Arrange
+    exporter = ShardedJSONLWriter(str(tmp_path / "export"))
+    storage = ContractStorage(str(tmp_path / "contracts"), str(tmp_path / "reports"), exporter=exporter)
+
+    # Act
+    storage.record_contract({
+        "contract_hash": "ab12", "complexity": "low", "vulnerabilities": ["reentrancy"], "status": "completed",
+        "contract_code": "contract A {}", "findings": [{"detector": "reentrancy-eth"}], "timings": {"compile_contract": 0.1},
+    })
+    storage.record_contract({"contract_hash": "cd34", "status": "generation_failed"})  # Nothing to export
+    storage.close()
+
+    # Assert
+    records = list(iter_records(str(tmp_path / "export")))
+    assert len(records) == 1
+    assert records[0]["contract_code"] == "contract A {}"
+    assert records[0]["findings"] == [{"detector": "reentrancy-eth"}]
+    assert "timings" not in records[0]
+
+# Test that constructing the storage creates no directories until something is written
+def test_init_creates_no_directories(tmp_path):
+    # Arrange
+    contracts_dir = tmp_path / "contracts"
+
+    # Act
+    storage = ContractStorage(contracts_dir=str(contracts_dir), reports_dir=str(tmp_path / "reports"))
+
+    # Assert
+    assert os.listdir(tmp_path) == []
+    storage.save_contract("pragma solidity ^0.8.0; contract Test {}")
+    assert contracts_dir.is_dir()
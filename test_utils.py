@@ -1,5 +1,6 @@
 import pytest
-from utils import parse_assessment_result, load_prompt_from_file
+from loguru import logger
+from utils import parse_assessment_result, load_prompt_from_file, LogSampler
 
 # Test parse_assessment_result
 def test_parse_assessment_result():
@@ -31,3 +32,38 @@ def test_load_prompt_from_file(tmpdir):
     # Test loading a non-existent file
     content = load_prompt_from_file("non_existent_file.txt")
     assert content is None
+
+# Test that repeated messages from one call site are sampled after the burst
+def test_log_sampler_thins_repeated_messages():
+    # Arrange
+    sampler = LogSampler(rate=0.25, burst=2)
+    messages = []
+    handler = logger.add(messages.append, level="INFO", filter=sampler, format="{message}")
+
+    # Act
+    for i in range(10):
+        logger.info(f"Starting contract {i}")
+    logger.warning("Never sampled")
+    logger.remove(handler)
+
+    # Assert
+    assert [m.strip() for m in messages] == [
+        "Starting contract 0", "Starting contract 1", "Starting contract 5", "Starting contract 9", "Never sampled"
+    ]
+    assert sampler.dropped == 6
+
+# Test that the default rate keeps every message
+def test_log_sampler_keeps_all_by_default():
+    # Arrange
+    sampler = LogSampler()
+    messages = []
+    handler = logger.add(messages.append, level="INFO", filter=sampler, format="{message}")
+
+    # Act
+    for i in range(50):
+        logger.info(f"Starting contract {i}")
+    logger.remove(handler)
+
+    # Assert
+    assert len(messages) == 50
+    assert sampler.dropped == 0
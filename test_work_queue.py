@@ -0,0 +1,80 @@
+import pytest
+import threading
+from work_queue import WorkQueue
+
+PARAMS = {"complexity": "medium", "vulnerabilities": ["reentrancy-eth"]}
+
+# Test the job lifecycle: enqueue, lease, acknowledge
+def test_work_queue_lease_and_ack(tmp_path):
+    # Arrange
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), worker_id="w1")
+    queue.enqueue([PARAMS, PARAMS, PARAMS])
+
+    # Act
+    jobs = queue.lease(2)
+    queue.ack(jobs[0].id, {"status": "completed"})
+
+    # Assert
+    assert [job.id for job in jobs] == [1, 2]
+    assert jobs[0].params == PARAMS
+    assert queue.counts() == {"queued": 1, "leased": 1, "done": 1, "failed": 0}
+    assert not queue.drained()
+
+# Test that concurrent workers, each with its own connection, never lease the same job
+def test_work_queue_leases_are_exclusive(tmp_path):
+    # Arrange
+    path = str(tmp_path / "queue.sqlite")
+    WorkQueue(path).enqueue([PARAMS] * 50)
+    workers = [WorkQueue(path, worker_id=f"w{n}") for n in range(4)]
+    leased = []
+
+    def drain(queue):
+        while jobs := queue.lease(3):
+            leased.extend(job.id for job in jobs)
+
+    # Act
+    threads = [threading.Thread(target=drain, args=(queue,)) for queue in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Assert
+    assert sorted(leased) == list(range(1, 51))
+
+# Test that a crashed worker's expired lease goes to another worker, whose outcome then counts
+def test_work_queue_requeues_expired_leases(tmp_path):
+    # Arrange
+    path = str(tmp_path / "queue.sqlite")
+    crashed = WorkQueue(path, lease_seconds=-1, worker_id="crashed")
+    crashed.enqueue([PARAMS])
+    crashed.lease()
+    survivor = WorkQueue(path, worker_id="survivor")
+
+    # Act
+    jobs = survivor.lease()
+    late_ack = crashed.ack(jobs[0].id, {"status": "completed"})
+    ack = survivor.ack(jobs[0].id, {"status": "completed"})
+
+    # Assert
+    assert jobs[0].attempts == 2
+    assert late_ack is False
+    assert ack is True
+    assert survivor.drained()
+
+# Test that failed jobs are retried until they run out of attempts
+def test_work_queue_fails_after_max_attempts(tmp_path):
+    # Arrange
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    queue.enqueue([PARAMS])
+
+    # Act
+    queue.fail(queue.lease()[0].id, "boom")
+    retried = queue.lease()
+    queue.fail(retried[0].id, "boom again")
+
+    # Assert
+    assert retried[0].attempts == 2
+    assert queue.counts()["failed"] == 1
+    assert queue.lease() == []
+    assert queue.drained()
@@ -2,17 +2,71 @@ from loguru import logger
 import os
 import re
 import random
-from config import LOG_FILE, LOG_LEVEL, LOGURU_FORMAT
+import threading
+from collections import Counter
+from config import LOG_DIR, LOG_FILE, LOG_LEVEL, LOGURU_FORMAT, LOG_ENQUEUE, LOG_SAMPLE_RATE, LOG_SAMPLE_BURST
 import sys
 
-# Setting up Loguru based on config.py
-logger.remove()  # Remove the default logger to customize
+class LogSampler:
+    """Loguru filter that thins out messages repeated from the same call site.
 
-# Add the file handler (for logging to a file)
-logger.add(LOG_FILE, rotation="10 MB", retention="10 days", level=LOG_LEVEL, format=LOGURU_FORMAT)
+    Under high concurrency the per-contract INFO/DEBUG lines dominate the log. The first
+    ``burst`` messages from each call site pass, then only a ``rate`` share of them;
+    warnings and above are never dropped. ``dropped`` counts what was left out.
+    """
 
-# Add the stdout handler (for logging to console with colors)
-logger.add(sys.stdout, level=LOG_LEVEL, format=LOGURU_FORMAT, colorize=True)
+    def __init__(self, rate=1.0, burst=20):
+        self.every = max(1, round(1 / rate)) if rate > 0 else None
+        self.burst = burst
+        self.dropped = 0
+        self._warning = logger.level("WARNING").no
+        self._seen = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        if self.every == 1 or record["level"].no >= self._warning:
+            return True
+        site = (record["name"], record["function"], record["line"])
+        with self._lock:
+            self._seen[site] += 1
+            count = self._seen[site]
+            keep = count <= self.burst or (self.every is not None and (count - self.burst) % self.every == 0)
+            if not keep:
+                self.dropped += 1
+        return keep
+
+_log_sampler = None
+
+def configure_logging():
+    """Sets up Loguru based on config.py and returns the file sink's sampler.
+
+    Called when a run starts rather than on import, so importing modules (or ``--help``)
+    creates no log directory and installs no sinks. Calling it again is a no-op.
+    """
+    global _log_sampler
+    if _log_sampler is not None:
+        return _log_sampler
+
+    try:
+        if not os.path.exists(LOG_DIR):
+            os.makedirs(LOG_DIR)
+            print(f"Log directory '{LOG_DIR}' created.")
+    except Exception as e:
+        print(f"Error creating log directory '{LOG_DIR}': {e}")
+        raise e
+
+    logger.remove()  # Remove the default logger to customize
+    _log_sampler = LogSampler(LOG_SAMPLE_RATE, LOG_SAMPLE_BURST)  # Each sink samples with its own counts
+
+    # With enqueue, records are handed to a background thread so callers never block on sink I/O
+    # Add the file handler (for logging to a file)
+    logger.add(LOG_FILE, rotation="10 MB", retention="10 days", level=LOG_LEVEL, format=LOGURU_FORMAT,
+               enqueue=LOG_ENQUEUE, filter=_log_sampler)
+
+    # Add the stdout handler (for logging to console with colors)
+    logger.add(sys.stdout, level=LOG_LEVEL, format=LOGURU_FORMAT, colorize=True, enqueue=LOG_ENQUEUE,
+               filter=LogSampler(LOG_SAMPLE_RATE, LOG_SAMPLE_BURST))
+    return _log_sampler
 
 # List of vulnerabilities and complexities
 VULNERABILITIES = [
@@ -46,14 +100,14 @@ def load_prompt_from_file(filename="prompt.txt"):
         logger.exception(f"Error loading prompt from {filename}: {e}")
         return None
 
-def get_params() -> str:
-    """Generates contract complexity level and a set of vulnerabilities."""
+def get_params(rng=random) -> str:
+    """Generates contract complexity level and a set of vulnerabilities, drawn from ``rng``."""
     try:
-        complexity = random.choice(COMPLEXITY)
+        complexity = rng.choice(COMPLEXITY)
 
         # Generate a random set of vulnerabilities (between 1 and 3)
-        num_vulnerabilities = random.randint(1, 3)
-        vulnerabilities = random.sample(VULNERABILITIES, num_vulnerabilities)
+        num_vulnerabilities = rng.randint(1, 3)
+        vulnerabilities = rng.sample(VULNERABILITIES, num_vulnerabilities)
 
         # Validate that the combination of complexity and vulnerabilities makes sense for the contract
         if complexity == 'low' and 'arbitrary-send-erc20' in vulnerabilities:
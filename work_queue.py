@@ -0,0 +1,155 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from loguru import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, lease_expires);
+"""
+
+Job = namedtuple("Job", ["id", "params", "attempts"])
+
+class WorkQueue:
+    """Durable SQLite job queue shared by any number of worker processes and hosts.
+
+    A coordinator ``enqueue``s contract jobs; workers ``lease`` them for ``lease_seconds``,
+    ``renew`` the lease while the pipeline runs, then ``ack`` (done) or ``fail`` them. A
+    lease left to expire, e.g. by a crashed worker, makes the job available again, and a
+    job that has failed ``max_attempts`` times stays failed.
+
+    On shared storage the file needs a filesystem with working POSIX locks (NFSv4, most
+    cluster filesystems). WAL is deliberately not used: it relies on shared memory and
+    only works for processes on one host.
+    """
+
+    def __init__(self, path, lease_seconds=900.0, max_attempts=3, worker_id=None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+            self._conn.executescript(_SCHEMA)
+        except Exception as e:
+            logger.exception(f"Error opening work queue at {path}: {e}")
+            raise e
+
+    def enqueue(self, jobs):
+        """Adds jobs (JSON-serialisable parameter dicts) in one transaction; returns how many."""
+        now = time.time()
+        rows = [(json.dumps(params), now, now) for params in jobs]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT INTO jobs (params, enqueued_at, updated_at) VALUES (?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Enqueued {len(rows)} jobs in {self.path}")
+        return len(rows)
+
+    def lease(self, limit=1):
+        """Leases up to ``limit`` queued or lease-expired jobs to this worker."""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two workers never lease the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job whose every lease expired keeps killing its workers; stop handing it out
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'failed', error = 'lease expired', lease_expires = NULL, updated_at = ? "
+                    "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                rows = self._conn.execute(
+                    "SELECT id, params, attempts FROM jobs "
+                    "WHERE state = 'queued' OR (state = 'leased' AND lease_expires < ?) ORDER BY id LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    [(self.worker_id, now + self.lease_seconds, now, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        jobs = [Job(job_id, json.loads(params), attempts + 1) for job_id, params, attempts in rows]
+        for job in jobs:
+            if job.attempts > 1:
+                logger.warning(f"Job {job.id} re-leased (attempt {job.attempts}) after a failure or expired lease")
+        return jobs
+
+    def renew(self, job_ids):
+        """Extends this worker's leases on ``job_ids`` so long-running jobs are not handed out again."""
+        if not job_ids:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+                [(now + self.lease_seconds, now, job_id, self.worker_id) for job_id in job_ids]
+            )
+
+    def _settle(self, job_id, sql, params):
+        with self._lock:
+            cursor = self._conn.execute(sql + " WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+                                        (*params, job_id, self.worker_id))
+        if not cursor.rowcount:
+            # The lease expired and another worker took the job over; its outcome will count
+            logger.warning(f"Job {job_id} is no longer leased by {self.worker_id}; outcome dropped")
+        return bool(cursor.rowcount)
+
+    def ack(self, job_id, result):
+        """Marks a leased job done, storing its result."""
+        return self._settle(
+            job_id, "UPDATE jobs SET state = 'done', result = ?, lease_expires = NULL, updated_at = ?",
+            (json.dumps(result), time.time())
+        )
+
+    def fail(self, job_id, error):
+        """Returns a leased job to the queue, or marks it failed once it has used up its attempts."""
+        return self._settle(
+            job_id,
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, lease_expires = NULL, updated_at = ?",
+            (self.max_attempts, str(error), time.time())
+        )
+
+    def counts(self):
+        """Number of jobs per state: queued, leased, done, failed."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {"queued": 0, "leased": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def drained(self):
+        """Whether no job is waiting or leased anywhere, so there is nothing left to pick up."""
+        counts = self.counts()
+        return counts["queued"] == 0 and counts["leased"] == 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()